@@ -7,10 +7,14 @@ Optimized DoorDash "Now on DoorDash" Section Extractor
 Only includes necessary steps for accessing store data efficiently
 """
 
-import json
 import uuid
 import time
-import base64
+import random
+import asyncio
+import logging
+import argparse
+import contextlib
+from collections import deque
 from urllib.parse import quote
 
 try:
@@ -21,11 +25,128 @@ except ImportError:
     print("Install with: pip install curl_cffi")
     exit(1)
 
+import json_codec
+from sync_facade import SyncFacade
+from facet_cursor import FacetCursor
+from rate_limiter import RateLimiter
+from resilience import RequestExecutor, endpoint_key
+from session_cookies import isolated_request
+from metrics import MetricsRegistry, observe_request, timed_step
+from tracing import Tracer, span, new_trace_id, sentry_trace
+from flow_logging import SUMMARY, add_logging_arguments, configure_from_args
+from stage_profiler import StageProfiler, add_profile_argument
+from guest_session_pool import SESSION_FIELDS, GuestSessionPool
+from geocode_cache import GeocodeCache
+from feed_parser import (
+    NOW_ON_DOORDASH,
+    SectionCursorScanner,
+    walk_feed,
+    list_sections,
+    next_page_cursor,
+    store_key,
+    unique_stores,
+    find_now_on_doordash_cursor,
+    extract_stores_from_feed
+)
 
-class OptimizedDoorDashFlow:
-    def __init__(self):
-        self.base_url = "https://consumer-mobile-bff.doordash.com"
-        self.session = requests.Session(impersonate="chrome110")
+
+BASE_URL = "https://consumer-mobile-bff.doordash.com"
+
+log = logging.getLogger(__name__)
+
+# Facets headers the app sends with the homepage feed
+HOMEPAGE_FACET_HEADERS = {
+    'X-Facets-Feature-Item-Carousel': 'true',
+    'X-Facets-Feature-Backend-Driven-Badges': 'true',
+    'X-Facets-Feature-No-Tile': 'true',
+    'X-Facets-Version': '4.0.0',
+    'X-Facets-Feature-Item-Steppers': 'true',
+    'X-Facets-Feature-Quick-Add-Stepper-Variant': 'true',
+    'X-Facets-Feature-Store-Carousel-Redesign-Round-1': 'treatmentVariant2',
+    'X-Facets-Feature-Store-Cell-Redesign-Round-3': 'treatmentVariant3',
+    'X-Gifting-Intent': 'false'
+}
+
+# Words in a 403 body that mean our JWT was refused, unlike an edge block
+AUTH_FAILURE_MARKERS = ('jwt', 'token', 'unauthenticated', 'unauthorized', 'authentication')
+
+# Realistic mobile app headers, identical for every request
+APP_HEADERS = {
+    'User-Agent': 'DoorDashConsumer/15.221.7 (Android 11; Google sdk_gphone_x86)',
+    'Accept': 'application/json',
+    'Accept-Language': 'en-US',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'X-Experience-Id': 'doordash',
+    'Client-Version': 'android v15.221.7 b15221079',
+    'X-Support-Partner-Dashpass': 'true',
+    'DD-User-Locale': 'en-US',
+    'X-BFF-Error-Format': 'v2',
+    'Connection': 'keep-alive',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache'
+}
+
+
+def is_auth_failure(response):
+    """True if a 403 body says the credentials were refused (not an edge block)
+    
+    Edge and bot-protection blocks are HTML pages, so only JSON bodies from
+    the BFF itself are looked at.
+    """
+    if 'json' not in response.headers.get('Content-Type', ''):
+        return False
+    try:
+        body = response.text[:2000].lower()
+    except Exception:
+        return False  # a streamed body that was not read
+    return any(marker in body for marker in AUTH_FAILURE_MARKERS)
+
+
+def new_session():
+    """An AsyncSession that can be shared by any number of flows
+    
+    Flows never touch session.headers and keep their cookies in their own
+    jar (see session_cookies), so pass one of these as `session=` to run
+    many concurrent guests over the same connection pool without mixing
+    their identities.
+    """
+    return requests.AsyncSession(impersonate="chrome110")
+
+
+class AsyncOptimizedDoorDashFlow:
+    """Asyncio engine for the optimized flow, built on curl_cffi's AsyncSession"""
+
+    def __init__(self, session_pool=None, geocode_cache=None, stream_homepage=False,
+                 max_pages=None, max_stores=None, page_fan_out=1, rate_limiter=None,
+                 executor=None, session=None, base_url=BASE_URL, metrics=None,
+                 tracer=None, profiler=None):
+        self.base_url = base_url
+        # A session passed in is shared with other flows and closed by its owner
+        self._owns_session = session is None
+        self.session = session if session is not None else new_session()
+        # This guest's cookies; the (possibly shared) session keeps none
+        self.cookies = requests.Cookies()
+        self.session_pool = session_pool
+        self.geocode_cache = geocode_cache
+        self.stream_homepage = stream_homepage
+        self.max_pages = max_pages
+        self.max_stores = max_stores
+        self.page_fan_out = page_fan_out
+        if executor is None:
+            executor = RequestExecutor(rate_limiter) if rate_limiter is not None \
+                else RequestExecutor.shared()
+        self.executor = executor
+        self.rate_limiter = executor.rate_limiter
+        self.metrics = metrics if metrics is not None else MetricsRegistry.shared()
+        # Spans are only recorded with a tracer; the trace id is always used
+        # for Sentry-Trace so every request of this flow shares it
+        self.tracer = tracer
+        self.trace_id = new_trace_id()
+        self.profiler = profiler
+        self.pages_fetched = 0  # across every crawl of this flow
+        self.guest_from_pool = False
+        self.guests_created = 0
+        self.token_rejected = False
         self.jwt_token = None
         self.session_id = str(uuid.uuid4()) + "-dd-and"
         self.device_id = str(uuid.uuid4()).replace('-', '')
@@ -34,127 +155,235 @@ class OptimizedDoorDashFlow:
         self.address_id = None
         self.lat = None
         self.lng = None
+        self.printable_address = None
         
-        # Realistic mobile app headers
-        self.session.headers.update({
-            'User-Agent': 'DoorDashConsumer/15.221.7 (Android 11; Google sdk_gphone_x86)',
-            'Accept': 'application/json',
-            'Accept-Language': 'en-US',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'X-Experience-Id': 'doordash',
-            'Client-Version': 'android v15.221.7 b15221079',
-            'X-Support-Partner-Dashpass': 'true',
-            'DD-User-Locale': 'en-US',
-            'X-BFF-Error-Format': 'v2',
-            'Connection': 'keep-alive',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache'
-        })
-        
+        # Static headers, built once; per-step headers travel with each request
+        self.base_headers = dict(APP_HEADERS)
         self.update_session_headers()
     
+    async def close(self):
+        """Close the underlying HTTP session unless it was passed in"""
+        if self._owns_session:
+            await self.session.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
     def update_session_headers(self):
-        """Update session with dynamic headers"""
-        headers = {
+        """Refresh the guest's id headers in base_headers
+        
+        Authorization is not stored here: _request adds it from jwt_token on
+        every call, so a released token can never be sent again.
+        """
+        self.base_headers.update({
             'X-Session-Id': self.session_id,
             'X-Device-Id': self.device_id,
             'X-Correlation-Id': self.correlation_id,
             'X-Client-Request-Id': self.client_request_id
-        }
+        })
+    
+    def export_guest_session(self):
+        """Snapshot the guest identity (JWT + ids) for the session pool"""
+        return {field: getattr(self, field) for field in SESSION_FIELDS}
+    
+    def apply_guest_session(self, guest_session):
+        """Adopt a pooled guest identity instead of the fresh ids from __init__"""
+        for field in SESSION_FIELDS:
+            setattr(self, field, guest_session[field])
+        self.token_rejected = False
+        self.update_session_headers()
+    
+    def stage(self, name):
+        """Profile the enclosed block as pipeline stage `name` when a profiler is attached"""
+        return self.profiler.stage(name) if self.profiler is not None else contextlib.nullcontext()
+    
+    def _note_auth_status(self, response):
+        """Remember that the server rejected our JWT so it is not pooled again
         
-        if self.jwt_token:
-            headers['Authorization'] = f'JWT {self.jwt_token}'
+        Only a 401, or a 403 whose body names the token, counts: a bare 403
+        is what edge / bot protection sends, and dropping the guest for it
+        would just cost another create_full_guest.
+        """
+        if not self.jwt_token:
+            return
+        if response.status_code == 401 or \
+                (response.status_code == 403 and is_auth_failure(response)):
+            self.token_rejected = True
+    
+    async def acquire_guest(self):
+        """Lease a warm guest from the pool, or create one when it is empty"""
+        return await self._adopt_guest(self._lease_guest())
+    
+    async def rotate_guest(self):
+        """Swap the current guest for a pooled one, or a new one when none is idle
         
-        self.session.headers.update(headers)
+        The pool is asked before the current guest goes back into it, so a
+        rotation never leases the guest it is moving away from.
+        """
+        guest_session = self._lease_guest()
+        await self.release_guest()
+        return await self._adopt_guest(guest_session)
     
-    def generate_sentry_headers(self, activity_name="MainActivity"):
-        """Generate dynamic Sentry headers"""
-        trace_id = str(uuid.uuid4()).replace('-', '')
-        span_id = str(uuid.uuid4()).replace('-', '')[:16]
+    def _lease_guest(self):
+        return self.session_pool.lease() if self.session_pool is not None else None
+    
+    async def _adopt_guest(self, guest_session):
+        if guest_session:
+            self.apply_guest_session(guest_session)
+            self.guest_from_pool = True
+            log.info("♻️  Step 2: Reusing pooled guest session")
+            return True
+        return await self.step_2_create_guest()
+    
+    async def release_guest(self):
+        """Hand the guest back to the pool unless its token was rejected
         
+        Either way this flow stops using the token afterwards, since a
+        released session may be leased by another flow straight away.
+        """
+        if not self.jwt_token:
+            return
+        if self.token_rejected:
+            if self.session_pool is not None:
+                self.session_pool.discard(self.export_guest_session())
+                log.info("🗑️  Guest token rejected - dropped from pool")
+        elif self.session_pool is not None:
+            self.session_pool.release(self.export_guest_session())
+        
+        # Never send the old token again, not even to create_full_guest
+        self.jwt_token = None
+    
+    def request_headers(self, headers=None):
+        """Headers for one request: static + guest ids + JWT + `headers`
+        
+        Built fresh per call and never written to the session, so one
+        session can carry many flows at once.
+        """
+        merged = dict(self.base_headers)
+        if self.jwt_token:
+            merged['Authorization'] = f'JWT {self.jwt_token}'
+        if headers:
+            merged.update(headers)
+        return merged
+    
+    async def _request(self, method, path, headers=None, retry_statuses=(), idempotent=None,
+                       **kwargs):
+        """Send one request to the BFF (rate limited, retried, circuit broken)"""
+        url = f"{self.base_url}{path}"
+        headers = self.request_headers(headers)
+        endpoint = endpoint_key(method, path)
+        with span(endpoint, self.tracer, self.trace_id) as request_span:
+            started = time.perf_counter()
+            try:
+                response = await self.executor.execute(
+                    method, path,
+                    lambda: isolated_request(self.session, self.cookies, method, url,
+                                             headers=headers, **kwargs),
+                    retry_statuses, idempotent, kwargs.get('stream', False)
+                )
+            except Exception as e:
+                observe_request(self.metrics, endpoint, time.perf_counter() - started, error=e)
+                raise
+            observe_request(self.metrics, endpoint, time.perf_counter() - started,
+                            response, streamed=kwargs.get('stream', False))
+            request_span.set(status=response.status_code)
+            return response
+    
+    def generate_sentry_headers(self, activity_name="MainActivity"):
+        """Generate dynamic Sentry headers (this flow's trace, the current step's span)"""
         return {
-            'Sentry-Trace': f'{trace_id}-{span_id}-1',
+            'Sentry-Trace': sentry_trace(self.trace_id, '1'),
             'Baggage': f'sentry-environment=production,sentry-release=android-15.221.7,sentry-transaction={activity_name}'
         }
     
-    def step_1_health_check(self):
+    @timed_step
+    async def step_1_health_check(self):
         """Optional: Health Check"""
-        print("🏥 Step 1: Health Check")
+        log.info("🏥 Step 1: Health Check")
         try:
-            response = self.session.get(f"{self.base_url}/status_ok")
-            print(f"   Status: {response.status_code}")
+            response = await self._request('GET', "/status_ok")
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Warning: {e}")
+            log.warning("Warning: %s", e)
             return True  # Continue even if health check fails
     
-    def step_2_create_guest(self):
+    @timed_step
+    async def step_2_create_guest(self):
         """CRITICAL: Create Guest User & Get JWT Token"""
-        print("👤 Step 2: Create Guest User (CRITICAL)")
+        log.info("👤 Step 2: Create Guest User (CRITICAL)")
         
         headers = self.generate_sentry_headers("CreateGuestActivity")
         headers.update({
             'Content-Type': 'application/json; charset=UTF-8'
         })
-        self.session.headers.update(headers)
         
         payload = {
             "password": str(uuid.uuid4())[:8] + "A1!"
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v1/consumer_profile/create_full_guest",
+            response = await self._request(
+                'POST',
+                "/v1/consumer_profile/create_full_guest",
+                headers=headers,
                 json=payload
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 if 'auth_token' in data and 'token' in data['auth_token']:
                     self.jwt_token = data['auth_token']['token']
+                    self.guest_from_pool = False
+                    self.guests_created += 1
+                    self.token_rejected = False
                     self.update_session_headers()
-                    print("   ✅ JWT Token obtained!")
+                    log.debug("✅ JWT Token obtained!")
                     return True
                 else:
-                    print("   ❌ No token in response")
+                    log.warning("❌ No token in response")
                     return False
             else:
-                print(f"   ❌ Failed: {response.text[:200]}")
+                log.warning("❌ Failed: %s", response.text[:200])
                 return False
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_8_get_addresses(self):
+    @timed_step
+    async def step_8_get_addresses(self):
         """Step 8: Get User Addresses (check only)"""
-        print("📍 Step 8: Get Addresses")
+        log.info("📍 Step 8: Get Addresses")
         
         if not self.jwt_token:
-            print("   ❌ No JWT token")
+            log.warning("❌ No JWT token")
             return False
         
         headers = self.generate_sentry_headers("AddressActivity")
-        self.session.headers.update(headers)
         
         try:
-            response = self.session.get(f"{self.base_url}/v2/addresses")
-            print(f"   Status: {response.status_code}")
+            response = await self._request('GET', "/v2/addresses", headers=headers)
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_9_address_autocomplete(self, address_query):
+    @timed_step
+    async def step_9_address_autocomplete(self, address_query):
         """Get address suggestions"""
-        print(f"🔍 Step 9: Address Autocomplete for '{address_query}'")
+        log.info("🔍 Step 9: Address Autocomplete for '%s'", address_query)
         
         if not self.jwt_token:
-            print("   ❌ No JWT token")
+            log.warning("❌ No JWT token")
             return None
         
         headers = self.generate_sentry_headers("AddressAutocompleteActivity")
-        self.session.headers.update(headers)
         
         params = {
             'input': address_query,
@@ -162,89 +391,142 @@ class OptimizedDoorDashFlow:
         }
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v1/addresses/autocomplete",
+            response = await self._request(
+                'GET',
+                "/v1/addresses/autocomplete",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 
                 if data and len(data) > 0:
                     # Get the first address suggestion
                     first_address = data[0]
                     place_id = first_address.get('google_place_id')
-                    print(f"   ✅ Found address suggestions: {len(data)}")
+                    log.debug("✅ Found address suggestions: %s", len(data))
                     if place_id:
-                        print(f"   ✅ Using place_id: {place_id}")
-                        print(f"   📍 Address: {first_address.get('printable_address', 'N/A')}")
+                        log.debug("✅ Using place_id: %s", place_id)
+                        log.debug("📍 Address: %s", first_address.get('printable_address', 'N/A'))
                         return place_id
                     else:
-                        print(f"   ❌ No google_place_id in first result: {first_address}")
+                        log.warning("❌ No google_place_id in first result: %s", first_address)
                         return None
                 else:
-                    print("   ❌ No address suggestions found")
+                    log.warning("❌ No address suggestions found")
                     return None
             else:
-                print(f"   ❌ Autocomplete failed: {response.text[:200]}")
+                log.warning("❌ Autocomplete failed: %s", response.text[:200])
                 return None
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return None
     
-    def step_10_address_details(self, place_id):
+    @timed_step
+    async def step_10_address_details(self, place_id):
         """Get detailed address info including coordinates"""
-        print("📍 Step 10: Get Address Details & Coordinates")
+        log.info("📍 Step 10: Get Address Details & Coordinates")
         
         if not self.jwt_token:
-            print("   ❌ No JWT token")
+            log.warning("❌ No JWT token")
             return False
         
         headers = self.generate_sentry_headers("AddressDetailsActivity")
-        self.session.headers.update(headers)
         
         params = {
             'place_id': place_id
         }
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v2/addresses/details",
+            response = await self._request(
+                'GET',
+                "/v2/addresses/details",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 self.lat = data.get('lat')
                 self.lng = data.get('lng')
-                print(f"   ✅ Coordinates: {self.lat}, {self.lng}")
-                print(f"   📍 Address: {data.get('printable_address')}")
+                self.printable_address = data.get('printable_address')
+                log.debug("✅ Coordinates: %s, %s", self.lat, self.lng)
+                log.debug("📍 Address: %s", data.get('printable_address'))
                 
                 # Verify coordinates are valid
                 if self.lat is None or self.lng is None:
-                    print(f"   ❌ Invalid coordinates in response: {data}")
+                    log.warning("❌ Invalid coordinates in response: %s", data)
                     return False
                 
                 return True
             else:
-                print(f"   ❌ Failed to get details: {response.text[:200]}")
+                log.warning("❌ Failed to get details: %s", response.text[:200])
                 return False
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_11_validate_address(self, place_id):
+    async def resolve_address(self, address_query):
+        """Steps 9-10 with the geocode cache in front of them
+        
+        Returns the place_id and leaves lat/lng set, or None. A full cache
+        hit makes no requests at all; a query hit whose place has expired
+        only re-runs step 10.
+        """
+        cache = self.geocode_cache
+        place_id = cache.get_place_id(address_query) if cache is not None else None
+        
+        if place_id:
+            place = cache.get_place(place_id)
+            if place:
+                self.lat = place['lat']
+                self.lng = place['lng']
+                self.printable_address = place['printable_address']
+                log.info("⚡ Steps 9-10: Geocode cache hit for '%s'", address_query)
+                log.debug("✅ Coordinates: %s, %s", self.lat, self.lng)
+                return place_id
+        else:
+            place_id = await self.step_9_address_autocomplete(address_query)
+            if not place_id:
+                return None
+            if cache is not None:
+                cache.put_place_id(address_query, place_id)
+        
+        if not await self.step_10_address_details(place_id):
+            return None
+        if cache is not None:
+            cache.put_place(place_id, self.lat, self.lng, self.printable_address)
+        return place_id
+    
+    def set_coordinates(self, lat=None, lng=None, place=None):
+        """Coordinates mode: take lat/lng directly (or from a cached place dict)
+        
+        The feed steps only send lat/lng, so with coordinates set the flow can
+        go from a guest token straight to steps 14-15 without steps 9-13.
+        """
+        if place is not None:
+            lat, lng = place['lat'], place['lng']
+            self.printable_address = place.get('printable_address')
+        if lat is None or lng is None:
+            raise ValueError("set_coordinates needs lat and lng, or a place")
+        self.lat = lat
+        self.lng = lng
+    
+    @timed_step
+    async def step_11_validate_address(self, place_id):
         """Step 11: Validate Address"""
-        print("✅ Step 11: Validate Address")
+        log.info("✅ Step 11: Validate Address")
         
         if not self.jwt_token:
-            print("   ❌ No JWT token")
+            log.warning("❌ No JWT token")
             return False
         
         headers = self.generate_sentry_headers("AddressActivity")
-        self.session.headers.update(headers)
         
         payload = {
             "consumer_id": "1125900377027641",  # Dummy consumer ID
@@ -254,29 +536,33 @@ class OptimizedDoorDashFlow:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v2/addresses/validate",
-                json=payload
+            response = await self._request(
+                'POST',
+                "/v2/addresses/validate",
+                headers=headers,
+                json=payload,
+                idempotent=True
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_12_add_address(self, place_id):
+    @timed_step
+    async def step_12_add_address(self, place_id):
         """Add address to user profile"""
-        print("➕ Step 12: Add Address to Profile")
+        log.info("➕ Step 12: Add Address to Profile")
         
         if not self.jwt_token:
-            print("   ❌ No JWT token")
+            log.warning("❌ No JWT token")
             return False
         
         headers = self.generate_sentry_headers("AddAddressActivity")
         headers.update({
             'Content-Type': 'application/json; charset=UTF-8'
         })
-        self.session.headers.update(headers)
         
         payload = {
             "subpremise": "",
@@ -291,85 +577,80 @@ class OptimizedDoorDashFlow:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v1/consumer_profile/address/",
+            response = await self._request(
+                'POST',
+                "/v1/consumer_profile/address/",
+                headers=headers,
                 json=payload
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 if 'id' in data:
                     self.address_id = data['id']
-                    print(f"   ✅ Address ID: {self.address_id}")
-                    print(f"   📍 Address: {data.get('printable_address', 'N/A')}")
+                    log.debug("✅ Address ID: %s", self.address_id)
+                    log.debug("📍 Address: %s", data.get('printable_address', 'N/A'))
                     return True
                 else:
-                    print(f"   ❌ No address ID in response: {data}")
+                    log.warning("❌ No address ID in response: %s", data)
                     return False
             else:
-                print(f"   ❌ Failed to add address: {response.text[:200]}")
+                log.warning("❌ Failed to add address: %s", response.text[:200])
                 return False
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_13_set_default_address(self):
+    @timed_step
+    async def step_13_set_default_address(self):
         """Set address as default"""
-        print("🏠 Step 13: Set Default Address")
+        log.info("🏠 Step 13: Set Default Address")
         
         if not self.jwt_token or not self.address_id:
-            print("   ❌ Missing JWT token or address ID")
+            log.warning("❌ Missing JWT token or address ID")
             return False
         
         headers = self.generate_sentry_headers("SetDefaultAddressActivity")
-        self.session.headers.update(headers)
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v1/consumer_profile/address/{self.address_id}/set_default"
+            response = await self._request(
+                'POST',
+                f"/v1/consumer_profile/address/{self.address_id}/set_default",
+                headers=headers,
+                idempotent=True
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
             
             if response.status_code == 200:
-                print("   ✅ Address set as default!")
+                log.debug("✅ Address set as default!")
                 return True
             elif response.status_code == 404:
-                print(f"   ⚠️  Address not found (404) - might already be set or invalid ID")
-                print(f"   🔄 Continuing anyway as we have coordinates...")
-                return True  # Continue the flow since we have coordinates
+                log.warning("⚠️  Address not found (404) - might already be set or invalid ID")
+                return False
             else:
-                print(f"   ❌ Failed to set default: {response.text[:200]}")
-                # Don't abort here, we might still be able to continue
-                return True
+                log.warning("❌ Failed to set default: %s", response.text[:200])
+                return False
         except Exception as e:
-            print(f"   Error: {e}")
-            return True  # Continue anyway
+            log.warning("Error: %s", e)
+            return False
     
-    def step_14_homepage_feed(self):
+    @timed_step
+    async def step_14_homepage_feed(self, save_to=None):
         """Get homepage feed with sections"""
-        print("🏠 Step 14: Homepage Feed")
+        log.info("🏠 Step 14: Homepage Feed")
         
         if not self.lat or not self.lng:
-            print("   ❌ No coordinates available")
+            log.warning("❌ No coordinates available")
             return None
         
-        print(f"   📍 Using coordinates: {self.lat}, {self.lng}")
+        log.debug("📍 Using coordinates: %s, %s", self.lat, self.lng)
         
         headers = self.generate_sentry_headers("PlanEnrollmentActivity")
         # Add facets headers for homepage
-        headers.update({
-            'X-Facets-Feature-Item-Carousel': 'true',
-            'X-Facets-Feature-Backend-Driven-Badges': 'true',
-            'X-Facets-Feature-No-Tile': 'true',
-            'X-Facets-Version': '4.0.0',
-            'X-Facets-Feature-Item-Steppers': 'true',
-            'X-Facets-Feature-Quick-Add-Stepper-Variant': 'true',
-            'X-Facets-Feature-Store-Carousel-Redesign-Round-1': 'treatmentVariant2',
-            'X-Facets-Feature-Store-Cell-Redesign-Round-3': 'treatmentVariant3',
-            'X-Gifting-Intent': 'false'
-        })
-        self.session.headers.update(headers)
+        headers.update(HOMEPAGE_FACET_HEADERS)
         
         params = {
             "lat": str(self.lat),
@@ -377,30 +658,94 @@ class OptimizedDoorDashFlow:
         }
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v3/feed/homepage",
+            response = await self._request(
+                'GET',
+                "/v3/feed/homepage",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
-            print(f"   Response Size: {len(response.content)} bytes")
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
+            log.debug("Response Size: %s bytes", len(response.content))
             
             if response.status_code == 200:
-                data = response.json()
-                print("   ✅ Homepage feed obtained!")
+                if save_to:
+                    with self.stage('persistence'):
+                        json_codec.write_raw(save_to, response.content)
+                data = json_codec.loads(response.content)
+                log.debug("✅ Homepage feed obtained!")
                 return data
             else:
-                print(f"   ❌ Failed: {response.text[:200]}")
+                log.warning("❌ Failed: %s", response.text[:200])
                 return None
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return None
     
-    def step_15_content_feed(self, cursor_id=None):
+    @timed_step
+    async def step_14_homepage_cursor(self, section_title=NOW_ON_DOORDASH):
+        """Streaming variant of step 14: read only as far as the section cursor
+        
+        Scans the homepage bytes as they arrive and closes the response as
+        soon as the section's facet_feed/ URI has been seen, never building
+        the full object tree. Returns the cursor, '' when the whole feed was
+        read without finding the section, or None if the request failed.
+        """
+        log.info("🏠 Step 14: Homepage Feed (streaming)")
+        
+        if not self.lat or not self.lng:
+            log.warning("❌ No coordinates available")
+            return None
+        
+        log.debug("📍 Using coordinates: %s, %s", self.lat, self.lng)
+        
+        headers = self.generate_sentry_headers("PlanEnrollmentActivity")
+        headers.update(HOMEPAGE_FACET_HEADERS)
+        
+        params = {
+            "lat": str(self.lat),
+            "lng": str(self.lng)
+        }
+        
+        scanner = SectionCursorScanner(section_title)
+        try:
+            response = await self._request(
+                'GET',
+                "/v3/feed/homepage",
+                headers=headers,
+                params=params,
+                stream=True
+            )
+            try:
+                log.debug("Status: %s", response.status_code)
+                self._note_auth_status(response)
+                
+                if response.status_code != 200:
+                    log.warning("❌ Failed to stream homepage feed")
+                    return None
+                
+                async for chunk in response.aiter_content():
+                    with self.stage('cursor_search'):
+                        cursor = scanner.feed(chunk)
+                    if cursor:
+                        log.debug("⚡ Cursor found after %s bytes - stopped reading", scanner.bytes_seen)
+                        return cursor
+            finally:
+                await response.aclose()
+            
+            log.debug("Response Size: %s bytes", scanner.bytes_seen)
+            return ''
+        except Exception as e:
+            log.warning("Error: %s", e)
+            return None
+    
+    @timed_step
+    async def step_15_content_feed(self, cursor_id=None, save_to=None):
         """Get content feed with stores"""
-        print("🎯 Step 15: Content Feed")
+        log.info("🎯 Step 15: Content Feed")
         
         if not self.lat or not self.lng:
-            print("   ❌ No coordinates available")
+            log.warning("❌ No coordinates available")
             return None
         
         headers = self.generate_sentry_headers("FacetFeedActivity")
@@ -408,7 +753,6 @@ class OptimizedDoorDashFlow:
             'X-Facets-Feature-Backend-Driven-Badges': 'true',
             'X-Facets-Feature-Store-Cell-Redesign-Round-3': 'treatmentVariant3'
         })
-        self.session.headers.update(headers)
         
         params = {
             "lat": str(self.lat),
@@ -418,7 +762,7 @@ class OptimizedDoorDashFlow:
         # Use provided cursor or create default one
         if cursor_id:
             params["id"] = cursor_id
-            print(f"   🎯 Using provided cursor")
+            log.debug("🎯 Using provided cursor")
         else:
             # Default cursor for general content
             default_cursor = {
@@ -435,275 +779,685 @@ class OptimizedDoorDashFlow:
                     "cursor_version": "FACET"
                 }
             }
-            cursor_json = json.dumps(default_cursor)
-            cursor_b64 = base64.b64encode(cursor_json.encode()).decode()
-            params["id"] = cursor_b64
-            print(f"   🎯 Using default cursor")
+            params["id"] = FacetCursor(default_cursor).encode()
+            log.debug("🎯 Using default cursor")
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v2/feed/",
+            response = await self._request(
+                'GET',
+                "/v2/feed/",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
-            print(f"   Response Size: {len(response.content)} bytes")
+            log.debug("Status: %s", response.status_code)
+            self._note_auth_status(response)
+            log.debug("Response Size: %s bytes", len(response.content))
             
             if response.status_code == 200:
-                data = response.json()
-                print("   ✅ Content feed obtained!")
+                if save_to:
+                    with self.stage('persistence'):
+                        json_codec.write_raw(save_to, response.content)
+                data = json_codec.loads(response.content)
+                log.debug("✅ Content feed obtained!")
                 return data
             else:
-                print(f"   ❌ Failed: {response.text[:200]}")
+                log.warning("❌ Failed: %s", response.text[:200])
                 return None
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return None
 
-
-def find_now_on_doordash_cursor(homepage_data):
-    """Find the 'Now on DoorDash' section cursor"""
-    print("🔍 Searching for 'Now on DoorDash' section...")
     
-    def search_for_now_on_doordash(item, path=""):
-        """Recursively search for 'Now on DoorDash' section"""
-        if isinstance(item, dict):
-            # Check if this item has text with "Now on DoorDash" title
-            if 'text' in item and isinstance(item['text'], dict):
-                title = item['text'].get('title', '').strip()
-                if title and 'now on doordash' in title.lower():
-                    print(f"   🎯 Found section: '{title}' at path: {path}")
-                    
-                    # Look for cursor in events
-                    if 'events' in item and 'click' in item['events']:
-                        click_data = item['events']['click'].get('data', {})
-                        if 'uri' in click_data:
-                            uri = click_data['uri']
-                            print(f"   📍 URI: {uri}")
-                            
-                            # Extract cursor from facet_feed/ URI
-                            if uri.startswith('facet_feed/'):
-                                cursor = uri[11:]  # Remove 'facet_feed/' prefix
-                                if cursor.endswith('/'):
-                                    cursor = cursor[:-1]  # Remove trailing slash
-                                print(f"   ✅ Extracted cursor for 'Now on DoorDash'!")
-                                return cursor
-            
-            # Recursively search in nested items
-            for key, value in item.items():
-                if isinstance(value, (dict, list)):
-                    result = search_for_now_on_doordash(value, f"{path}.{key}")
-                    if result:
-                        return result
-        
-        elif isinstance(item, list):
-            for i, sub_item in enumerate(item):
-                result = search_for_now_on_doordash(sub_item, f"{path}[{i}]")
-                if result:
-                    return result
+    async def iter_content_pages(self, cursor_id=None, max_pages=None, save_to=None, fan_out=1):
+        """Yield the pages of a facet feed in order (step 15, paginated)
         
-        return None
-    
-    cursor = search_for_now_on_doordash(homepage_data)
-    if cursor:
-        print("   🎉 'Now on DoorDash' cursor found!")
-        return cursor
-    else:
-        print("   ❌ 'Now on DoorDash' section not found in this location")
-        return None
-
-
-def extract_stores_from_feed(feed_data, source_name="feed"):
-    """Extract store information from feed data"""
-    print(f"📦 Extracting stores from {source_name}...")
-    
-    stores = []
-    
-    def extract_store_info(item, path=""):
-        """Recursively extract store information"""
-        if isinstance(item, dict):
-            store_info = {}
-            
-            # Extract basic info
-            if 'text' in item and isinstance(item['text'], dict):
-                text_data = item['text']
-                store_info['name'] = text_data.get('title', '').strip()
-                store_info['subtitle'] = text_data.get('subtitle', '').strip()
-            
-            # Extract custom data (ratings, etc.)
-            if 'custom' in item and isinstance(item['custom'], dict):
-                custom_data = item['custom']
-                store_info['rating'] = custom_data.get('rating')
-                store_info['delivery_fee'] = custom_data.get('delivery_fee')
-                store_info['delivery_time'] = custom_data.get('delivery_time')
-            
-            # Extract store ID and other identifiers
-            if 'events' in item and 'click' in item['events']:
-                click_data = item['events']['click'].get('data', {})
-                store_info['store_id'] = click_data.get('store_id')
-                store_info['uri'] = click_data.get('uri')
-            
-            # If we have a store name, this is likely a store
-            if store_info.get('name') and len(store_info.get('name', '')) > 2:
-                store_info['source'] = source_name
-                store_info['path'] = path
-                stores.append(store_info)
-            
-            # Recursively search nested items
-            for key, value in item.items():
-                if isinstance(value, (dict, list)):
-                    extract_store_info(value, f"{path}.{key}")
+        With fan_out=1 it follows page.next.data.cursor, prefetching page
+        N+1 while page N is being consumed. With fan_out > 1 the offset step
+        is read off the first page's next cursor and up to `fan_out` pages
+        are kept in flight, their cursors generated with FacetCursor instead
+        of waiting for each page to name the next one. Stops on the last
+        page (no next cursor), on a failed page, or after `max_pages`.
+        `save_to` only applies to the first page. Every page that comes back
+        is added to `self.pages_fetched`, the flow's running total across
+        crawls (for metrics, not for judging one crawl).
+        """
+        in_flight = deque([
+            asyncio.ensure_future(self.step_15_content_feed(cursor_id, save_to=save_to))
+        ])
+        requested = 1
+        next_offset = page_size = template = None
+        
+        def can_request():
+            return max_pages is None or requested < max_pages
         
-        elif isinstance(item, list):
-            for i, sub_item in enumerate(item):
-                extract_store_info(sub_item, f"{path}[{i}]")
+        try:
+            while in_flight:
+                data = await in_flight.popleft()
+                if not data:
+                    return
+                self.pages_fetched += 1
+                next_cursor = next_page_cursor(data)
+                
+                if next_cursor and fan_out > 1 and template is None:
+                    try:
+                        template = FacetCursor.decode(next_cursor)
+                        start = FacetCursor.decode(cursor_id).offset if cursor_id else 0
+                        page_size = template.offset - start
+                    except ValueError:
+                        page_size = 0
+                    if page_size > 0:
+                        next_offset = template.offset
+                        log.debug("🔀 Fanning out %s pages at a time (%s per page)", fan_out, page_size)
+                    else:
+                        fan_out = 1
+                
+                # Keep the next page(s) in flight while this one is consumed
+                if next_cursor and next_offset is not None:
+                    while len(in_flight) < fan_out and can_request():
+                        cursor = template.with_offset(next_offset).encode()
+                        in_flight.append(asyncio.ensure_future(self.step_15_content_feed(cursor)))
+                        next_offset += page_size
+                        requested += 1
+                elif next_cursor and next_cursor != cursor_id and can_request():
+                    cursor_id = next_cursor
+                    in_flight.append(asyncio.ensure_future(self.step_15_content_feed(next_cursor)))
+                    requested += 1
+                
+                yield data
+                if not next_cursor:
+                    return
+        finally:
+            for fetch in in_flight:
+                fetch.cancel()
     
-    extract_store_info(feed_data)
+    async def iter_content_feed(self, cursor_id=None, max_pages=None, max_stores=None,
+                                source_name="Now on DoorDash", save_to=None, fan_out=1,
+                                stats=None):
+        """Yield stores from every page of a facet feed as the pages arrive
+        
+        Pages come from iter_content_pages (same cursor / max_pages /
+        save_to / fan_out arguments). Stores are de-duplicated across pages;
+        the crawl also stops on a page with no new stores or once
+        `max_stores` stores have been yielded. When a `stats` dict is
+        given, stats['pages'] holds the number of pages this crawl got back.
+        """
+        pages = self.iter_content_pages(cursor_id, max_pages, save_to, fan_out)
+        seen = set()
+        yielded = 0
+        page = 0
+        if stats is not None:
+            stats['pages'] = 0
+        try:
+            async for data in pages:
+                page += 1
+                if stats is not None:
+                    stats['pages'] = page
+                with self.stage('extraction'):
+                    _, stores = walk_feed(data, collect_sections=False, source_name=source_name)
+                new_stores = 0
+                for store in unique_stores(stores, seen):
+                    new_stores += 1
+                    yield store
+                    yielded += 1
+                    if max_stores is not None and yielded >= max_stores:
+                        return
+                log.debug("📄 Page %s: %s new stores", page, new_stores)
+                if not new_stores:
+                    return
+        finally:
+            await pages.aclose()
     
-    # Remove duplicates based on name
-    unique_stores = []
-    seen_names = set()
-    for store in stores:
-        name = store.get('name', '').lower()
-        if name and name not in seen_names:
-            seen_names.add(name)
-            unique_stores.append(store)
+    async def fetch_sections(self, sections, concurrency=4, max_pages=None, max_stores=None):
+        """Crawl several homepage sections at once, at most `concurrency` at a time
+        
+        `sections` are dicts from feed_parser.list_sections. Returns
+        {section key: [Store, ...]} in the order given; a section whose
+        crawl failed maps to an empty list.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def crawl(section):
+            async with semaphore:
+                log.debug("📚 Crawling section '%s'", section['key'])
+                try:
+                    return [
+                        store async for store in self.iter_content_feed(
+                            section['cursor'],
+                            max_pages=max_pages,
+                            max_stores=max_stores,
+                            source_name=section['key'],
+                            fan_out=self.page_fan_out
+                        )
+                    ]
+                except Exception as e:
+                    log.error("❌ Section '%s' crashed: %s", section['key'], e)
+                    return []
+        
+        results = await asyncio.gather(*(crawl(section) for section in sections))
+        return {section['key']: stores for section, stores in zip(sections, results)}
     
-    print(f"   📊 Found {len(unique_stores)} unique stores")
-    return unique_stores
+    async def crawl_sections(self, titles=None, concurrency=4, save_to=None):
+        """Step 14 once, then step 15 for the chosen homepage sections
+        
+        `titles` are matched case-insensitively against the section keys
+        (all sections when None). Returns {section key: [Store, ...]}, or
+        None when the homepage could not be fetched or the guest token was
+        rejected during the crawl, so the caller can refresh the guest and
+        try again instead of taking the sections as empty.
+        """
+        homepage_data = await self.step_14_homepage_feed(save_to=save_to)
+        if not homepage_data:
+            return None
+        
+        sections = list_sections(homepage_data)
+        log.info("🗂️  Homepage sections: %s", ', '.join(section['key'] for section in sections))
+        if titles is not None:
+            wanted = {title.lower() for title in titles}
+            sections = [section for section in sections if section['key'].lower() in wanted]
+        if not sections:
+            log.warning("⚠️  None of the requested sections are on this homepage")
+            return {}
+        
+        results = await self.fetch_sections(sections, concurrency, self.max_pages, self.max_stores)
+        if self.token_rejected:
+            log.warning("❌ Guest token rejected while crawling sections")
+            return None
+        return results
 
+class OptimizedDoorDashFlow(SyncFacade):
+    """Synchronous wrapper around AsyncOptimizedDoorDashFlow"""
+    async_class = AsyncOptimizedDoorDashFlow
 
-def run_optimized_flow(address_query="Elms Bup 10439"):
-    """Run the optimized flow to get 'Now on DoorDash' stores"""
-    print("🚀 Starting Optimized DoorDash Flow")
-    print("=" * 60)
-    
-    flow = OptimizedDoorDashFlow()
-    
+
+async def _bootstrap_guest(flow, check_addresses=True):
+    """Steps 1, 2 and 8: end up holding a working guest token"""
     # Step 1: Optional health check
-    flow.step_1_health_check()
+    await flow.step_1_health_check()
     
-    # Step 2: CRITICAL - Create guest user
-    if not flow.step_2_create_guest():
-        print("❌ Failed to create guest user - ABORTING")
-        return None
+    # Step 2: CRITICAL - Lease a pooled guest or create a new one
+    if not await flow.acquire_guest():
+        log.error("❌ Failed to create guest user - ABORTING")
+        return False
     
-    # Step 8: Check addresses endpoint
-    if not flow.step_8_get_addresses():
-        print("❌ Address check failed - ABORTING")
-        return None
+    if not check_addresses and not flow.guest_from_pool:
+        return True
     
-    # Step 9: Address autocomplete
-    place_id = flow.step_9_address_autocomplete(address_query)
-    if not place_id:
-        print("❌ Address autocomplete failed - ABORTING")
-        return None
-    
-    # Step 10: Get address details and coordinates
-    if not flow.step_10_address_details(place_id):
-        print("❌ Failed to get address details - ABORTING")
-        return None
+    # Step 8: Check addresses endpoint (also proves a pooled token still works)
+    if not await flow.step_8_get_addresses():
+        if not flow.token_rejected:
+            log.error("❌ Address check failed - ABORTING")
+            return False
+        
+        log.info("🔄 Guest token rejected - creating a fresh guest")
+        await flow.release_guest()
+        if not await flow.step_2_create_guest() or not await flow.step_8_get_addresses():
+            log.error("❌ Address check failed - ABORTING")
+            return False
     
+    return True
+
+
+async def _register_address(flow, place_id):
+    """Steps 11-13: validate, add and default the address on the guest profile"""
     # Step 11: Validate address
-    if not flow.step_11_validate_address(place_id):
-        print("❌ Address validation failed - ABORTING")
-        return None
+    if not await flow.step_11_validate_address(place_id):
+        log.error("❌ Address validation failed - ABORTING")
+        return False
     
     # Step 12: Add address to profile
-    if not flow.step_12_add_address(place_id):
-        print("❌ Failed to add address - ABORTING")
-        return None
+    if not await flow.step_12_add_address(place_id):
+        log.error("❌ Failed to add address - ABORTING")
+        return False
     
     # Step 13: Set as default address
-    if not flow.step_13_set_default_address():
-        print("❌ Failed to set default address - continuing anyway")
+    if not await flow.step_13_set_default_address():
+        log.warning("❌ Failed to set default address - continuing anyway")
         # Don't abort here, continue with the flow
     
-    # Step 14: Get homepage feed
-    homepage_data = flow.step_14_homepage_feed()
-    if not homepage_data:
-        print("❌ Failed to get homepage feed - ABORTING")
+    return True
+
+
+async def _run_optimized_steps(flow, address_query, save_artifacts):
+    """Drive one flow instance through the optimized step sequence"""
+    with flow.stage('bootstrap'):
+        bootstrapped = await _bootstrap_guest(flow)
+    if not bootstrapped:
         return None
     
-    # Save homepage data for analysis
-    with open('homepage_feed.json', 'w', encoding='utf-8') as f:
-        json.dump(homepage_data, f, indent=2)
-    print("💾 Homepage feed saved to homepage_feed.json")
+    return await _run_address_steps(flow, address_query, save_artifacts)
+
+
+async def _run_address_steps(flow, address_query, save_artifacts):
+    """Steps 9-15 for one address on a guest that is already bootstrapped"""
+    # Steps 9-10: Address autocomplete + details (skipped on a geocode cache hit)
+    with flow.stage('geocode'):
+        place_id = await flow.resolve_address(address_query)
+    if not place_id:
+        log.error("❌ Address lookup failed - ABORTING")
+        return None
     
-    # Find 'Now on DoorDash' section
-    now_cursor = find_now_on_doordash_cursor(homepage_data)
+    with flow.stage('address'):
+        registered = await _register_address(flow, place_id)
+    if not registered:
+        return None
+    
+    return await _collect_now_on_doordash_stores(flow, save_artifacts)
+
+
+async def _collect_now_on_doordash_stores(flow, save_artifacts):
+    """Steps 14-15: homepage feed -> 'Now on DoorDash' cursor -> stores"""
+    if flow.stream_homepage:
+        # Step 14 (streaming): stop reading the homepage once the cursor is seen
+        with flow.stage('homepage'):
+            now_cursor = await flow.step_14_homepage_cursor()
+        if now_cursor is None:
+            log.error("❌ Failed to get homepage feed - ABORTING")
+            return None
+    else:
+        # Step 14: Get homepage feed
+        with flow.stage('homepage'):
+            homepage_data = await flow.step_14_homepage_feed(
+                save_to='homepage_feed.json' if save_artifacts else None
+            )
+        if not homepage_data:
+            log.error("❌ Failed to get homepage feed - ABORTING")
+            return None
+        
+        if save_artifacts:
+            log.info("💾 Homepage feed saved to homepage_feed.json")
+        
+        # Find 'Now on DoorDash' section
+        with flow.stage('cursor_search'):
+            now_cursor = find_now_on_doordash_cursor(homepage_data)
     
     if now_cursor:
-        # Step 15: Get 'Now on DoorDash' content feed
-        print("\n🎯 Getting 'Now on DoorDash' content...")
-        now_feed_data = flow.step_15_content_feed(now_cursor)
-        
-        if now_feed_data:
-            # Save the specific feed data
-            with open('now_on_doordash_feed.json', 'w', encoding='utf-8') as f:
-                json.dump(now_feed_data, f, indent=2)
-            print("💾 'Now on DoorDash' feed saved to now_on_doordash_feed.json")
-            
-            # Extract stores
-            stores = extract_stores_from_feed(now_feed_data, "Now on DoorDash")
+        # Step 15: Crawl every page of the 'Now on DoorDash' content feed
+        log.info("🎯 Getting 'Now on DoorDash' content...")
+        crawl = {}
+        with flow.stage('section_feed'):
+            stores = [
+                store async for store in flow.iter_content_feed(
+                    now_cursor,
+                    max_pages=flow.max_pages,
+                    max_stores=flow.max_stores,
+                    fan_out=flow.page_fan_out,
+                    save_to='now_on_doordash_feed.json' if save_artifacts else None,
+                    stats=crawl
+                )
+            ]
+        
+        # Pages of this crawl only: a batch flow's pages_fetched spans every address
+        if crawl['pages']:
+            if save_artifacts:
+                log.info("💾 'Now on DoorDash' feed (first page) saved to now_on_doordash_feed.json")
+            log.info("📚 %s unique stores across %s page(s)", len(stores), crawl['pages'])
             
             if stores:
                 # Save stores data
-                with open('now_on_doordash_stores.json', 'w', encoding='utf-8') as f:
-                    json.dump(stores, f, indent=2)
-                print(f"💾 {len(stores)} stores saved to now_on_doordash_stores.json")
+                if save_artifacts:
+                    with flow.stage('persistence'):
+                        json_codec.dump_file('now_on_doordash_stores.json',
+                                             [store.to_dict() for store in stores])
+                    log.info("💾 %s stores saved to now_on_doordash_stores.json", len(stores))
                 
                 # Display summary
-                print("\n" + "=" * 60)
-                print("🎉 SUCCESS! 'Now on DoorDash' Stores Found:")
-                print("=" * 60)
+                log.info("🎉 SUCCESS! %s 'Now on DoorDash' stores at %s", len(stores),
+                         flow.printable_address or (flow.lat, flow.lng), extra=SUMMARY)
                 for i, store in enumerate(stores[:10], 1):  # Show first 10
-                    name = store.get('name', 'Unknown')
-                    rating = store.get('rating', 'N/A')
-                    delivery_time = store.get('delivery_time', 'N/A')
-                    print(f"   {i:2d}. {name} (⭐ {rating}) - {delivery_time}")
+                    rating = store.rating if store.rating is not None else 'N/A'
+                    delivery_time = store.delivery_time if store.delivery_time is not None else 'N/A'
+                    log.info("%2d. %s (⭐ %s) - %s", i, store.name, rating, delivery_time)
                 
                 if len(stores) > 10:
-                    print(f"   ... and {len(stores) - 10} more stores")
-                print("=" * 60)
+                    log.info("... and %s more stores", len(stores) - 10)
                 
                 return stores
             else:
-                print("❌ No stores found in 'Now on DoorDash' feed")
+                log.warning("❌ No stores found in 'Now on DoorDash' feed")
                 return None
         else:
-            print("❌ Failed to get 'Now on DoorDash' content feed")
+            log.warning("❌ Failed to get 'Now on DoorDash' content feed")
             return None
     else:
-        print("❌ 'Now on DoorDash' section not found")
-        print("💡 This might be location-dependent or time-dependent")
+        log.warning("❌ 'Now on DoorDash' section not found")
+        log.info("💡 This might be location-dependent or time-dependent")
         
         # Fallback: Get general content feed
-        print("\n🔄 Fallback: Getting general content feed...")
-        general_feed = flow.step_15_content_feed()
+        log.info("🔄 Fallback: Getting general content feed...")
+        with flow.stage('section_feed'):
+            general_feed = await flow.step_15_content_feed(
+                save_to='general_content_feed.json' if save_artifacts else None
+            )
         
         if general_feed:
-            with open('general_content_feed.json', 'w', encoding='utf-8') as f:
-                json.dump(general_feed, f, indent=2)
-            print("💾 General content feed saved to general_content_feed.json")
+            if save_artifacts:
+                log.info("💾 General content feed saved to general_content_feed.json")
             
-            stores = extract_stores_from_feed(general_feed, "General Feed")
+            with flow.stage('extraction'):
+                stores = extract_stores_from_feed(general_feed, "General Feed")
             if stores:
-                with open('general_stores.json', 'w', encoding='utf-8') as f:
-                    json.dump(stores, f, indent=2)
-                print(f"💾 {len(stores)} general stores saved to general_stores.json")
+                if save_artifacts:
+                    with flow.stage('persistence'):
+                        json_codec.dump_file('general_stores.json',
+                                             [store.to_dict() for store in stores])
+                    log.info("💾 %s general stores saved to general_stores.json", len(stores))
+                log.info("📦 %s general feed stores at %s", len(stores),
+                         flow.printable_address or (flow.lat, flow.lng), extra=SUMMARY)
                 return stores
         
         return None
 
 
+async def _collect_sections(flow, titles, concurrency, save_artifacts):
+    """Steps 14-15 for every chosen homepage section, crawled concurrently"""
+    results = await flow.crawl_sections(
+        titles,
+        concurrency,
+        save_to='homepage_feed.json' if save_artifacts else None
+    )
+    if results is None:
+        log.error("❌ Failed to get homepage sections - ABORTING")
+        return None
+    
+    for key, stores in results.items():
+        log.info("%-32s %4d stores", key, len(stores))
+    log.info("🗂️  %s section(s), %s stores", len(results),
+             sum(len(stores) for stores in results.values()), extra=SUMMARY)
+    
+    if save_artifacts:
+        json_codec.dump_file('section_stores.json', {
+            key: [store.to_dict() for store in stores] for key, stores in results.items()
+        })
+        log.info("💾 %s sections saved to section_stores.json", len(results))
+    return results
+
+
+async def run_optimized_flow_async(address_query="Elms Bup 10439", save_artifacts=True,
+                                   **flow_options):
+    """Run the optimized flow to get 'Now on DoorDash' stores (coroutine)
+    
+    `flow_options` go to AsyncOptimizedDoorDashFlow. With a session_pool
+    the guest is leased from disk and returned afterwards, so step 2 only
+    runs when the pool is empty or a pooled token has been rejected. With a
+    geocode_cache, repeated queries skip steps 9 and 10.
+    """
+    log.info("🚀 Starting Optimized DoorDash Flow")
+    
+    async with AsyncOptimizedDoorDashFlow(**flow_options) as flow:
+        with span('run_optimized_flow', flow.tracer, flow.trace_id, address_query=address_query):
+            try:
+                return await _run_optimized_steps(flow, address_query, save_artifacts)
+            finally:
+                await flow.release_guest()
+
+
+async def run_optimized_flows(address_queries, concurrency=10, save_artifacts=False,
+                              **flow_options):
+    """Run one optimized flow per address, at most `concurrency` at a time
+    
+    Results come back in the same order as `address_queries`; a flow that
+    fails or raises yields None. Artifacts are off by default because
+    concurrent flows would overwrite each other's JSON files. All flows
+    share one session (its connections, not its cookies) unless `session`
+    is given.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    session = flow_options.pop('session', None)
+    owns_session = session is None
+    if owns_session:
+        session = new_session()
+    
+    async def run_one(address_query):
+        async with semaphore:
+            try:
+                return await run_optimized_flow_async(address_query, save_artifacts,
+                                                      session=session, **flow_options)
+            except Exception as e:
+                log.error("❌ Flow for '%s' crashed: %s", address_query, e)
+                return None
+    
+    try:
+        return await asyncio.gather(*(run_one(query) for query in address_queries))
+    finally:
+        if owns_session:
+            await session.close()
+
+
+async def run_coordinates_flow_async(lat=None, lng=None, place=None, save_artifacts=True,
+                                     **flow_options):
+    """Coordinates mode: guest token -> homepage/'Now on DoorDash' feeds
+    
+    Skips geocoding and the address writes (steps 9-13) entirely. Pass
+    lat/lng, or a `place` dict such as GeocodeCache.get_place() returns.
+    """
+    log.info("🚀 Starting DoorDash Flow (coordinates mode)")
+    
+    async with AsyncOptimizedDoorDashFlow(**flow_options) as flow:
+        flow.set_coordinates(lat, lng, place)
+        with span('run_coordinates_flow', flow.tracer, flow.trace_id, lat=flow.lat, lng=flow.lng):
+            try:
+                if not await _bootstrap_guest(flow, check_addresses=False):
+                    return None
+                return await _collect_now_on_doordash_stores(flow, save_artifacts)
+            finally:
+                await flow.release_guest()
+
+
+async def run_sections_flow_async(lat=None, lng=None, place=None, titles=None, concurrency=4,
+                                  save_artifacts=False, **flow_options):
+    """Coordinates mode for many carousels: one homepage fetch, many section crawls
+    
+    Lists every section of the homepage and crawls `titles` (all of them
+    when None; matched case-insensitively against the section keys), at
+    most `concurrency` at a time. Returns {section key: [Store, ...]}.
+    """
+    log.info("🚀 Starting DoorDash Flow (sections mode)")
+    
+    async with AsyncOptimizedDoorDashFlow(**flow_options) as flow:
+        flow.set_coordinates(lat, lng, place)
+        with span('run_sections_flow', flow.tracer, flow.trace_id, lat=flow.lat, lng=flow.lng):
+            try:
+                if not await _bootstrap_guest(flow, check_addresses=False):
+                    return None
+                return await _collect_sections(flow, titles, concurrency, save_artifacts)
+            finally:
+                await flow.release_guest()
+
+
+async def run_batch_flow_async(address_queries, save_artifacts=False, addresses_per_guest=None,
+                               **flow_options):
+    """Pull 'Now on DoorDash' stores for many addresses on a single guest
+    
+    Each address is added to the same guest profile and made its default
+    before the feeds are fetched, so a guest is created once per batch (or
+    once per `addresses_per_guest` addresses) instead of once per query.
+    Results come back in the same order as `address_queries`.
+    """
+    log.info("🚀 Starting DoorDash Batch Flow (%s addresses)", len(address_queries))
+    
+    results = []
+    async with AsyncOptimizedDoorDashFlow(**flow_options) as flow:
+        with span('run_batch_flow', flow.tracer, flow.trace_id, addresses=len(address_queries)):
+            try:
+                if not await _bootstrap_guest(flow):
+                    return [None] * len(address_queries)
+                
+                addresses_on_guest = 0
+                for address_query in address_queries:
+                    log.info("📍 Batch address %s/%s: '%s'",
+                             len(results) + 1, len(address_queries), address_query)
+                    
+                    if addresses_per_guest and addresses_on_guest >= addresses_per_guest:
+                        log.info("🔄 Guest holds enough addresses - rotating to another guest")
+                        if not await flow.rotate_guest():
+                            break
+                        addresses_on_guest = 0
+                    
+                    stores = await _run_address_steps(flow, address_query, save_artifacts)
+                    if stores is None and flow.token_rejected:
+                        log.info("🔄 Guest token rejected mid-batch - switching guests")
+                        if not await flow.rotate_guest():
+                            break
+                        addresses_on_guest = 0
+                        stores = await _run_address_steps(flow, address_query, save_artifacts)
+                    
+                    addresses_on_guest += 1
+                    results.append(stores)
+            finally:
+                await flow.release_guest()
+        
+        guests_created = flow.guests_created
+    
+    results.extend([None] * (len(address_queries) - len(results)))
+    succeeded = sum(1 for stores in results if stores)
+    log.info("📊 Batch done: %s/%s addresses, %s guest(s) created",
+             succeeded, len(address_queries), guests_created, extra=SUMMARY)
+    return results
+
+
+async def run_batch_flows(address_queries, guests=4, **batch_options):
+    """Spread a batch over `guests` concurrent single-guest batches
+    
+    Addresses are dealt round-robin so each guest gets an even share;
+    results come back in the original order. The batches share one
+    session unless `session` is given.
+    """
+    address_queries = list(address_queries)
+    shares = [address_queries[i::guests] for i in range(guests)]
+    session = batch_options.pop('session', None)
+    owns_session = session is None
+    if owns_session:
+        session = new_session()
+    try:
+        batches = await asyncio.gather(*(
+            run_batch_flow_async(share, session=session, **batch_options)
+            for share in shares if share
+        ))
+    finally:
+        if owns_session:
+            await session.close()
+    
+    results = [None] * len(address_queries)
+    for i, batch in enumerate(batches):
+        results[i::guests] = batch
+    return results
+
+
+def run_batch_flow(address_queries, addresses_per_guest=None, **flow_options):
+    """Run the batch flow (one guest, many addresses) synchronously"""
+    return asyncio.run(run_batch_flow_async(
+        address_queries,
+        addresses_per_guest=addresses_per_guest,
+        **flow_options
+    ))
+
+
+def _store_keys(stores):
+    return {store_key(store) for store in stores or []}
+
+
+async def verify_coordinates_mode(address_queries, sample_size=None, **flow_options):
+    """Check that coordinates mode returns the same stores as the full flow
+    
+    For each sampled location the full flow (steps 1-15) runs on one fresh
+    guest and coordinates mode runs on a second fresh guest that never
+    registered the address. Returns a report with per-location store-set
+    overlap; `all_match` is True only when every location matched exactly.
+    Do not pass a session_pool: both sides need a guest of their own.
+    """
+    address_queries = list(address_queries)
+    if sample_size is not None and sample_size < len(address_queries):
+        address_queries = random.sample(address_queries, sample_size)
+    
+    locations = []
+    for address_query in address_queries:
+        async with AsyncOptimizedDoorDashFlow(**flow_options) as flow:
+            full_stores = await _run_optimized_steps(flow, address_query, save_artifacts=False)
+            lat, lng = flow.lat, flow.lng
+        
+        if lat is None or lng is None:
+            locations.append({'address_query': address_query, 'error': 'geocoding failed'})
+            continue
+        
+        coord_stores = await run_coordinates_flow_async(lat, lng, save_artifacts=False,
+                                                        **flow_options)
+        full_keys, coord_keys = _store_keys(full_stores), _store_keys(coord_stores)
+        union = full_keys | coord_keys
+        locations.append({
+            'address_query': address_query,
+            'lat': lat,
+            'lng': lng,
+            'full_flow_stores': len(full_keys),
+            'coordinates_mode_stores': len(coord_keys),
+            'jaccard': len(full_keys & coord_keys) / len(union) if union else 1.0,
+            'match': full_keys == coord_keys
+        })
+    
+    report = {
+        'locations': locations,
+        'all_match': bool(locations) and all(loc.get('match') for loc in locations)
+    }
+    
+    log.info("🔬 Coordinates mode vs full flow")
+    for loc in locations:
+        if 'error' in loc:
+            log.warning("⚠️  %s: %s", loc['address_query'], loc['error'])
+        else:
+            mark = "✅" if loc['match'] else "❌"
+            log.info("%s %s: %s vs %s stores (jaccard %.2f)", mark, loc['address_query'],
+                     loc['full_flow_stores'], loc['coordinates_mode_stores'], loc['jaccard'])
+    return report
+
+
+def run_coordinates_flow(lat=None, lng=None, place=None, **flow_options):
+    """Run coordinates mode to get 'Now on DoorDash' stores"""
+    return asyncio.run(run_coordinates_flow_async(lat, lng, place, **flow_options))
+
+
+def run_sections_flow(lat=None, lng=None, place=None, titles=None, **options):
+    """Crawl several homepage sections for one location synchronously"""
+    return asyncio.run(run_sections_flow_async(lat, lng, place, titles, **options))
+
+
+def run_optimized_flow(address_query="Elms Bup 10439", **flow_options):
+    """Run the optimized flow to get 'Now on DoorDash' stores"""
+    return asyncio.run(run_optimized_flow_async(address_query, **flow_options))
+
+
 if __name__ == "__main__":
-    print("🎯 Optimized DoorDash 'Now on DoorDash' Extractor")
-    print("📍 Testing with: Elms Bup 10439")
-    print()
+    parser = argparse.ArgumentParser(description="Extract 'Now on DoorDash' stores for one address")
+    add_logging_arguments(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    profiler = StageProfiler(args.profile).start() if args.profile else None
+    
+    log.info("🎯 Optimized DoorDash 'Now on DoorDash' Extractor")
+    log.info("📍 Testing with: Elms Bup 10439")
     
-    stores = run_optimized_flow("Elms Bup 10439")
+    geocode_cache = GeocodeCache()
+    tracer = Tracer()
+    stores = run_optimized_flow(
+        "Elms Bup 10439",
+        session_pool=GuestSessionPool(),
+        geocode_cache=geocode_cache,
+        tracer=tracer,
+        profiler=profiler
+    )
+    if profiler is not None:
+        profiler.write_reports()
+        profiler.stop()
+    log.info("📈 Geocode cache: %s", geocode_cache.stats())
+    log.info("🚦 Rate limiter: %s", RateLimiter.shared().stats())
+    log.info("🔁 Retries: %s", RequestExecutor.shared().stats())
+    MetricsRegistry.shared().dump_json('run_metrics.json')
+    MetricsRegistry.shared().write_prometheus('run_metrics.prom')
+    log.info("📈 Metrics saved to run_metrics.json / run_metrics.prom")
+    log.info("%s", tracer.waterfall())
+    tracer.export_chrome('flow_trace.json')
+    log.info("🌊 Trace saved to flow_trace.json (open in chrome://tracing or ui.perfetto.dev)")
     
     if stores:
-        print(f"\n✅ Successfully extracted {len(stores)} stores!")
+        log.info("✅ Successfully extracted %s stores!", len(stores))
     else:
-        print("\n❌ Failed to extract stores")
+        log.warning("❌ Failed to extract stores")
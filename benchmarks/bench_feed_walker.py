@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark: iterative single-pass feed walker vs the old recursive traversals
+Usage: python benchmarks/bench_feed_walker.py [--repeat N] [--scale K]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from feed_parser import Store, walk_feed, NOW_ON_DOORDASH
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raw_homepage_feed.json')
+
+
+def legacy_find_cursor(homepage_data):
+    """The original recursive 'Now on DoorDash' search (prints removed)"""
+    def search(item, path=""):
+        if isinstance(item, dict):
+            if 'text' in item and isinstance(item['text'], dict):
+                title = item['text'].get('title', '').strip()
+                if title and 'now on doordash' in title.lower():
+                    if 'events' in item and 'click' in item['events']:
+                        click_data = item['events']['click'].get('data', {})
+                        if 'uri' in click_data:
+                            uri = click_data['uri']
+                            if uri.startswith('facet_feed/'):
+                                cursor = uri[11:]
+                                if cursor.endswith('/'):
+                                    cursor = cursor[:-1]
+                                return cursor
+            for key, value in item.items():
+                if isinstance(value, (dict, list)):
+                    result = search(value, f"{path}.{key}")
+                    if result:
+                        return result
+        elif isinstance(item, list):
+            for i, sub_item in enumerate(item):
+                result = search(sub_item, f"{path}[{i}]")
+                if result:
+                    return result
+        return None
+
+    return search(homepage_data)
+
+
+def legacy_extract_stores(feed_data, source_name="feed"):
+    """The original recursive store extraction + dedup (prints removed)"""
+    stores = []
+
+    def extract(item, path=""):
+        if isinstance(item, dict):
+            store_info = {}
+            if 'text' in item and isinstance(item['text'], dict):
+                text_data = item['text']
+                store_info['name'] = text_data.get('title', '').strip()
+                store_info['subtitle'] = text_data.get('subtitle', '').strip()
+            if 'custom' in item and isinstance(item['custom'], dict):
+                custom_data = item['custom']
+                store_info['rating'] = custom_data.get('rating')
+                store_info['delivery_fee'] = custom_data.get('delivery_fee')
+                store_info['delivery_time'] = custom_data.get('delivery_time')
+            if 'events' in item and 'click' in item['events']:
+                click_data = item['events']['click'].get('data', {})
+                store_info['store_id'] = click_data.get('store_id')
+                store_info['uri'] = click_data.get('uri')
+            if store_info.get('name') and len(store_info.get('name', '')) > 2:
+                store_info['source'] = source_name
+                store_info['path'] = path
+                stores.append(store_info)
+            for key, value in item.items():
+                if isinstance(value, (dict, list)):
+                    extract(value, f"{path}.{key}")
+        elif isinstance(item, list):
+            for i, sub_item in enumerate(item):
+                extract(sub_item, f"{path}[{i}]")
+
+    extract(feed_data)
+
+    unique_stores = []
+    seen_names = set()
+    for store in stores:
+        name = store.get('name', '').lower()
+        if name and name not in seen_names:
+            seen_names.add(name)
+            unique_stores.append(store)
+    return unique_stores
+
+
+def new_find_cursor(homepage_data):
+    sections, _ = walk_feed(homepage_data, collect_stores=False, stop_at_title=NOW_ON_DOORDASH)
+    for section in sections:
+        if NOW_ON_DOORDASH in section['title'].lower():
+            return section['cursor']
+    return None
+
+
+def new_extract_stores(feed_data, source_name="feed"):
+    return walk_feed(feed_data, collect_sections=False, source_name=source_name)[1]
+
+
+def same_stores(legacy_stores, new_stores):
+    """Field-by-field comparison of legacy dicts and Store records
+
+    The one intended difference is store_id: Store falls back to
+    custom.store_id, which the legacy extractor never read, so a store_id
+    may only differ where the legacy one was missing. The legacy extractor
+    also de-duplicates by name only, so this holds for feeds (like the
+    fixture) without same-name stores that have distinct store_ids.
+    """
+    fields = [field for field in Store.__slots__ if field != 'store_id']
+    if [[d.get(field) for field in fields] for d in legacy_stores] != \
+            [[getattr(store, field) for field in fields] for store in new_stores]:
+        return False
+    return all(d.get('store_id') in (None, store.store_id)
+               for d, store in zip(legacy_stores, new_stores))
+
+
+def best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--scale', type=int, default=10,
+                        help="also time a feed with the homepage body repeated K times")
+    args = parser.parse_args()
+
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        homepage = json.load(f)
+
+    # Results must be identical before timings mean anything
+    assert legacy_find_cursor(homepage) == new_find_cursor(homepage)
+    legacy_stores = legacy_extract_stores(homepage)
+    new_stores = walk_feed(homepage, collect_sections=False, store_paths=True)[1]
+    assert same_stores(legacy_stores, new_stores)
+    print(f"📊 {len(new_stores)} stores, {sum(1 for store in new_stores if store.store_id)} with a "
+          f"store_id (legacy: {sum(1 for d in legacy_stores if d.get('store_id'))})")
+
+    feeds = [('raw_homepage_feed.json', homepage)]
+    if args.scale > 1:
+        feeds.append((f"homepage x{args.scale}", dict(homepage, body=homepage['body'] * args.scale)))
+
+    for label, feed in feeds:
+        print(f"📊 {label} (best of {args.repeat})")
+        rows = [
+            ("cursor search", legacy_find_cursor, new_find_cursor),
+            ("store extraction", legacy_extract_stores, new_extract_stores),
+            ("cursor + stores", lambda d: (legacy_find_cursor(d), legacy_extract_stores(d)),
+             lambda d: walk_feed(d)),
+        ]
+        for name, legacy, new in rows:
+            legacy_time = best_of(legacy, feed, args.repeat)
+            new_time = best_of(new, feed, args.repeat)
+            print(f"   {name:<18} recursive {legacy_time * 1000:8.2f} ms   "
+                  f"iterative {new_time * 1000:8.2f} ms   speedup {legacy_time / new_time:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
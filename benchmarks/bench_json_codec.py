@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: decode + save of a feed artifact, old json.dump path vs json_codec
+Usage: python benchmarks/bench_json_codec.py [--repeat N]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import json_codec
+from feed_parser import walk_feed
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raw_homepage_feed.json')
+
+
+def legacy_feed(body, path):
+    """What steps 14/15 + the artifact writes did before: response.json() + json.dump(indent=2)"""
+    data = json.loads(body)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    return data
+
+
+def codec_feed(body, path):
+    """Raw bytes to disk, one decode for the parser"""
+    json_codec.write_raw(path, body)
+    return json_codec.loads(body)
+
+
+def legacy_stores(stores, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(stores, f, indent=2)
+
+
+def codec_stores(stores, path):
+    json_codec.dump_file(path, stores)
+
+
+def best_of(func, args, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(FIXTURE, 'rb') as f:
+        pretty = f.read()
+    homepage = json.loads(pretty)
+    compact = json.dumps(homepage, separators=(',', ':')).encode()
+    stores = [store.to_dict() for store in walk_feed(homepage, collect_sections=False)[1]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'artifact.json')
+
+        # Both paths must hand the parser the same tree
+        assert legacy_feed(compact, path) == codec_feed(compact, path)
+
+        print(f"📊 json_codec backend: {json_codec.BACKEND} (best of {args.repeat})")
+        rows = [
+            (f"feed decode+save ({len(compact)} B)", legacy_feed, codec_feed, compact),
+            (f"stores save ({len(stores)} stores)", legacy_stores, codec_stores, stores),
+        ]
+        for name, legacy, new, payload in rows:
+            legacy_time = best_of(legacy, (payload, path), args.repeat)
+            new_time = best_of(new, (payload, path), args.repeat)
+            print(f"   {name:<32} json.dump {legacy_time * 1000:8.2f} ms   "
+                  f"json_codec {new_time * 1000:8.2f} ms   speedup {legacy_time / new_time:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
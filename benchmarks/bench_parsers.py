@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark: parser CPU and memory on raw_homepage_feed.json and scaled synthetic feeds
+Usage: python benchmarks/bench_parsers.py [--carousels 60,300] [--stores-per-carousel 25]
+                                          [--depth 3] [--repeat N] [--output results.json]
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import json_codec
+from feed_parser import (
+    NOW_ON_DOORDASH,
+    walk_feed,
+    unique_stores,
+    scan_section_cursor,
+    find_now_on_doordash_cursor,
+    extract_stores_from_feed
+)
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raw_homepage_feed.json')
+
+
+def _clone(obj):
+    return json.loads(json.dumps(obj))
+
+
+def scaled_homepage(base, carousels, stores_per_carousel, depth=0, duplicate_ratio=0.3):
+    """Homepage-shaped feed built from real carousel and store-card nodes
+
+    `carousels` copies of a fixture carousel, each holding
+    `stores_per_carousel` copies of a real store card, every carousel
+    wrapped in `depth` extra container levels. `duplicate_ratio` of the
+    cards repeat a store from an earlier carousel, which is what
+    de-duplication has to undo. The fixture's 'Now on DoorDash' carousel
+    goes last, so cursor discovery has to walk past everything else.
+    """
+    feed_rows = base['body'][1]['body']
+    target = next(row for row in feed_rows
+                  if NOW_ON_DOORDASH in row.get('text', {}).get('title', '').lower())
+    template = _clone(target)
+    card_template = template.pop('children')[0]
+
+    total = carousels * stores_per_carousel
+    unique = max(1, int(total * (1 - duplicate_ratio)))
+
+    def card(n):
+        store_id = str(90000000 + n % unique)
+        node = _clone(card_template)
+        node['id'] = f"card.store:store:{store_id}"
+        node['text']['title'] = f"Synthetic Store {store_id}"
+        node['custom']['store_id'] = store_id
+        node['events']['click']['data']['uri'] = f"store/{store_id}/"
+        return node
+
+    def nest(node, levels):
+        for level in range(levels):
+            node = {'id': f"container.nested:{level}", 'children': [node]}
+        return node
+
+    rows = []
+    for c in range(carousels):
+        carousel = _clone(template)
+        carousel['id'] = f"carousel.standard:store_carousel:synthetic-{c}"
+        carousel['text']['title'] = f"Synthetic carousel {c}"
+        carousel['children'] = [card(c * stores_per_carousel + i) for i in range(stores_per_carousel)]
+        rows.append(nest(carousel, depth))
+    rows.append(nest(_clone(target), depth))
+
+    feed = dict(base)
+    feed['body'] = [base['body'][0], dict(base['body'][1], body=rows)]
+    return feed
+
+
+def dedupe_stores(stores):
+    """Cross-carousel de-duplication through the crawlers' own unique_stores"""
+    return list(unique_stores(stores, set()))
+
+
+def per_carousel_stores(feed):
+    """Every carousel's stores, concatenated without cross-carousel dedup"""
+    stores = []
+    for row in feed['body'][1]['body']:
+        stores.extend(walk_feed(row, collect_sections=False)[1])
+    return stores
+
+
+def chunked(data, size=65536):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def time_op(func, args, repeat):
+    """Best wall time of `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func, args):
+    """Peak bytes allocated by one run, from tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bench_feed(name, feed, repeat):
+    body = json_codec.dumps(feed)
+    stores = per_carousel_stores(feed)
+    cases = [
+        ("cursor discovery", find_now_on_doordash_cursor, (feed,)),
+        ("cursor discovery (stream)", lambda chunks: scan_section_cursor(iter(chunks)), (chunked(body),)),
+        ("store extraction", extract_stores_from_feed, (feed,)),
+        ("deduplication", dedupe_stores, (stores,)),
+    ]
+    # Sanity: every path must find what the feed holds
+    assert find_now_on_doordash_cursor(feed)
+    assert scan_section_cursor(iter(chunked(body)))
+
+    print(f"📊 {name}: {len(body) / 2 ** 20:.1f} MiB, {len(stores)} store cells, "
+          f"{len(dedupe_stores(stores))} unique (best of {repeat})")
+    results = {'bytes': len(body), 'store_cells': len(stores), 'ops': {}}
+    for op, func, args in cases:
+        seconds = time_op(func, args, repeat)
+        peak = peak_memory(func, args)
+        results['ops'][op] = {
+            'ms': round(seconds * 1000, 3),
+            'ops_per_s': round(1 / seconds, 1),
+            'peak_kib': round(peak / 1024, 1)
+        }
+        print(f"   {op:<26} {seconds * 1000:9.2f} ms   {1 / seconds:9.1f} ops/s   "
+              f"peak {peak / 1024:10.1f} KiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--carousels', default='60,300',
+                        help="comma-separated carousel counts for the synthetic feeds")
+    parser.add_argument('--stores-per-carousel', type=int, default=25)
+    parser.add_argument('--depth', type=int, default=3, help="extra nesting levels per carousel")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="write the results as JSON for later comparison")
+    args = parser.parse_args()
+
+    with open(FIXTURE, 'rb') as f:
+        base = json_codec.loads(f.read())
+
+    print(f"📊 json_codec backend: {json_codec.BACKEND}")
+    results = {'fixture': bench_feed("raw_homepage_feed.json", base, args.repeat)}
+    for carousels in (int(n) for n in args.carousels.split(',') if n):
+        feed = scaled_homepage(base, carousels, args.stores_per_carousel, args.depth,
+                               args.duplicate_ratio)
+        name = f"{carousels} carousels x {args.stores_per_carousel} stores, depth +{args.depth}"
+        results[name] = bench_feed(name, feed, args.repeat)
+        del feed
+
+    if args.output:
+        json_codec.dump_file(args.output, results)
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory held by store extraction on a large synthetic feed
+Usage: python benchmarks/bench_store_memory.py [--stores N] [--repeats K]
+"""
+
+import gc
+import os
+import sys
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from feed_parser import walk_feed
+from bench_feed_walker import legacy_extract_stores
+
+
+def synthetic_feed(unique_stores, repeats):
+    """Homepage-shaped feed: `repeats` carousels, each listing every store once"""
+    def card(n):
+        return {
+            'id': f"row.store:{n}",
+            'text': {'title': f"Store {n}", 'subtitle': f"{n % 7 + 1}.{n % 10} mi"},
+            'custom': {
+                'store_id': str(100000 + n),
+                'rating': 4.0 + (n % 10) / 10,
+                'delivery_fee': f"${n % 5}.99",
+                'delivery_time': f"{20 + n % 30} min"
+            },
+            'events': {'click': {'data': {'uri': f"store/{100000 + n}/?cursor=abc"}}}
+        }
+
+    carousels = [
+        {'id': f"carousel.{r}", 'children': [card(n) for n in range(unique_stores)]}
+        for r in range(repeats)
+    ]
+    return {'body': [{'body': carousels}]}
+
+
+def measure(func, feed):
+    """(peak bytes while extracting, bytes still held by the result)"""
+    tracemalloc.start()
+    result = func(feed)
+    gc.collect()  # the legacy extractor's closure is a reference cycle
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, retained, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=5000, help="unique stores in the feed")
+    parser.add_argument('--repeats', type=int, default=10, help="carousels listing every store")
+    args = parser.parse_args()
+
+    feed = synthetic_feed(args.stores, args.repeats)
+    print(f"📊 synthetic feed: {args.stores} unique stores x {args.repeats} carousels")
+
+    rows = [
+        ("legacy dicts + paths", legacy_extract_stores),
+        ("Store + paths", lambda d: walk_feed(d, collect_sections=False, store_paths=True)[1]),
+        ("Store", lambda d: walk_feed(d, collect_sections=False)[1]),
+    ]
+    for name, func in rows:
+        peak, retained, stores = measure(func, feed)
+        assert len(stores) == args.stores
+        print(f"   {name:<22} peak {peak / 1024:9.1f} KiB   retained {retained / 1024:9.1f} KiB   "
+              f"({retained / len(stores):6.1f} B/store)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming cursor scan vs full json parse of the homepage feed
+Usage: python benchmarks/bench_stream_homepage.py [--repeat N] [--chunk-size BYTES]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from feed_parser import walk_feed, scan_section_cursor, NOW_ON_DOORDASH
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raw_homepage_feed.json')
+
+
+def full_parse(body, chunk_size):
+    """What step 14 + find_now_on_doordash_cursor do today"""
+    homepage = json.loads(body)
+    sections, _ = walk_feed(homepage, collect_stores=False, stop_at_title=NOW_ON_DOORDASH)
+    return sections[-1]['cursor'] if sections else None
+
+
+def streaming(body, chunk_size):
+    chunks = (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+    return scan_section_cursor(chunks)
+
+
+def measure(func, body, chunk_size, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(body, chunk_size)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(body, chunk_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=16384)
+    args = parser.parse_args()
+
+    with open(FIXTURE, 'rb') as f:
+        pretty = f.read()
+    compact = json.dumps(json.loads(pretty), separators=(',', ':')).encode()
+
+    for label, body in (("pretty (as captured)", pretty), ("compact (as served)", compact)):
+        assert full_parse(body, args.chunk_size) == streaming(body, args.chunk_size)
+        position = body.find(b'Now on DoorDash')
+        print(f"📊 {label}: {len(body)} bytes, section at byte {position} "
+              f"({position / len(body):.0%}), best of {args.repeat}")
+        for name, func in (("json.loads + walk", full_parse), ("streaming scan", streaming)):
+            elapsed, peak = measure(func, body, args.chunk_size, args.repeat)
+            print(f"   {name:<18} time-to-cursor {elapsed * 1000:7.2f} ms   "
+                  f"peak alloc {peak / 1024:9.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,62 @@ Replicates the exact API sequence: Guest Creation → Address Setup → Content
 import json
 import uuid
 import time
-import base64
+import asyncio
+import logging
+import argparse
+import contextlib
 from urllib.parse import quote
 from curl_cffi import requests
 
-class DoorDashGuestFlow:
-    def __init__(self):
-        self.base_url = "https://consumer-mobile-bff.doordash.com"
-        self.session = requests.Session(impersonate="chrome110")  # Impersonate Chrome
+import json_codec
+from sync_facade import SyncFacade
+from facet_cursor import FacetCursor
+from resilience import RequestExecutor, endpoint_key
+from session_cookies import isolated_request
+from metrics import MetricsRegistry, observe_request, timed_step
+from tracing import Tracer, span, new_trace_id, sentry_trace
+from flow_graph import FlowGraph, FlowStep
+from flow_logging import SUMMARY, add_logging_arguments, configure_from_args
+from stage_profiler import StageProfiler, add_profile_argument
+
+BASE_URL = "https://consumer-mobile-bff.doordash.com"
+
+# Browser fetch-metadata headers that edge protection may block on
+SEC_FETCH_HEADERS = ('Sec-Fetch-Dest', 'Sec-Fetch-Mode', 'Sec-Fetch-Site')
+
+# Profiling stage of every step in the flow graph
+STEP_STAGES = {
+    'step_1_health_check': 'bootstrap',
+    'step_2_create_guest_user': 'bootstrap',
+    'step_3_get_experiments': 'bootstrap',
+    'step_4_register_device': 'bootstrap',
+    'step_5_privacy_consents': 'bootstrap',
+    'step_6_get_user_profile': 'bootstrap',
+    'step_7_update_language': 'bootstrap',
+    'step_8_get_addresses': 'bootstrap',
+    'step_9_address_autocomplete': 'geocode',
+    'step_10_get_address_details': 'geocode',
+    'step_11_validate_address': 'address',
+    'step_12_add_address': 'address',
+    'step_13_set_default_address': 'address',
+    'step_14_homepage_feed': 'homepage',
+    'step_15_content_feed': 'section_feed',
+}
+
+log = logging.getLogger(__name__)
+
+class AsyncDoorDashGuestFlow:
+    """Asyncio engine for the guest flow, built on curl_cffi's AsyncSession"""
+
+    def __init__(self, rate_limiter=None, executor=None, session=None, base_url=BASE_URL,
+                 metrics=None, tracer=None, profiler=None):
+        self.base_url = base_url
+        # A session passed in is shared with other flows and closed by its owner
+        self._owns_session = session is None
+        self.session = session if session is not None \
+            else requests.AsyncSession(impersonate="chrome110")  # Impersonate Chrome
+        # This guest's cookies; the (possibly shared) session keeps none
+        self.cookies = requests.Cookies()
         self.jwt_token = None
         self.session_id = str(uuid.uuid4()) + "-dd-and"
         self.device_id = str(uuid.uuid4()).replace('-', '')
@@ -23,9 +71,22 @@ class DoorDashGuestFlow:
         self.address_id = None
         self.lat = None
         self.lng = None
-        
-        # Set more realistic default headers based on real Android app
-        self.session.headers.update({
+        self.last_flow_run = None
+        if executor is None:
+            executor = RequestExecutor(rate_limiter) if rate_limiter is not None \
+                else RequestExecutor.shared()
+        self.executor = executor
+        self.rate_limiter = executor.rate_limiter
+        self.metrics = metrics if metrics is not None else MetricsRegistry.shared()
+        # Spans are only recorded with a tracer; the trace id is always used
+        # for Sentry-Trace so every request of this flow shares it
+        self.tracer = tracer
+        self.trace_id = new_trace_id()
+        self.profiler = profiler
+        
+        # Set more realistic default headers based on real Android app; these
+        # are sent with every request and never written to the shared session
+        self.base_headers = {
             'User-Agent': 'DoorDashConsumer/15.221.7 (Android 11; Google sdk_gphone_x86)',
             'Accept': 'application/json',
             'Accept-Language': 'en-US',
@@ -41,14 +102,25 @@ class DoorDashGuestFlow:
             'Sec-Fetch-Dest': 'empty',
             'Sec-Fetch-Mode': 'cors',
             'Sec-Fetch-Site': 'same-origin'
-        })
+        }
         
-        # Update session headers immediately
+        # Add the session-specific headers immediately
         self.update_session_headers()
+    
+    async def close(self):
+        """Close the underlying HTTP session unless it was passed in"""
+        if self._owns_session:
+            await self.session.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
         
     def update_session_headers(self):
-        """Update session-specific headers"""
-        self.session.headers.update({
+        """Update session-specific headers in base_headers"""
+        self.base_headers.update({
             'X-Session-Id': self.session_id,
             'X-Client-Request-Id': self.client_request_id,
             'X-Correlation-Id': self.correlation_id,
@@ -59,16 +131,53 @@ class DoorDashGuestFlow:
                 "dd_android_advertising_id": str(uuid.uuid4())
             })
         })
-        
+    
+    def request_headers(self, headers=None, omit=()):
+        """Headers for one request: base headers + JWT + per-step `headers`, minus `omit`"""
+        merged = dict(self.base_headers)
+        for name in omit:
+            merged.pop(name, None)
         if self.jwt_token:
-            self.session.headers['Authorization'] = f'JWT {self.jwt_token}'
+            merged['Authorization'] = f'JWT {self.jwt_token}'
+        if headers:
+            merged.update(headers)
+        return merged
+    
+    async def _request(self, method, path, headers=None, retry_statuses=(), idempotent=None,
+                       omit_headers=(), **kwargs):
+        """Send one request to the BFF (rate limited, retried, circuit broken)"""
+        url = f"{self.base_url}{path}"
+        headers = self.request_headers(headers, omit_headers)
+        endpoint = endpoint_key(method, path)
+        with span(endpoint, self.tracer, self.trace_id) as request_span:
+            started = time.perf_counter()
+            try:
+                response = await self.executor.execute(
+                    method, path,
+                    lambda: isolated_request(self.session, self.cookies, method, url,
+                                             headers=headers, **kwargs),
+                    retry_statuses, idempotent, kwargs.get('stream', False)
+                )
+            except Exception as e:
+                observe_request(self.metrics, endpoint, time.perf_counter() - started, error=e)
+                raise
+            observe_request(self.metrics, endpoint, time.perf_counter() - started,
+                            response, streamed=kwargs.get('stream', False))
+            request_span.set(status=response.status_code)
+            return response
+    
+    def stage(self, name):
+        """Profile the enclosed block as pipeline stage `name` when a profiler is attached"""
+        return self.profiler.stage(name) if self.profiler is not None else contextlib.nullcontext()
+    
+    def _in_stage(self, name, run):
+        async def staged(results):
+            with self.stage(name):
+                return await run(results)
+        return staged
     
     def generate_sentry_headers(self, transaction=""):
-        """Generate Sentry tracing headers"""
-        trace_id = str(uuid.uuid4()).replace('-', '')
-        span_id = str(uuid.uuid4()).replace('-', '')[:16]
-        
-        sentry_trace = f"{trace_id}-{span_id}-0"
+        """Generate Sentry tracing headers (this flow's trace, the current step's span)"""
         baggage_parts = [
             "sentry-environment=production-doordash",
             "sentry-public_key=72ed69f9da5c40b89fd268bdbaa40d07",
@@ -79,63 +188,57 @@ class DoorDashGuestFlow:
             baggage_parts.append(f"sentry-transaction={transaction}")
             
         return {
-            'Sentry-Trace': sentry_trace,
+            'Sentry-Trace': sentry_trace(self.trace_id, '0'),
             'Baggage': ','.join(baggage_parts)
         }
     
     def debug_request_info(self):
-        """Debug function to show current headers"""
-        print("🔍 Debug: Current headers:")
-        for key, value in self.session.headers.items():
-            print(f"   {key}: {value}")
-        print()
+        """Debug function to show the headers the next request will carry"""
+        log.debug("🔍 Debug: Current headers:")
+        for key, value in self.request_headers().items():
+            log.debug("%s: %s", key, value)
     
-    def step_1_health_check(self):
+    @timed_step
+    async def step_1_health_check(self):
         """Step 1: Health Check"""
-        print("🔍 Step 1: Health Check")
-        
-        # Add small delay to seem more natural
-        time.sleep(1)
+        log.info("🔍 Step 1: Health Check")
         
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         try:
             # Try with a simpler endpoint first
-            response = self.session.get(f"{self.base_url}/status_ok", timeout=30)
-            print(f"   Status: {response.status_code}")
+            response = await self._request('GET', "/status_ok", headers=headers, timeout=30)
+            log.debug("Status: %s", response.status_code)
             
             if response.status_code == 403:
-                print("   ⚠️  403 Forbidden - Trying alternative approach...")
+                log.warning("⚠️  403 Forbidden - Trying alternative approach...")
                 
                 # Try without some headers that might trigger blocking
-                temp_headers = self.session.headers.copy()
-                self.session.headers.pop('Sec-Fetch-Dest', None)
-                self.session.headers.pop('Sec-Fetch-Mode', None) 
-                self.session.headers.pop('Sec-Fetch-Site', None)
-                
-                response = self.session.get(f"{self.base_url}/status_ok", timeout=30)
-                print(f"   Retry Status: {response.status_code}")
-                
-                # Restore headers
-                self.session.headers.update(temp_headers)
+                response = await self._request(
+                    'GET',
+                    "/status_ok",
+                    headers=headers,
+                    omit_headers=SEC_FETCH_HEADERS,
+                    timeout=30
+                )
+                log.debug("Retry Status: %s", response.status_code)
             
             if response.status_code != 200:
-                print(f"   Response headers: {dict(list(response.headers.items())[:5])}")
-                print(f"   Response body: {response.text[:300]}")
+                log.debug("Response headers: %s", dict(list(response.headers.items())[:5]))
+                log.debug("Response body: %s", response.text[:300])
                 
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_2_create_guest_user(self):
+    @timed_step
+    async def step_2_create_guest_user(self):
         """Step 2: Create Guest User"""
-        print("👤 Step 2: Create Guest User")
+        log.info("👤 Step 2: Create Guest User")
         
         password = str(uuid.uuid4())
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         payload = {
             "password": password
@@ -143,44 +246,45 @@ class DoorDashGuestFlow:
         
         try:
             # Add Content-Type for POST request
-            post_headers = {'Content-Type': 'application/json; charset=UTF-8'}
-            response = self.session.post(
-                f"{self.base_url}/v1/consumer_profile/create_full_guest",
+            headers['Content-Type'] = 'application/json; charset=UTF-8'
+            response = await self._request(
+                'POST',
+                "/v1/consumer_profile/create_full_guest",
                 json=payload,
-                headers=post_headers
+                headers=headers
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 # Extract JWT token from response - it's in auth_token.token
                 if 'auth_token' in data and 'token' in data['auth_token']:
                     self.jwt_token = data['auth_token']['token']
-                    print(f"   ✅ JWT Token acquired")
+                    log.debug("✅ JWT Token acquired")
                     self.update_session_headers()
                     return True
                 elif 'token' in data:
                     self.jwt_token = data['token']
-                    print(f"   ✅ JWT Token acquired (direct)")
+                    log.debug("✅ JWT Token acquired (direct)")
                     self.update_session_headers()
                     return True
                 else:
-                    print("   ❌ No token in response")
-                    print(f"   Response keys: {list(data.keys())}")
+                    log.warning("❌ No token in response")
+                    log.debug("Response keys: %s", list(data.keys()))
                     if 'auth_token' in data:
-                        print(f"   Auth token keys: {list(data['auth_token'].keys())}")
+                        log.debug("Auth token keys: %s", list(data['auth_token'].keys()))
             
             return False
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_3_get_experiments(self):
+    @timed_step
+    async def step_3_get_experiments(self):
         """Step 3: Get Feature Flags/Experiments"""
-        print("🧪 Step 3: Get Feature Flags")
+        log.info("🧪 Step 3: Get Feature Flags")
         
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         # Common experiments from the captured data
         experiments = [
@@ -195,22 +299,25 @@ class DoorDashGuestFlow:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v1/experiments/",
-                json=payload
+            response = await self._request(
+                'POST',
+                "/v1/experiments/",
+                headers=headers,
+                json=payload,
+                idempotent=True
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_4_register_device(self):
+    @timed_step
+    async def step_4_register_device(self):
         """Step 4: Register Device for Push Notifications"""
-        print("📱 Step 4: Register Device")
+        log.info("📱 Step 4: Register Device")
         
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         payload = {
             "notification_token": f"fake_token_{self.device_id}",
@@ -221,96 +328,103 @@ class DoorDashGuestFlow:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v1/register_device/",
+            response = await self._request(
+                'POST',
+                "/v1/register_device/",
+                headers=headers,
                 json=payload
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_5_privacy_consents(self):
+    @timed_step
+    async def step_5_privacy_consents(self):
         """Step 5: Get Privacy Consents"""
-        print("🔒 Step 5: Privacy Consents")
+        log.info("🔒 Step 5: Privacy Consents")
         
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         params = {
             "segment_write_key": "E6UuE4W1vK18KuDgRFO1A87XS89Vuz5j"
         }
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v1/user/privacy_consents",
+            response = await self._request(
+                'GET',
+                "/v1/user/privacy_consents",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_6_get_user_profile(self):
+    @timed_step
+    async def step_6_get_user_profile(self):
         """Step 6: Get User Profile"""
-        print("👥 Step 6: Get User Profile")
+        log.info("👥 Step 6: Get User Profile")
         
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         try:
-            response = self.session.get(f"{self.base_url}/v2/consumers/me")
-            print(f"   Status: {response.status_code}")
+            response = await self._request('GET', "/v2/consumers/me", headers=headers)
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_7_update_language(self):
+    @timed_step
+    async def step_7_update_language(self):
         """Step 7: Update Language Preference"""
-        print("🌐 Step 7: Update Language")
+        log.info("🌐 Step 7: Update Language")
         
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         payload = {
             "language": "en-US"
         }
         
         try:
-            response = self.session.patch(
-                f"{self.base_url}/v2/consumers/me",
-                json=payload
+            response = await self._request(
+                'PATCH',
+                "/v2/consumers/me",
+                headers=headers,
+                json=payload,
+                idempotent=True
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_8_get_addresses(self):
+    @timed_step
+    async def step_8_get_addresses(self):
         """Step 8: Get User Addresses"""
-        print("🏠 Step 8: Get Addresses")
+        log.info("🏠 Step 8: Get Addresses")
         
         headers = self.generate_sentry_headers()
-        self.session.headers.update(headers)
         
         try:
-            response = self.session.get(f"{self.base_url}/v2/addresses")
-            print(f"   Status: {response.status_code}")
+            response = await self._request('GET', "/v2/addresses", headers=headers)
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_9_address_autocomplete(self, address_query="New York"):
+    @timed_step
+    async def step_9_address_autocomplete(self, address_query="New York"):
         """Step 9: Address Autocomplete Search"""
-        print(f"🔍 Step 9: Address Autocomplete - '{address_query}'")
+        log.info("🔍 Step 9: Address Autocomplete - '%s'", address_query)
         
         headers = self.generate_sentry_headers("AddressActivity")
-        self.session.headers.update(headers)
         
         params = {
             "input": address_query,
@@ -318,71 +432,75 @@ class DoorDashGuestFlow:
         }
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v1/addresses/autocomplete",
+            response = await self._request(
+                'GET',
+                "/v1/addresses/autocomplete",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 if data and len(data) > 0:
                     # Get the first address suggestion
                     first_address = data[0]
                     place_id = first_address.get('google_place_id')  # Fixed field name
-                    print(f"   ✅ Found address suggestions: {len(data)}")
+                    log.debug("✅ Found address suggestions: %s", len(data))
                     if place_id:
-                        print(f"   ✅ Using place_id: {place_id}")
+                        log.debug("✅ Using place_id: %s", place_id)
                         return place_id
                     else:
-                        print(f"   ❌ No google_place_id in first result: {first_address}")
+                        log.warning("❌ No google_place_id in first result: %s", first_address)
                         return None
                 else:
-                    print(f"   ❌ No address suggestions found")
+                    log.warning("❌ No address suggestions found")
                     
             return None
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return None
     
-    def step_10_get_address_details(self, place_id):
+    @timed_step
+    async def step_10_get_address_details(self, place_id):
         """Step 10: Get Address Details"""
-        print("📍 Step 10: Get Address Details")
+        log.info("📍 Step 10: Get Address Details")
         
         headers = self.generate_sentry_headers("AddressActivity")
-        self.session.headers.update(headers)
         
         params = {
             "place_id": place_id
         }
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v2/addresses/details",
+            response = await self._request(
+                'GET',
+                "/v2/addresses/details",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 # Extract coordinates
                 if 'lat' in data and 'lng' in data:
                     self.lat = data['lat']
                     self.lng = data['lng']
-                    print(f"   ✅ Coordinates: {self.lat}, {self.lng}")
+                    log.debug("✅ Coordinates: %s, %s", self.lat, self.lng)
                     return data
                     
             return None
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return None
     
-    def step_11_validate_address(self, place_id):
+    @timed_step
+    async def step_11_validate_address(self, place_id):
         """Step 11: Validate Address"""
-        print("✅ Step 11: Validate Address")
+        log.info("✅ Step 11: Validate Address")
         
         headers = self.generate_sentry_headers("AddressActivity")
-        self.session.headers.update(headers)
         
         payload = {
             "consumer_id": "1125900377027641",  # Dummy consumer ID
@@ -392,22 +510,25 @@ class DoorDashGuestFlow:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v2/addresses/validate",
-                json=payload
+            response = await self._request(
+                'POST',
+                "/v2/addresses/validate",
+                headers=headers,
+                json=payload,
+                idempotent=True
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_12_add_address(self, place_id):
+    @timed_step
+    async def step_12_add_address(self, place_id):
         """Step 12: Add Address to Profile"""
-        print("➕ Step 12: Add Address")
+        log.info("➕ Step 12: Add Address")
         
         headers = self.generate_sentry_headers("AddressActivity")
-        self.session.headers.update(headers)
         
         payload = {
             "subpremise": "",
@@ -422,51 +543,57 @@ class DoorDashGuestFlow:
         }
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/v1/consumer_profile/address/",
+            response = await self._request(
+                'POST',
+                "/v1/consumer_profile/address/",
+                headers=headers,
                 json=payload
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 if 'id' in data:
                     self.address_id = data['id']
-                    print(f"   ✅ Address ID: {self.address_id}")
+                    log.debug("✅ Address ID: %s", self.address_id)
                     return True
                     
             return False
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_13_set_default_address(self):
+    @timed_step
+    async def step_13_set_default_address(self):
         """Step 13: Set Default Address"""
-        print("🏠 Step 13: Set Default Address")
+        log.info("🏠 Step 13: Set Default Address")
         
         if not self.address_id:
-            print("   ❌ No address ID available")
+            log.warning("❌ No address ID available")
             return False
         
         headers = self.generate_sentry_headers("AddressActivity")
-        self.session.headers.update(headers)
         
         try:
-            response = self.session.patch(
-                f"{self.base_url}/v1/consumer_profile/address/{self.address_id}/set_default"
+            response = await self._request(
+                'PATCH',
+                f"/v1/consumer_profile/address/{self.address_id}/set_default",
+                headers=headers,
+                idempotent=True
             )
-            print(f"   Status: {response.status_code}")
+            log.debug("Status: %s", response.status_code)
             return response.status_code == 200
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return False
     
-    def step_14_homepage_feed(self):
+    @timed_step
+    async def step_14_homepage_feed(self):
         """Step 14: Get Homepage Feed (Required for Content Feed cursor)"""
-        print("🏠 Step 14: Homepage Feed")
+        log.info("🏠 Step 14: Homepage Feed")
         
         if not self.lat or not self.lng:
-            print("   ❌ No coordinates available")
+            log.warning("❌ No coordinates available")
             return None
         
         headers = self.generate_sentry_headers("PlanEnrollmentActivity")
@@ -482,7 +609,6 @@ class DoorDashGuestFlow:
             'X-Facets-Feature-Store-Cell-Redesign-Round-3': 'treatmentVariant3',
             'X-Gifting-Intent': 'false'
         })
-        self.session.headers.update(headers)
         
         params = {
             "lat": str(self.lat),
@@ -490,31 +616,34 @@ class DoorDashGuestFlow:
         }
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v3/feed/homepage",
+            response = await self._request(
+                'GET',
+                "/v3/feed/homepage",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
-            print(f"   Response Size: {len(response.content)} bytes")
+            log.debug("Status: %s", response.status_code)
+            log.debug("Response Size: %s bytes", len(response.content))
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 # Look for cursor information in the response
                 # This is typically embedded in the feed data
-                print(f"   ✅ Homepage feed loaded successfully")
+                log.debug("✅ Homepage feed loaded successfully")
                 return data
                 
             return None
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return None
     
-    def step_15_content_feed(self, cursor_id=None):
+    @timed_step
+    async def step_15_content_feed(self, cursor_id=None):
         """Step 15: Get Content Feed (TARGET ENDPOINT!)"""
-        print("🎯 Step 15: Content Feed (TARGET!)")
+        log.info("🎯 Step 15: Content Feed (TARGET!)")
         
         if not self.lat or not self.lng:
-            print("   ❌ No coordinates available")
+            log.warning("❌ No coordinates available")
             return None
         
         headers = self.generate_sentry_headers("FacetFeedActivity")
@@ -522,16 +651,14 @@ class DoorDashGuestFlow:
             'X-Facets-Feature-Backend-Driven-Badges': 'true',
             'X-Facets-Feature-Store-Cell-Redesign-Round-3': 'treatmentVariant3'
         })
-        self.session.headers.update(headers)
         
         # Check if this is a "Now on DoorDash" cursor that needs special handling
         if cursor_id and isinstance(cursor_id, str) and len(cursor_id) > 100:
             try:
                 # Decode to check if it's a valid cursor
-                decoded = base64.b64decode(cursor_id).decode()
-                cursor_data = json.loads(decoded)
-                print(f"   📋 Using v2/feed endpoint with 'Now on DoorDash' cursor")
-                print(f"   🔍 Cursor contains content_ids: {cursor_data.get('content_ids', [])}")
+                cursor_data = FacetCursor.decode(cursor_id)
+                log.debug("📋 Using v2/feed endpoint with 'Now on DoorDash' cursor")
+                log.debug("🔍 Cursor contains content_ids: %s", cursor_data.get('content_ids', []))
                 
                 # Use the standard v2/feed endpoint with the cursor as id parameter
                 params = {
@@ -540,22 +667,23 @@ class DoorDashGuestFlow:
                     "id": cursor_id
                 }
                 
-                response = self.session.get(f"{self.base_url}/v2/feed/", params=params)
-                print(f"   Status: {response.status_code}")
-                print(f"   Response Size: {len(response.content)} bytes")
+                response = await self._request('GET', "/v2/feed/", headers=headers, params=params)
+                log.debug("Status: %s", response.status_code)
+                log.debug("Response Size: %s bytes", len(response.content))
                 
                 if response.status_code == 200:
-                    data = response.json()
-                    print(f"   🎉 SUCCESS! 'Now on DoorDash' Feed accessed!")
-                    print(f"   📊 Feed contains {len(data) if isinstance(data, list) else 'complex'} items")
+                    data = json_codec.loads(response.content)
+                    log.debug("🎉 SUCCESS! 'Now on DoorDash' Feed accessed!")
+                    log.debug("📊 Feed contains %s items",
+                              len(data) if isinstance(data, list) else 'complex')
                     return data
                 else:
-                    print(f"   ❌ Failed to access 'Now on DoorDash' feed")
-                    print(f"   Response: {response.text[:200]}...")
+                    log.warning("❌ Failed to access 'Now on DoorDash' feed")
+                    log.debug("Response: %s...", response.text[:200])
                     # Don't return None, fall through to try default approach
                     
             except Exception as e:
-                print(f"   ⚠️  Error with 'Now on DoorDash' cursor, falling back to default: {e}")
+                log.warning("⚠️  Error with 'Now on DoorDash' cursor, falling back to default: %s", e)
         
         # Default v2/feed endpoint
         params = {
@@ -583,133 +711,164 @@ class DoorDashGuestFlow:
                 }
             }
             
-            # Encode cursor as base64
-            cursor_json = json.dumps(default_cursor)
-            cursor_b64 = base64.b64encode(cursor_json.encode()).decode()
-            params["id"] = cursor_b64
+            params["id"] = FacetCursor(default_cursor).encode()
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/v2/feed/",
+            response = await self._request(
+                'GET',
+                "/v2/feed/",
+                headers=headers,
                 params=params
             )
-            print(f"   Status: {response.status_code}")
-            print(f"   Response Size: {len(response.content)} bytes")
+            log.debug("Status: %s", response.status_code)
+            log.debug("Response Size: %s bytes", len(response.content))
             
             if response.status_code == 200:
-                data = response.json()
-                print(f"   🎉 SUCCESS! Content Feed accessed!")
-                print(f"   📊 Feed contains {len(data) if isinstance(data, list) else 'complex'} items")
+                data = json_codec.loads(response.content)
+                log.debug("🎉 SUCCESS! Content Feed accessed!")
+                log.debug("📊 Feed contains %s items", len(data) if isinstance(data, list) else 'complex')
                 return data
             else:
-                print(f"   ❌ Failed to access content feed")
-                print(f"   Response: {response.text[:200]}...")
+                log.warning("❌ Failed to access content feed")
+                log.debug("Response: %s...", response.text[:200])
                 
             return None
         except Exception as e:
-            print(f"   Error: {e}")
+            log.warning("Error: %s", e)
             return None
     
-    def run_complete_flow(self, address_query="New York, NY"):
+    def build_flow_graph(self, address_query="New York, NY"):
+        """Declare the complete flow as a dependency graph
+        
+        Once the JWT exists, steps 3-8 and the address lookup only need the
+        token, so they run side by side. The real data dependencies are
+        place_id → details and validate, both → add → set-default, and
+        coordinates (step 10) → feeds. The address is only written once it
+        has resolved and passed validation.
+        """
+        return FlowGraph([
+            FlowStep('step_1_health_check', lambda r: self.step_1_health_check()),
+            FlowStep('step_2_create_guest_user', lambda r: self.step_2_create_guest_user(),
+                     requires=['step_1_health_check']),
+            FlowStep('step_3_get_experiments', lambda r: self.step_3_get_experiments(),
+                     requires=['step_2_create_guest_user']),
+            FlowStep('step_4_register_device', lambda r: self.step_4_register_device(),
+                     requires=['step_2_create_guest_user']),
+            FlowStep('step_5_privacy_consents', lambda r: self.step_5_privacy_consents(),
+                     requires=['step_2_create_guest_user']),
+            FlowStep('step_6_get_user_profile', lambda r: self.step_6_get_user_profile(),
+                     requires=['step_2_create_guest_user']),
+            FlowStep('step_7_update_language', lambda r: self.step_7_update_language(),
+                     requires=['step_2_create_guest_user']),
+            FlowStep('step_8_get_addresses', lambda r: self.step_8_get_addresses(),
+                     requires=['step_2_create_guest_user']),
+            FlowStep('step_9_address_autocomplete',
+                     lambda r: self.step_9_address_autocomplete(address_query),
+                     requires=['step_2_create_guest_user']),
+            FlowStep('step_10_get_address_details',
+                     lambda r: self.step_10_get_address_details(r['step_9_address_autocomplete']),
+                     requires=['step_9_address_autocomplete']),
+            FlowStep('step_11_validate_address',
+                     lambda r: self.step_11_validate_address(r['step_9_address_autocomplete']),
+                     requires=['step_9_address_autocomplete']),
+            FlowStep('step_12_add_address',
+                     lambda r: self.step_12_add_address(r['step_9_address_autocomplete']),
+                     requires=['step_10_get_address_details', 'step_11_validate_address']),
+            FlowStep('step_13_set_default_address', lambda r: self.step_13_set_default_address(),
+                     requires=['step_12_add_address']),
+            FlowStep('step_14_homepage_feed', lambda r: self.step_14_homepage_feed(),
+                     requires=['step_10_get_address_details']),
+            FlowStep('step_15_content_feed', lambda r: self.step_15_content_feed(),
+                     requires=['step_14_homepage_feed']),
+        ])
+    
+    async def run_complete_flow(self, address_query="New York, NY"):
         """Run the complete guest user flow"""
-        print("🚀 Starting DoorDash Guest User Flow")
-        print("=" * 60)
-        
-        # Stage 1: Initialization
-        if not self.step_1_health_check():
-            print("❌ Health check failed")
-            return False
-            
-        if not self.step_2_create_guest_user():
-            print("❌ Guest user creation failed")
-            return False
-            
-        if not self.step_3_get_experiments():
-            print("❌ Experiments fetch failed")
-            return False
-            
-        if not self.step_4_register_device():
-            print("❌ Device registration failed")
+        log.info("🚀 Starting DoorDash Guest User Flow")
+        
+        graph = self.build_flow_graph(address_query)
+        max_concurrency = None
+        if self.profiler is not None:
+            # One step at a time, so each stage's profile holds only its own work
+            for step in graph.steps.values():
+                step.run = self._in_stage(STEP_STAGES[step.name], step.run)
+            max_concurrency = 1
+        with span('run_complete_flow', self.tracer, self.trace_id, address_query=address_query):
+            flow_run = await graph.run(max_concurrency)
+        self.last_flow_run = flow_run
+        log.info("%s", flow_run.summary())
+        
+        if not flow_run.ok:
+            for name in flow_run.failed:
+                log.warning("❌ %s failed", name)
             return False
         
-        # Stage 2: User Setup
-        if not self.step_5_privacy_consents():
-            print("❌ Privacy consents failed")
-            return False
-            
-        if not self.step_6_get_user_profile():
-            print("❌ User profile fetch failed")
-            return False
-            
-        if not self.step_7_update_language():
-            print("❌ Language update failed")
-            return False
-        
-        # Stage 3: Address Flow
-        if not self.step_8_get_addresses():
-            print("❌ Address list fetch failed")
-            return False
-        
-        place_id = self.step_9_address_autocomplete(address_query)
-        if not place_id:
-            print("❌ Address autocomplete failed")
-            return False
-        
-        address_details = self.step_10_get_address_details(place_id)
-        if not address_details:
-            print("❌ Address details fetch failed")
-            return False
-            
-        if not self.step_11_validate_address(place_id):
-            print("❌ Address validation failed")
-            return False
-            
-        if not self.step_12_add_address(place_id):
-            print("❌ Add address failed")
-            return False
-            
-        if not self.step_13_set_default_address():
-            print("❌ Set default address failed")
-            return False
-        
-        # Stage 4: Content Access
-        homepage_data = self.step_14_homepage_feed()
-        if not homepage_data:
-            print("❌ Homepage feed failed")
-            return False
-        
-        content_feed_data = self.step_15_content_feed()
-        if not content_feed_data:
-            print("❌ Content feed access failed")
-            return False
-        
-        print("\n" + "=" * 60)
-        print("🎉 COMPLETE SUCCESS!")
-        print("✅ Guest user created and authenticated")
-        print("✅ Address added and validated")
-        print("✅ Content Feed accessed successfully!")
-        print("=" * 60)
+        log.info("🎉 COMPLETE SUCCESS for '%s'", address_query, extra=SUMMARY)
+        log.info("✅ Guest user created and authenticated")
+        log.info("✅ Address added and validated")
+        log.info("✅ Content Feed accessed successfully!")
         
         return True
 
+class DoorDashGuestFlow(SyncFacade):
+    """Synchronous wrapper around AsyncDoorDashGuestFlow"""
+    async_class = AsyncDoorDashGuestFlow
+
+async def run_complete_flows(address_queries, concurrency=10, **flow_options):
+    """Run one complete guest flow per address, at most `concurrency` at a time
+    
+    Returns a list of booleans in the same order as `address_queries`.
+    `flow_options` go to AsyncDoorDashGuestFlow (base_url, session, ...).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run_one(address_query):
+        async with semaphore:
+            async with AsyncDoorDashGuestFlow(**flow_options) as flow:
+                try:
+                    return await flow.run_complete_flow(address_query)
+                except Exception as e:
+                    log.error("❌ Flow for '%s' crashed: %s", address_query, e)
+                    return False
+    
+    return await asyncio.gather(*(run_one(query) for query in address_queries))
+
 def main():
     """Main execution function"""
-    print("DoorDash Guest Flow Automation")
-    print("Using curl_cffi for HTTP requests")
-    print()
+    parser = argparse.ArgumentParser(description="Run the DoorDash guest flow end to end")
+    add_logging_arguments(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    profiler = StageProfiler(args.profile).start() if args.profile else None
+    
+    log.info("DoorDash Guest Flow Automation")
+    log.info("Using curl_cffi for HTTP requests")
     
     # Initialize the flow
-    flow = DoorDashGuestFlow()
+    tracer = Tracer()
+    flow = DoorDashGuestFlow(tracer=tracer, profiler=profiler)
     
     # Run the complete flow
     success = flow.run_complete_flow("New York, NY")
+    flow.close()
+    if profiler is not None:
+        profiler.write_reports()
+        profiler.stop()
+    
+    MetricsRegistry.shared().dump_json('run_metrics.json')
+    MetricsRegistry.shared().write_prometheus('run_metrics.prom')
+    log.info("📈 Metrics saved to run_metrics.json / run_metrics.prom")
+    log.info("%s", tracer.waterfall())
+    tracer.export_chrome('flow_trace.json')
+    log.info("🌊 Trace saved to flow_trace.json (open in chrome://tracing or ui.perfetto.dev)")
     
     if success:
-        print("\n🎯 Flow completed successfully!")
-        print("You can now access the DoorDash Content Feed as a guest user.")
+        log.info("🎯 Flow completed successfully!")
+        log.info("You can now access the DoorDash Content Feed as a guest user.")
     else:
-        print("\n❌ Flow failed at some point.")
-        print("Check the error messages above for details.")
+        log.warning("❌ Flow failed at some point.")
+        log.info("Check the error messages above for details.")
 
 if __name__ == "__main__":
     main()
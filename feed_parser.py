@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Feed parsing helpers for DoorDash homepage / facet feeds
+A single iterative pass finds section cursors and store candidates together
+"""
+
+import re
+import json
+import logging
+
+import json_codec
+
+NOW_ON_DOORDASH = 'now on doordash'
+FACET_FEED_PREFIX = 'facet_feed/'
+
+log = logging.getLogger(__name__)
+
+
+class Store:
+    """One store card pulled out of a feed
+
+    Slotted so a large extraction costs a fixed, small amount per unique
+    store. `path` (the '.body[0].children[3]' location) is only filled in
+    when the walk was asked for paths.
+    """
+
+    __slots__ = ('store_id', 'name', 'subtitle', 'rating', 'delivery_fee',
+                 'delivery_time', 'uri', 'source', 'path')
+
+    def __init__(self, name, subtitle='', rating=None, delivery_fee=None, delivery_time=None,
+                 store_id=None, uri=None, source="feed", path=None):
+        self.store_id = store_id
+        self.name = name
+        self.subtitle = subtitle
+        self.rating = rating
+        self.delivery_fee = delivery_fee
+        self.delivery_time = delivery_time
+        self.uri = uri
+        self.source = source
+        self.path = path
+
+    def __repr__(self):
+        return f"Store({self.name!r}, store_id={self.store_id!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Store):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def to_dict(self):
+        """Plain dict for JSON output; `path` is left out when not collected"""
+        data = {field: getattr(self, field) for field in self.__slots__}
+        if data['path'] is None:
+            del data['path']
+        return data
+
+
+def store_key(store):
+    """Identity used to de-duplicate stores across pages, carousels and tiles"""
+    return store.store_id or store.name.lower()
+
+
+def unique_stores(stores, seen):
+    """Yield the stores whose key is not in `seen` yet, adding their keys
+
+    Lazy, so a crawler can stop part-way through a page; pass the same
+    `seen` set for every page of a crawl.
+    """
+    for store in stores:
+        key = store_key(store)
+        if key not in seen:
+            seen.add(key)
+            yield store
+
+
+def write_stores_jsonl(path, stores):
+    """Write one JSON object per store, one store per line"""
+    with open(path, 'wb') as f:
+        for store in stores:
+            f.write(json_codec.dumps(store.to_dict()))
+            f.write(b'\n')
+
+
+def _format_path(keys):
+    """Turn the walker's key stack into the '.body[0].children[3]' form"""
+    return ''.join(f"[{key}]" if isinstance(key, int) else f".{key}" for key in keys)
+
+
+def _click_data(item):
+    events = item.get('events')
+    if isinstance(events, dict) and 'click' in events:
+        click = events['click']
+        if isinstance(click, dict):
+            data = click.get('data', {})
+            if isinstance(data, dict):
+                return data
+    return None
+
+
+def cursor_from_uri(uri):
+    """Extract the cursor from a 'facet_feed/<cursor>/' click URI"""
+    if not uri.startswith(FACET_FEED_PREFIX):
+        return None
+    cursor = uri[len(FACET_FEED_PREFIX):]
+    if cursor.endswith('/'):
+        cursor = cursor[:-1]
+    return cursor
+
+
+def next_page_cursor(feed_data):
+    """Cursor of the following page (page.next.data.cursor), or None on the last page"""
+    page = feed_data.get('page') if isinstance(feed_data, dict) else None
+    next_page = page.get('next') if isinstance(page, dict) else None
+    data = next_page.get('data') if isinstance(next_page, dict) else None
+    cursor = data.get('cursor') if isinstance(data, dict) else None
+    return cursor or None
+
+
+def walk_feed(feed_data, collect_sections=True, collect_stores=True,
+              source_name="feed", stop_at_title=None, store_paths=False):
+    """Walk a feed tree once, depth-first, without recursion
+
+    Returns (sections, stores):
+      sections - dicts with title/cursor/uri/path for every node that has a
+                 title and a facet_feed/ click URI, in document order
+      stores   - Store records, de-duplicated by store_key (store_id, else
+                 lower-cased name) on the fly; store_id comes from the
+                 click data, else from custom.store_id; `path` is only set
+                 with `store_paths=True`
+
+    The walk keeps a stack of child iterators plus the keys leading to the
+    current node, so a node's path string is only built when that node ends
+    up in the result. With `stop_at_title`, the walk returns as soon as a
+    section whose title contains that (lower-case) text is found.
+    """
+    sections = []
+    stores = []
+    seen = set()
+
+    def visit(item, keys):
+        """Inspect one dict node; return True to stop the walk"""
+        text = item.get('text')
+        if type(text) is not dict:
+            return False
+        title = (text.get('title') or '').strip()
+        if not title:
+            return False
+
+        click_data = None
+        if collect_sections:
+            click_data = _click_data(item)
+            uri = click_data.get('uri') if click_data else None
+            cursor = cursor_from_uri(uri) if isinstance(uri, str) else None
+            if cursor:
+                sections.append({
+                    'title': title,
+                    'cursor': cursor,
+                    'uri': uri,
+                    'path': _format_path(keys)
+                })
+                if stop_at_title and stop_at_title in title.lower():
+                    return True
+
+        if collect_stores and len(title) > 2:
+            store = Store(title, (text.get('subtitle') or '').strip(), source=source_name)
+            custom = item.get('custom')
+            if click_data is None:
+                click_data = _click_data(item)
+            if click_data is not None:
+                store.store_id = click_data.get('store_id')
+                store.uri = click_data.get('uri')
+            if store.store_id is None and isinstance(custom, dict):
+                store.store_id = custom.get('store_id')
+            key = store_key(store)
+            if key not in seen:
+                seen.add(key)
+                if isinstance(custom, dict):
+                    store.rating = custom.get('rating')
+                    store.delivery_fee = custom.get('delivery_fee')
+                    store.delivery_time = custom.get('delivery_time')
+                if store_paths:
+                    store.path = _format_path(keys)
+                stores.append(store)
+        return False
+
+    if type(feed_data) is dict:
+        if visit(feed_data, ()):
+            return sections, stores
+        stack = [iter(feed_data.items())]
+    elif type(feed_data) is list:
+        stack = [enumerate(feed_data)]
+    else:
+        return sections, stores
+
+    keys = []
+    while stack:
+        for key, value in stack[-1]:
+            value_type = type(value)
+            if value_type is dict:
+                keys.append(key)
+                if visit(value, keys):
+                    return sections, stores
+                stack.append(iter(value.items()))
+                break
+            if value_type is list:
+                keys.append(key)
+                stack.append(enumerate(value))
+                break
+        else:
+            # Current container exhausted: climb back to its parent
+            stack.pop()
+            if keys:
+                keys.pop()
+
+    return sections, stores
+
+
+# Byte-level patterns for the streaming scanner
+_TITLE_RE = re.compile(rb'"title"\s*:\s*("[^"\\]*(?:\\.[^"\\]*)*")')
+_TEXT_OPEN_RE = re.compile(rb'"text"\s*:\s*\{\s*$')
+_SPECIAL_RE = re.compile(rb'["{}\[\]]')
+_STRING_TAIL_RE = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"')
+_SEPARATOR_RE = re.compile(rb'[\s,]*')
+_COLON_RE = re.compile(rb'\s*:\s*')
+_SCALAR_RE = re.compile(rb'[^,}\]\s]*')
+
+_INCOMPLETE = object()
+
+
+def _find_close(buf, i, depth=0):
+    """Index just past the bracket that brings `depth` back to 0, or None"""
+    while True:
+        m = _SPECIAL_RE.search(buf, i)
+        if not m:
+            return None
+        c = buf[m.start()]
+        if c == 0x22:  # '"': jump over the whole string
+            tail = _STRING_TAIL_RE.match(buf, m.end())
+            if not tail:
+                return None
+            i = tail.end()
+            continue
+        if c in (0x7b, 0x5b):  # '{' '['
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return m.end()
+        i = m.end()
+
+
+class SectionCursorScanner:
+    """Find a section's facet cursor in a homepage feed as its bytes arrive
+
+    Feed it raw chunks; it returns the cursor as soon as the section whose
+    title contains `title_text` and its events.click.data.uri have both
+    been seen, without ever building the object tree. Only a small window
+    of the body is buffered while searching.
+
+    Relies on the BFF serializing `title` as the first key of `text`
+    objects (true for every text node in raw_homepage_feed.json).
+    """
+
+    def __init__(self, title_text=NOW_ON_DOORDASH, window=8192):
+        self.title_text = title_text
+        self.window = window
+        self.buffer = bytearray()
+        self.search_from = 0
+        self.bytes_seen = 0
+        self.cursor = None
+
+    def feed(self, chunk):
+        """Consume one chunk; return the cursor once found, else None"""
+        if self.cursor:
+            return self.cursor
+        self.buffer += chunk
+        self.bytes_seen += len(chunk)
+
+        while True:
+            m = _TITLE_RE.search(self.buffer, self.search_from)
+            if not m:
+                self._trim(len(self.buffer) - self.window)
+                return None
+
+            title = json.loads(m.group(1))
+            prefix = self.buffer[max(0, m.start() - 64):m.start()]
+            if self.title_text not in title.lower() or not _TEXT_OPEN_RE.search(prefix):
+                self.search_from = m.end()
+                continue
+
+            result = self._scan_section(m.end())
+            if result is _INCOMPLETE:
+                # Wait for more bytes, but keep this title match in the buffer
+                self.search_from = m.start()
+                self._trim(m.start() - 64)
+                return None
+            if result:
+                self.cursor = result
+                return result
+            self.search_from = m.end()
+
+    def _trim(self, upto):
+        if upto <= 0:
+            return
+        del self.buffer[:upto]
+        self.search_from = max(0, self.search_from - upto)
+
+    def _scan_section(self, pos):
+        """From inside the matched text object, read the section's events"""
+        buf = self.buffer
+        i = _find_close(buf, pos, depth=1)
+        if i is None:
+            return _INCOMPLETE
+
+        # Now at the section object's own level: walk its remaining keys
+        while True:
+            i = _SEPARATOR_RE.match(buf, i).end()
+            if i >= len(buf):
+                return _INCOMPLETE
+            if buf[i] != 0x22:  # '}' (section ended) or something unexpected
+                return None
+            key_tail = _STRING_TAIL_RE.match(buf, i + 1)
+            if not key_tail:
+                return _INCOMPLETE
+            key = bytes(buf[i + 1:key_tail.end() - 1])
+            colon = _COLON_RE.match(buf, key_tail.end())
+            if not colon:
+                return _INCOMPLETE if not buf[key_tail.end():].strip() else None
+            i = colon.end()
+            if i >= len(buf):
+                return _INCOMPLETE
+
+            start = i
+            c = buf[i]
+            if c in (0x7b, 0x5b):
+                end = _find_close(buf, i)
+            elif c == 0x22:
+                tail = _STRING_TAIL_RE.match(buf, i + 1)
+                end = tail.end() if tail else None
+            else:
+                end = _SCALAR_RE.match(buf, i).end()
+                if end >= len(buf):
+                    end = None
+            if end is None:
+                return _INCOMPLETE
+
+            if key == b'events':
+                events = json.loads(buf[start:end])
+                click_data = _click_data({'events': events})
+                uri = click_data.get('uri') if click_data else None
+                return cursor_from_uri(uri) if isinstance(uri, str) else None
+            i = end
+
+
+def scan_section_cursor(chunks, title_text=NOW_ON_DOORDASH):
+    """Run a SectionCursorScanner over an iterable of byte chunks"""
+    scanner = SectionCursorScanner(title_text)
+    for chunk in chunks:
+        cursor = scanner.feed(chunk)
+        if cursor:
+            return cursor
+    return None
+
+
+def list_sections(homepage_data):
+    """Every carousel on the homepage that links to its own facet feed
+
+    Returns section dicts (title/cursor/uri/path plus a unique `key`) in
+    page order. Links nested inside a section - the 'More Stores' action
+    card at the end of a carousel - point at that same carousel and are
+    skipped. `key` is the title, suffixed with ' (2)', ' (3)', ... when
+    two carousels share a title.
+    """
+    sections, _ = walk_feed(homepage_data, collect_stores=False)
+    result = []
+    counts = {}
+    for section in sections:
+        path = section['path']
+        if result and path.startswith(result[-1]['path']) and \
+                path[len(result[-1]['path']):][:1] in ('.', '['):
+            continue
+        counts[section['title']] = counts.get(section['title'], 0) + 1
+        n = counts[section['title']]
+        result.append(dict(section, key=section['title'] if n == 1 else f"{section['title']} ({n})"))
+    return result
+
+
+def find_now_on_doordash_cursor(homepage_data):
+    """Find the 'Now on DoorDash' section cursor"""
+    log.debug("🔍 Searching for 'Now on DoorDash' section...")
+
+    sections, _ = walk_feed(homepage_data, collect_stores=False, stop_at_title=NOW_ON_DOORDASH)
+    for section in sections:
+        if NOW_ON_DOORDASH in section['title'].lower():
+            log.debug("🎯 Found section: '%s' at path: %s", section['title'], section['path'])
+            log.debug("📍 URI: %s", section['uri'])
+            log.debug("✅ Extracted cursor for 'Now on DoorDash'!")
+            log.debug("🎉 'Now on DoorDash' cursor found!")
+            return section['cursor']
+
+    log.warning("❌ 'Now on DoorDash' section not found in this location")
+    return None
+
+
+def extract_stores_from_feed(feed_data, source_name="feed"):
+    """Extract store information from feed data"""
+    log.debug("📦 Extracting stores from %s...", source_name)
+
+    _, unique_stores = walk_feed(feed_data, collect_sections=False, source_name=source_name)
+
+    log.debug("📊 Found %s unique stores", len(unique_stores))
+    return unique_stores
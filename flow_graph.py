@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Dependency-graph executor for flow steps
+Runs every step as soon as the steps it depends on have succeeded, so
+independent requests overlap, and reports the critical path
+"""
+
+import time
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class FlowStep:
+    """One node of a FlowGraph
+
+    `run` is an async callable that receives the dict of results of the
+    steps finished so far (keyed by step name). A falsy result or an
+    exception counts as failure.
+    """
+
+    def __init__(self, name, run, requires=()):
+        self.name = name
+        self.run = run
+        self.requires = tuple(requires)
+
+
+class FlowRun:
+    """Outcome of a FlowGraph run: per-step results, timings and failures"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.results = {}
+        self.timings = {}  # name -> (start, end), seconds since run start
+        self.failed = []
+        self.skipped = []
+        self.wall_time = 0.0
+
+    @property
+    def ok(self):
+        return not self.failed and not self.skipped
+
+    def duration(self, name):
+        start, end = self.timings[name]
+        return end - start
+
+    def critical_path(self):
+        """Chain of steps that determined the finish time, first to last
+
+        Walks back from the last step to finish, each time following the
+        dependency that finished latest (the one that actually gated it).
+        """
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while True:
+            requires = [r for r in self.graph.steps[name].requires if r in self.timings]
+            if not requires:
+                break
+            name = max(requires, key=lambda n: self.timings[n][1])
+            path.append(name)
+        return path[::-1]
+
+    def critical_path_latency(self):
+        """Sum of step durations along the critical path"""
+        return sum(self.duration(name) for name in self.critical_path())
+
+    def serial_latency(self):
+        """What the same steps would have cost run one after another"""
+        return sum(self.duration(name) for name in self.timings)
+
+    def summary(self):
+        lines = ["⏱️  Step timings (start → end, ms):"]
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            status = "❌" if name in self.failed else "✅"
+            lines.append(f"   {status} {name:<32} {start * 1000:8.1f} → {end * 1000:8.1f}")
+        for name in self.skipped:
+            lines.append(f"   ⏭️  {name:<32} skipped")
+        path = self.critical_path()
+        lines.append(f"   🛤️  Critical path: {' → '.join(path)}")
+        lines.append(f"   ⏱️  Critical path latency: {self.critical_path_latency() * 1000:.1f} ms")
+        lines.append(f"   ⏱️  Wall time: {self.wall_time * 1000:.1f} ms "
+                     f"(serial would be {self.serial_latency() * 1000:.1f} ms)")
+        return "\n".join(lines)
+
+
+class FlowGraph:
+    """A set of FlowSteps wired together by their `requires` names"""
+
+    def __init__(self, steps):
+        self.steps = {step.name: step for step in steps}
+        self._check()
+
+    def _check(self):
+        for step in self.steps.values():
+            for required in step.requires:
+                if required not in self.steps:
+                    raise ValueError(f"Step '{step.name}' requires unknown step '{required}'")
+
+        # Kahn's algorithm: every step must become ready at some point
+        remaining = {name: set(step.requires) for name, step in self.steps.items()}
+        while remaining:
+            ready = [name for name, requires in remaining.items() if not requires]
+            if not ready:
+                raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for requires in remaining.values():
+                requires.difference_update(ready)
+
+    async def run(self, max_concurrency=None):
+        """Execute the graph; stop scheduling new steps after the first failure
+
+        `max_concurrency` caps how many steps run at once; with 1 the steps
+        run one after another, ready ones in declaration order.
+        """
+        flow_run = FlowRun(self)
+        started = time.perf_counter()
+        pending = dict(self.steps)
+        running = {}
+
+        async def execute(step):
+            return await step.run(flow_run.results)
+
+        while pending or running:
+            if not flow_run.failed:
+                ready = [
+                    step for step in pending.values()
+                    if all(r in flow_run.results for r in step.requires)
+                ]
+                for step in ready:
+                    if max_concurrency is not None and len(running) >= max_concurrency:
+                        break
+                    del pending[step.name]
+                    task = asyncio.ensure_future(execute(step))
+                    running[task] = (step.name, time.perf_counter() - started)
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name, start = running.pop(task)
+                flow_run.timings[name] = (start, time.perf_counter() - started)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    log.warning("❌ %s raised: %s", name, e)
+                    result = None
+                if result:
+                    flow_run.results[name] = result
+                else:
+                    flow_run.failed.append(name)
+
+        flow_run.skipped = list(pending)
+        flow_run.wall_time = time.perf_counter() - started
+        return flow_run
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Logging setup for the DoorDash flows
+Records are handed to a QueueHandler, so a flow never blocks on terminal
+I/O; a background QueueListener formats and writes them. Quiet mode keeps
+only per-flow summaries and warnings
+"""
+
+import sys
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+
+import json_codec
+from tracing import current_span
+from metrics import current_step
+
+# Pass as extra= on the one-line outcome of a flow; quiet mode keeps these
+SUMMARY = {'summary': True}
+
+_listener = None
+_queue_handler = None
+
+
+class ContextFilter(logging.Filter):
+    """Stamp each record with the trace id and step of the coroutine that logged it
+
+    Runs in the QueueHandler, i.e. in the logging coroutine's context; by
+    the time the listener thread formats the record that context is gone.
+    """
+
+    def filter(self, record):
+        current = current_span.get()
+        record.trace_id = current.trace_id if current is not None else ''
+        record.step = current_step.get()
+        return True
+
+
+class QuietFilter(logging.Filter):
+    """Let through warnings and errors, plus records logged with extra=SUMMARY"""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or getattr(record, 'summary', False)
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time level logger [trace step] message`, or one JSON object per line"""
+
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record):
+        message = record.getMessage()
+        trace_id = getattr(record, 'trace_id', '')
+        step = getattr(record, 'step', '')
+        if self.json_lines:
+            entry = {
+                'time': round(record.created, 3),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': message
+            }
+            if trace_id:
+                entry['trace_id'] = trace_id
+            if step:
+                entry['step'] = step
+            if getattr(record, 'summary', False):
+                entry['summary'] = True
+            return json_codec.dumps(entry).decode('utf-8')
+
+        stamp = time.strftime('%H:%M:%S', time.localtime(record.created))
+        context = ' '.join(part for part in (trace_id[:8], step) if part)
+        context = f" [{context}]" if context else ''
+        return (f"{stamp}.{int(record.msecs):03d} {record.levelname:<7} "
+                f"{record.name}{context} {message}")
+
+
+def configure_logging(level=logging.INFO, quiet=False, json_lines=False, stream=None):
+    """Send every logger's records through a queue to one stream handler
+
+    Call once from an entry point. `level` logging.DEBUG shows the per-step
+    detail (statuses, sizes, cursors); `quiet` keeps only summaries and
+    warnings. Writes to stderr by default.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_lines))
+
+    records = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    _queue_handler.addFilter(ContextFilter())
+    if quiet:
+        _queue_handler.addFilter(QuietFilter())
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and detach the queue handler"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def add_logging_arguments(parser):
+    """--quiet / --debug / --log-json on an argparse parser"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--quiet', action='store_true',
+                       help="log only per-flow summaries and warnings")
+    group.add_argument('--debug', action='store_true',
+                       help="log per-step detail: statuses, sizes, cursors")
+    parser.add_argument('--log-json', action='store_true', help="log one JSON object per line")
+
+
+def configure_from_args(args):
+    configure_logging(logging.DEBUG if args.debug else logging.INFO,
+                      quiet=args.quiet, json_lines=args.log_json)
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Geographic sweep over a bounding box in coordinates mode
+Crawls the homepage sections at every point of a uniform grid or of an
+adaptive quadtree on a few shared guests, de-duplicating stores by
+store_id across tiles
+"""
+
+import math
+import time
+import asyncio
+import logging
+import argparse
+
+from Now_on_doordash import BASE_URL, AsyncOptimizedDoorDashFlow, new_session
+from feed_parser import store_key, write_stores_jsonl
+from flow_logging import SUMMARY, add_logging_arguments, configure_from_args
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320  # at the equator, scaled by cos(lat)
+
+log = logging.getLogger(__name__)
+
+
+def grid_cells(bbox, tile_km):
+    """Split `bbox` into a grid of roughly `tile_km` x `tile_km` cells
+
+    `bbox` and every cell are (south, west, north, east) in degrees. The
+    box is split into whole rows and columns, so cells come out slightly
+    smaller than `tile_km` rather than spilling past the edges. Cells run
+    row by row.
+    """
+    south, west, north, east = bbox
+    if south >= north or west >= east:
+        raise ValueError(f"Bounding box must be (south, west, north, east), got {bbox}")
+    mid_lat = math.radians((south + north) / 2)
+    rows = max(1, math.ceil((north - south) * KM_PER_DEGREE_LAT / tile_km))
+    cols = max(1, math.ceil((east - west) * KM_PER_DEGREE_LNG * math.cos(mid_lat) / tile_km))
+    tile_lat = (north - south) / rows
+    tile_lng = (east - west) / cols
+    return [
+        (south + row * tile_lat, west + col * tile_lng,
+         south + (row + 1) * tile_lat, west + (col + 1) * tile_lng)
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+
+def cell_center(cell):
+    south, west, north, east = cell
+    return round((south + north) / 2, 6), round((west + east) / 2, 6)
+
+
+def cell_size_km(cell):
+    """Length of the longer side of a cell"""
+    south, west, north, east = cell
+    mid_lat = math.radians((south + north) / 2)
+    return max((north - south) * KM_PER_DEGREE_LAT,
+               (east - west) * KM_PER_DEGREE_LNG * math.cos(mid_lat))
+
+
+def contains(outer, inner):
+    """True if cell `outer` covers all of cell `inner` (e.g. it is an ancestor)"""
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and \
+        outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def split_cell(cell):
+    """The four quadrants of a cell"""
+    south, west, north, east = cell
+    mid_lat, mid_lng = (south + north) / 2, (west + east) / 2
+    return [
+        (south, west, mid_lat, mid_lng), (south, mid_lng, mid_lat, east),
+        (mid_lat, west, north, mid_lng), (mid_lat, mid_lng, north, east)
+    ]
+
+
+def distance_km(a, b):
+    """Equirectangular distance between two (lat, lng) points - fine at city scale"""
+    mid_lat = math.radians((a[0] + b[0]) / 2)
+    return math.hypot((a[0] - b[0]) * KM_PER_DEGREE_LAT,
+                      (a[1] - b[1]) * KM_PER_DEGREE_LNG * math.cos(mid_lat))
+
+
+def grid_points(bbox, tile_km):
+    """Centres of the grid_cells of `bbox`, as (lat, lng) pairs"""
+    return [cell_center(cell) for cell in grid_cells(bbox, tile_km)]
+
+
+def jaccard(a, b):
+    """Overlap of two store key sets (1.0 = identical, 0.0 = disjoint)"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class GeoSweeper:
+    """Probe many points in coordinates mode on a small set of shared guests
+
+    Opens `guests` flows, each holding one guest token for the whole sweep
+    (leased from a session_pool when one is passed in `flow_options`).
+    Every probe borrows an idle flow, so at most `guests` points are in
+    flight. All flows share one session (and its connections). Unique stores accumulate in `self.stores` (keyed by store_id),
+    one record per probe in `self.tiles`.
+    """
+
+    def __init__(self, guests=4, titles=None, section_concurrency=4, **flow_options):
+        self.guests = guests
+        self.titles = titles
+        self.section_concurrency = section_concurrency
+        self.flow_options = flow_options
+        self.flows = []
+        self.stores = {}
+        self.tiles = []
+        self.started = None
+        self._idle = None
+        self._session = None
+
+    async def __aenter__(self):
+        flow_options = dict(self.flow_options)
+        if flow_options.get('session') is None:
+            flow_options['session'] = self._session = new_session()
+        self.flows = [AsyncOptimizedDoorDashFlow(**flow_options) for _ in range(self.guests)]
+        acquired = await asyncio.gather(*(flow.acquire_guest() for flow in self.flows))
+        self._idle = asyncio.Queue()
+        for flow, ok in zip(self.flows, acquired):
+            if ok:
+                self._idle.put_nowait(flow)
+        if self._idle.empty():
+            await self.close()
+            raise RuntimeError("Could not get a guest token for the sweep")
+        self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        for flow in self.flows:
+            await flow.release_guest()
+            await flow.close()
+        self.flows = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _crawl(self, flow, lat, lng):
+        flow.set_coordinates(lat, lng)
+        results = await flow.crawl_sections(self.titles, self.section_concurrency)
+        if results is None and flow.token_rejected:
+            log.info("🔄 Guest token rejected mid-sweep - creating a fresh guest")
+            await flow.release_guest()
+            if await flow.step_2_create_guest():
+                results = await flow.crawl_sections(self.titles, self.section_concurrency)
+        return results
+
+    async def probe(self, lat, lng):
+        """Crawl one point; returns {store key: Store} for it, or None on failure"""
+        flow = await self._idle.get()
+        start = time.perf_counter()
+        try:
+            results = await self._crawl(flow, lat, lng)
+        finally:
+            self._idle.put_nowait(flow)
+
+        if results is None:
+            self.tiles.append({'lat': lat, 'lng': lng, 'ok': False, 'stores': 0, 'new_stores': 0,
+                               'seconds': time.perf_counter() - start})
+            log.warning("🧭 Tile %s (%s, %s): ❌ failed", len(self.tiles), lat, lng)
+            return None
+
+        found = {}
+        for stores in results.values():
+            for store in stores:
+                found.setdefault(store_key(store), store)
+        new_keys = found.keys() - self.stores.keys()
+        for key in new_keys:
+            self.stores[key] = found[key]
+
+        self.tiles.append({'lat': lat, 'lng': lng, 'ok': True, 'stores': len(found),
+                           'new_stores': len(new_keys), 'seconds': time.perf_counter() - start})
+        log.info("🧭 Tile %s (%s, %s): %s stores, %s new | %s unique | %.2f tiles/s",
+                 len(self.tiles), lat, lng, len(found), len(new_keys), len(self.stores),
+                 self.tiles_per_second())
+        return found
+
+    async def sweep(self, points):
+        """Probe every point, as many at once as there are guests"""
+        return await asyncio.gather(*(self.probe(lat, lng) for lat, lng in points))
+
+    def tiles_per_second(self):
+        elapsed = time.perf_counter() - self.started
+        return len(self.tiles) / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        """Throughput and yield summary of everything probed so far"""
+        ok_tiles = [tile for tile in self.tiles if tile['ok']]
+        new_per_tile = [tile['new_stores'] for tile in ok_tiles]
+        # Yield of the last quarter of tiles: near zero means the area is saturated
+        tail = new_per_tile[-max(1, len(new_per_tile) // 4):] if new_per_tile else []
+        return {
+            'tiles': len(self.tiles),
+            'failed_tiles': len(self.tiles) - len(ok_tiles),
+            'elapsed': time.perf_counter() - self.started,
+            'tiles_per_second': self.tiles_per_second(),
+            'unique_stores': len(self.stores),
+            'new_stores_per_tile': sum(new_per_tile) / len(new_per_tile) if new_per_tile else 0.0,
+            'new_stores_per_tile_last_quarter': sum(tail) / len(tail) if tail else 0.0,
+            'guests_created': sum(flow.guests_created for flow in self.flows)
+        }
+
+
+def print_report(report):
+    log.info("📊 Sweep: %s tiles (%s failed) in %.1fs - %.2f tiles/s", report['tiles'],
+             report['failed_tiles'], report['elapsed'], report['tiles_per_second'], extra=SUMMARY)
+    log.info("🏪 %s unique stores, %.1f new per tile (%.1f over the last quarter)",
+             report['unique_stores'], report['new_stores_per_tile'],
+             report['new_stores_per_tile_last_quarter'], extra=SUMMARY)
+
+
+async def run_grid_sweep_async(bbox, tile_km=2.0, guests=4, titles=None, **sweeper_options):
+    """Sweep a uniform grid over `bbox`; returns (stores, report)"""
+    points = grid_points(bbox, tile_km)
+    log.info("🚀 Grid sweep: %s tiles of ~%s km on %s guest(s)", len(points), tile_km, guests)
+
+    async with GeoSweeper(guests, titles, **sweeper_options) as sweeper:
+        await sweeper.sweep(points)
+        report = sweeper.report()
+    print_report(report)
+    return list(sweeper.stores.values()), report
+
+
+def run_grid_sweep(bbox, tile_km=2.0, guests=4, titles=None, **sweeper_options):
+    """Sweep a uniform grid over `bbox` synchronously"""
+    return asyncio.run(run_grid_sweep_async(bbox, tile_km, guests, titles, **sweeper_options))
+
+
+async def run_quadtree_sweep_async(bbox, start_tile_km=4.0, min_tile_km=0.5, threshold=0.8,
+                                   guests=4, titles=None, compare_uniform=False,
+                                   **sweeper_options):
+    """Adaptive sweep: refine only where neighbouring store sets disagree
+    
+    Probes a coarse grid of `start_tile_km` cells, then works level by
+    level. A cell is split into four when its store set overlaps less than
+    `threshold` (Jaccard on store keys) with one of its probed neighbours
+    (its own ancestors do not count), i.e. the stores change faster than
+    the grid resolves. Cells with a neighbour above the threshold
+    everywhere, cells whose probe found no new stores (saturated), and
+    cells no bigger than `min_tile_km` are not split. A cell whose probe
+    fails is retried once and, if it fails again, split so its area is
+    still covered. Returns (stores, report).
+    
+    With `compare_uniform`, a uniform grid at `min_tile_km` (the resolution
+    the quadtree can reach) is swept afterwards on the same guests and the
+    report gains probe counts and coverage for both.
+    """
+    log.info("🚀 Quadtree sweep: %s km cells down to %s km, split below Jaccard %s",
+             start_tile_km, min_tile_km, threshold)
+    
+    async with GeoSweeper(guests, titles, **sweeper_options) as sweeper:
+        probed = []  # (cell, store keys) of every successful probe
+        level = grid_cells(bbox, start_tile_km)
+        depth = 0
+        while level:
+            log.info("🌳 Level %s: probing %s cell(s)", depth, len(level))
+            known = len(sweeper.stores)
+            outcomes = dict(zip(level, await sweeper.sweep([cell_center(cell) for cell in level])))
+            failed = [cell for cell in level if outcomes[cell] is None]
+            if failed:
+                log.info("🔁 Level %s: retrying %s failed cell(s)", depth, len(failed))
+                retried = await sweeper.sweep([cell_center(cell) for cell in failed])
+                outcomes.update(zip(failed, retried))
+            
+            # Stores known before this level decide whether a cell is saturated
+            seen_before = {key for _, keys in probed for key in keys}
+            level_probes = [
+                (cell, set(outcomes[cell])) for cell in level if outcomes[cell] is not None
+            ]
+            probed += level_probes
+            
+            next_level = []
+            uncovered = 0
+            for cell in level:
+                if outcomes[cell] is None:
+                    # Failed twice: refine rather than silently drop the area
+                    if cell_size_km(cell) > min_tile_km:
+                        next_level += split_cell(cell)
+                    else:
+                        uncovered += 1
+            for cell, keys in level_probes:
+                center, size = cell_center(cell), cell_size_km(cell)
+                if size <= min_tile_km or not keys - seen_before:
+                    continue
+                neighbours = [
+                    other_keys for other_cell, other_keys in probed
+                    if other_cell != cell and not contains(other_cell, cell)
+                    and distance_km(center, cell_center(other_cell))
+                    <= 1.5 * max(size, cell_size_km(other_cell))
+                ]
+                if neighbours and min(jaccard(keys, other) for other in neighbours) >= threshold:
+                    continue
+                next_level += split_cell(cell)
+            log.info("🌳 Level %s: %s new stores, %s cell(s) split",
+                     depth, len(sweeper.stores) - known, len(next_level) // 4)
+            if uncovered:
+                log.warning("🌳 Level %s: %s cell(s) at the minimum size failed twice - "
+                            "left uncovered", depth, uncovered)
+            level = next_level
+            depth += 1
+        
+        report = sweeper.report()
+        report['levels'] = depth
+        stores = list(sweeper.stores.values())
+        
+        if compare_uniform:
+            adaptive_keys = set(sweeper.stores)
+            adaptive_tiles = len(sweeper.tiles)
+            log.info("📏 Uniform baseline: %s km grid", min_tile_km)
+            sweeper.stores, sweeper.tiles = {}, []
+            sweeper.started = time.perf_counter()
+            await sweeper.sweep(grid_points(bbox, min_tile_km))
+            uniform_keys = set(sweeper.stores)
+            report['uniform'] = {
+                'tiles': len(sweeper.tiles),
+                'elapsed': time.perf_counter() - sweeper.started,
+                'tiles_per_second': sweeper.tiles_per_second(),
+                'unique_stores': len(uniform_keys),
+                'coverage_of_uniform': len(adaptive_keys & uniform_keys) / len(uniform_keys)
+                if uniform_keys else 1.0,
+                'request_ratio': adaptive_tiles / len(sweeper.tiles) if sweeper.tiles else 0.0
+            }
+    
+    print_report(report)
+    if 'uniform' in report:
+        uniform = report['uniform']
+        log.info("📏 Uniform grid: %s tiles (%.2f tiles/s), %s stores - quadtree found %.1f%% "
+                 "of them with %.1f%% of the probes", uniform['tiles'],
+                 uniform['tiles_per_second'], uniform['unique_stores'],
+                 uniform['coverage_of_uniform'] * 100, uniform['request_ratio'] * 100,
+                 extra=SUMMARY)
+    return stores, report
+
+
+def run_quadtree_sweep(bbox, **options):
+    """Adaptive quadtree sweep over `bbox` synchronously"""
+    return asyncio.run(run_quadtree_sweep_async(bbox, **options))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep a bounding box for DoorDash stores")
+    parser.add_argument('--bbox', type=float, nargs=4, required=True,
+                        metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'))
+    parser.add_argument('--tile-km', type=float, default=2.0)
+    parser.add_argument('--guests', type=int, default=4)
+    parser.add_argument('--section', action='append', dest='titles',
+                        help="homepage section to crawl (repeatable, default: all)")
+    parser.add_argument('--max-pages', type=int, default=None, help="pages per section")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="quadtree sweep from --tile-km cells down to --min-tile-km")
+    parser.add_argument('--min-tile-km', type=float, default=0.5)
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help="split cells whose Jaccard overlap with a neighbour is below this")
+    parser.add_argument('--compare-uniform', action='store_true',
+                        help="also sweep a uniform --min-tile-km grid and compare")
+    parser.add_argument('--output', default='sweep_stores.jsonl')
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help="BFF to query, e.g. a local mock_bff_server.py")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    if args.adaptive:
+        stores, _ = run_quadtree_sweep(
+            tuple(args.bbox),
+            start_tile_km=args.tile_km,
+            min_tile_km=args.min_tile_km,
+            threshold=args.threshold,
+            guests=args.guests,
+            titles=args.titles,
+            compare_uniform=args.compare_uniform,
+            max_pages=args.max_pages,
+            base_url=args.base_url
+        )
+    else:
+        stores, _ = run_grid_sweep(tuple(args.bbox), args.tile_km, args.guests, args.titles,
+                                   max_pages=args.max_pages, base_url=args.base_url)
+    write_stores_jsonl(args.output, stores)
+    log.info("💾 %s stores saved to %s", len(stores), args.output)
+
+
+if __name__ == "__main__":
+    main()
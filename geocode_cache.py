@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+On-disk geocoding cache for the address steps
+Maps normalized queries to place_ids (step 9) and place_ids to coordinates
+(step 10) in SQLite, with TTL expiry and LRU eviction
+"""
+
+import re
+import time
+import sqlite3
+import threading
+
+
+def normalize_query(address_query):
+    """Case/whitespace/punctuation-insensitive cache key for an address query"""
+    query = re.sub(r'[^\w\s]', ' ', address_query.lower())
+    return ' '.join(query.split())
+
+
+class GeocodeCache:
+    """SQLite cache of query -> place_id and place_id -> (lat, lng, address)
+
+    Entries older than `ttl` seconds count as misses and are dropped. Each
+    table keeps at most `max_entries` rows, evicting the least recently used.
+    Hit/miss counters live in `self.hits` / `self.misses`, see stats().
+    """
+
+    def __init__(self, path="geocode_cache.sqlite3", ttl=30 * 24 * 3600, max_entries=50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = {'query': 0, 'place': 0}
+        self.misses = {'query': 0, 'place': 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT PRIMARY KEY,
+                place_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS places (
+                place_id TEXT PRIMARY KEY,
+                lat REAL NOT NULL,
+                lng REAL NOT NULL,
+                printable_address TEXT,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS queries_lru ON queries (accessed_at);
+            CREATE INDEX IF NOT EXISTS places_lru ON places (accessed_at);
+        """)
+        self._db.commit()
+
+    def _get(self, table, key_column, key, columns):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {columns}, created_at FROM {table} WHERE {key_column} = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[-1] > self.ttl:
+                self._db.execute(f"DELETE FROM {table} WHERE {key_column} = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                f"UPDATE {table} SET accessed_at = ? WHERE {key_column} = ?", (now, key)
+            )
+            self._db.commit()
+            return row[:-1]
+
+    def _put(self, table, values):
+        now = time.time()
+        placeholders = ', '.join('?' * (len(values) + 2))
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", (*values, now, now)
+            )
+            # LRU eviction once the table outgrows max_entries
+            self._db.execute(
+                f"DELETE FROM {table} WHERE rowid IN ("
+                f"SELECT rowid FROM {table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def get_place_id(self, address_query):
+        """Cached step 9 result for a query, or None"""
+        row = self._get('queries', 'query', normalize_query(address_query), 'place_id')
+        self._count('query', row)
+        return row[0] if row else None
+
+    def put_place_id(self, address_query, place_id):
+        self._put('queries', (normalize_query(address_query), place_id))
+
+    def get_place(self, place_id):
+        """Cached step 10 result for a place_id as a dict, or None"""
+        row = self._get('places', 'place_id', place_id, 'lat, lng, printable_address')
+        self._count('place', row)
+        if not row:
+            return None
+        return {'lat': row[0], 'lng': row[1], 'printable_address': row[2]}
+
+    def put_place(self, place_id, lat, lng, printable_address=None):
+        self._put('places', (place_id, lat, lng, printable_address))
+
+    def _count(self, kind, row):
+        if row:
+            self.hits[kind] += 1
+        else:
+            self.misses[kind] += 1
+
+    def stats(self):
+        """Hit/miss counters and current table sizes"""
+        with self._lock:
+            sizes = {
+                table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('queries', 'places')
+            }
+        lookups = sum(self.hits.values()) + sum(self.misses.values())
+        return {
+            'hits': dict(self.hits),
+            'misses': dict(self.misses),
+            'hit_rate': sum(self.hits.values()) / lookups if lookups else 0.0,
+            'entries': sizes
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Persistent pool of DoorDash guest sessions
+Keeps JWTs and device/session identities on disk so flows can skip
+/v1/consumer_profile/create_full_guest whenever a warm guest is available
+"""
+
+import os
+import json
+import time
+import base64
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+
+# Identity fields set in OptimizedDoorDashFlow.__init__ plus the JWT
+SESSION_FIELDS = (
+    'jwt_token',
+    'device_id',
+    'session_id',
+    'correlation_id',
+    'client_request_id'
+)
+
+
+def token_expiry(jwt_token):
+    """Return the `exp` claim of a JWT, or None if it cannot be read"""
+    try:
+        payload = jwt_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+    except Exception:
+        return None
+
+
+class GuestSessionPool:
+    """JSON-file backed pool of idle guest sessions
+
+    Leasing removes a session from the file, so two flows (or two processes
+    sharing the file) never use the same guest at once. Releasing puts it
+    back; a session whose token was rejected is simply never released.
+    """
+
+    def __init__(self, path="guest_sessions.json", expiry_margin=300):
+        self.path = path
+        self.expiry_margin = expiry_margin
+        self._lock = threading.Lock()
+        self.stats = {'leased': 0, 'released': 0, 'discarded': 0, 'expired': 0}
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self, sessions):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(sessions, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _locked(self, update):
+        """Run update(sessions) -> (sessions, result) under both locks"""
+        with self._lock:
+            lock_file = None
+            if fcntl:
+                lock_file = open(f"{self.path}.lock", 'w')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                sessions, result = update(self._load())
+                self._save(sessions)
+                return result
+            finally:
+                if lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def _is_fresh(self, session):
+        exp = token_expiry(session.get('jwt_token', ''))
+        return exp is None or exp > time.time() + self.expiry_margin
+
+    def lease(self):
+        """Take a warm session out of the pool, or None if the pool is empty"""
+        def update(sessions):
+            fresh = [s for s in sessions if self._is_fresh(s)]
+            self.stats['expired'] += len(sessions) - len(fresh)
+            if not fresh:
+                return fresh, None
+            # Oldest-used first so tokens rotate evenly
+            fresh.sort(key=lambda s: s.get('last_used_at', 0))
+            return fresh[1:], fresh[0]
+
+        session = self._locked(update)
+        if session:
+            self.stats['leased'] += 1
+        return session
+
+    def release(self, session):
+        """Return a session to the pool after a successful flow"""
+        session = {field: session[field] for field in SESSION_FIELDS}
+        session['last_used_at'] = time.time()
+
+        def update(sessions):
+            sessions = [s for s in sessions if s.get('jwt_token') != session['jwt_token']]
+            sessions.append(session)
+            return sessions, None
+
+        self._locked(update)
+        self.stats['released'] += 1
+
+    def discard(self, session):
+        """Drop a session whose token was rejected"""
+        def update(sessions):
+            kept = [s for s in sessions if s.get('jwt_token') != session.get('jwt_token')]
+            return kept, None
+
+        self._locked(update)
+        self.stats['discarded'] += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+JSON codec used for feed responses and saved artifacts
+Uses orjson when it is installed and falls back to the stdlib json module
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def loads(data):
+    """Decode a JSON document from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent=False):
+    """Encode `obj` to UTF-8 bytes, optionally indented by 2 spaces"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def write_raw(path, body):
+    """Save a response body exactly as it came off the wire"""
+    with open(path, 'wb') as f:
+        f.write(body)
+
+
+def dump_file(path, obj, indent=True):
+    """Encode `obj` and write it to `path`"""
+    write_raw(path, dumps(obj, indent=indent))
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Load test for the optimized flow
+Runs N concurrent optimized flows for a fixed duration and reports latency
+percentiles per step, flows/second, an error breakdown and client CPU/RSS
+
+Usage: python load_test.py --mock --concurrency 20 --duration 30 --output load.json
+       python load_test.py --base-url http://127.0.0.1:8765 --baseline load.json
+"""
+
+import os
+import sys
+import time
+import asyncio
+import inspect
+import logging
+import argparse
+import functools
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import json_codec
+from rate_limiter import RateLimiter, DEFAULT_RATES
+from resilience import RequestExecutor
+from metrics import MetricsRegistry
+from tracing import Tracer
+from flow_logging import configure_logging, stop_logging
+from Now_on_doordash import (
+    BASE_URL,
+    AsyncOptimizedDoorDashFlow,
+    new_session,
+    _run_optimized_steps
+)
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated q-th percentile (0-100) of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def summarize(durations):
+    """count / mean / p50 / p95 / p99 / max of a list of seconds, in ms"""
+    values = sorted(durations)
+    if not values:
+        return {'count': 0}
+    summary = {'count': len(values), 'mean_ms': round(sum(values) / len(values) * 1000, 2)}
+    for q in (50, 95, 99):
+        summary[f"p{q}_ms"] = round(percentile(values, q) * 1000, 2)
+    summary['max_ms'] = round(values[-1] * 1000, 2)
+    return summary
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux only, else None)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 1)
+
+
+def max_rss_mb():
+    """Peak resident set size in MB since the process started, if known"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def step_order(item):
+    """Sort ('step_10_...', ...) items by step number rather than as text"""
+    number = item[0].split('_')[1]
+    return (int(number) if number.isdigit() else 0, item[0])
+
+
+class LoadRecorder:
+    """Collects step timings, flow timings and errors across all flows
+
+    instrument() wraps a flow's step_* coroutines and its _request method
+    on that one instance, so the flow code itself is unchanged. A step
+    counts as failed when it raises or returns a falsy value.
+
+    Errors are tallied as 'http_429', 'ConnectionError', ... twice over:
+    `errors` counts every attempt on the wire (wrap the session with
+    instrument_session), `failed_requests` only what a step got back after
+    the executor's retries, including CircuitOpenError.
+    """
+
+    def __init__(self):
+        self.steps = {}
+        self.step_failures = {}
+        self.flow_durations = []
+        self.flows_succeeded = 0
+        self.flows_failed = 0
+        self.errors = {}
+        self.failed_requests = {}
+
+    @staticmethod
+    def count(counter, kind):
+        counter[kind] = counter.get(kind, 0) + 1
+
+    def instrument(self, flow):
+        for name, method in inspect.getmembers(flow, inspect.iscoroutinefunction):
+            if name.startswith('step_'):
+                setattr(flow, name, self._timed_step(name, method))
+        flow._request = self._counted(flow._request, self.failed_requests)
+        return flow
+
+    def instrument_session(self, session):
+        session.request = self._counted(session.request, self.errors)
+        return session
+
+    def _timed_step(self, name, method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            result = None
+            try:
+                result = await method(*args, **kwargs)
+                return result
+            finally:
+                self.steps.setdefault(name, []).append(time.perf_counter() - started)
+                if not result:
+                    self.step_failures[name] = self.step_failures.get(name, 0) + 1
+        return timed
+
+    def _counted(self, request, counter):
+        @functools.wraps(request)
+        async def counted(*args, **kwargs):
+            try:
+                response = await request(*args, **kwargs)
+            except Exception as e:
+                self.count(counter, type(e).__name__)
+                raise
+            if response.status_code >= 300:
+                self.count(counter, f"http_{response.status_code}")
+            return response
+        return counted
+
+    def flow_done(self, duration, ok):
+        self.flow_durations.append(duration)
+        if ok:
+            self.flows_succeeded += 1
+        else:
+            self.flows_failed += 1
+
+
+def unthrottled_executor(concurrency, metrics=None):
+    """Executor whose limiter never holds back a request
+
+    For measuring the client itself: token buckets are effectively
+    unlimited and the AIMD limit starts (and stays) above `concurrency`.
+    """
+    limit = max(64, concurrency * 4)
+    rates = {name: (1e6, 1e6) for name in DEFAULT_RATES}
+    return RequestExecutor(RateLimiter(rates, initial=limit, maximum=limit), metrics=metrics)
+
+
+async def run_load_test(base_url=BASE_URL, concurrency=10, duration=30.0, addresses=None,
+                        unthrottled=False, tracer=None, **flow_options):
+    """Keep `concurrency` optimized flows running for `duration` seconds
+
+    Each worker starts a new flow as soon as its last one finishes, until
+    the deadline; flows still running then are allowed to finish. All flows
+    share one session, one RequestExecutor and one MetricsRegistry built
+    for this run; pass a Tracer to record spans of every flow. Returns the
+    report dict.
+    """
+    addresses = addresses or [f"{n} Load Test Ave" for n in range(100, 200)]
+    metrics = MetricsRegistry()
+    executor = unthrottled_executor(concurrency, metrics) if unthrottled \
+        else RequestExecutor(RateLimiter(), metrics=metrics)
+    recorder = LoadRecorder()
+    session = recorder.instrument_session(new_session())
+    started_flows = 0
+
+    async def run_flow(address_query):
+        flow = recorder.instrument(AsyncOptimizedDoorDashFlow(
+            base_url=base_url, session=session, executor=executor, metrics=metrics, tracer=tracer,
+            **flow_options
+        ))
+        started = time.perf_counter()
+        stores = None
+        try:
+            stores = await _run_optimized_steps(flow, address_query, save_artifacts=False)
+        except Exception as e:
+            recorder.count(recorder.failed_requests, type(e).__name__)
+        finally:
+            await flow.release_guest()
+            await flow.close()
+        recorder.flow_done(time.perf_counter() - started, bool(stores))
+
+    async def worker():
+        nonlocal started_flows
+        while time.perf_counter() < deadline:
+            address_query = addresses[started_flows % len(addresses)]
+            started_flows += 1
+            await run_flow(address_query)
+
+    cpu_before = time.process_time()
+    wall_started = time.perf_counter()
+    deadline = wall_started + duration
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await session.close()
+    elapsed = time.perf_counter() - wall_started
+    cpu_seconds = time.process_time() - cpu_before
+
+    completed = len(recorder.flow_durations)
+    return {
+        'config': {
+            'base_url': base_url,
+            'concurrency': concurrency,
+            'duration_s': duration,
+            'unthrottled': unthrottled,
+            'flow_options': {key: value for key, value in flow_options.items()
+                             if isinstance(value, (int, float, str, bool, type(None)))}
+        },
+        'elapsed_s': round(elapsed, 3),
+        'flows': {
+            'completed': completed,
+            'succeeded': recorder.flows_succeeded,
+            'failed': recorder.flows_failed
+        },
+        'flows_per_second': round(completed / elapsed, 3) if elapsed else 0.0,
+        'successful_flows_per_second': round(recorder.flows_succeeded / elapsed, 3) if elapsed else 0.0,
+        'flow_latency': summarize(recorder.flow_durations),
+        'steps': {
+            name: dict(summarize(durations), failures=recorder.step_failures.get(name, 0))
+            for name, durations in sorted(recorder.steps.items(), key=step_order)
+        },
+        'errors': dict(sorted(recorder.errors.items())),
+        'failed_requests': dict(sorted(recorder.failed_requests.items())),
+        'client': {
+            'cpu_seconds': round(cpu_seconds, 3),
+            'cpu_percent': round(cpu_seconds / elapsed * 100, 1) if elapsed else 0.0,
+            'rss_mb': rss_mb(),
+            'max_rss_mb': max_rss_mb()
+        },
+        'rate_limiter': executor.rate_limiter.stats(),
+        'retries': executor.stats(),
+        'metrics': metrics.to_dict()
+    }
+
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print(f"📊 Load test: {report['flows']['completed']} flows in {report['elapsed_s']}s "
+          f"({report['config']['concurrency']} concurrent)")
+    print("=" * 60)
+    print(f"   🚀 {report['flows_per_second']} flows/s "
+          f"({report['successful_flows_per_second']} successful/s)")
+    latency = report['flow_latency']
+    if latency['count']:
+        print(f"   ⏱️  flow p50 {latency['p50_ms']} ms | p95 {latency['p95_ms']} ms | "
+              f"p99 {latency['p99_ms']} ms")
+    for name, step in report['steps'].items():
+        print(f"   {name:<32} n={step['count']:<6} p50 {step['p50_ms']:>8} ms  "
+              f"p95 {step['p95_ms']:>8} ms  p99 {step['p99_ms']:>8} ms  failed {step['failures']}")
+    if report['errors']:
+        print(f"   ⚠️  errors on the wire: {report['errors']}")
+    if report['failed_requests']:
+        print(f"   ❌ failed after retries: {report['failed_requests']}")
+    client = report['client']
+    print(f"   🖥️  CPU {client['cpu_seconds']}s ({client['cpu_percent']}%), "
+          f"RSS {client['rss_mb']} MB (peak {client['max_rss_mb']} MB)")
+
+
+def compare_to_baseline(report, baseline, max_regression):
+    """True when flows/s is within `max_regression` (a fraction) of the baseline"""
+    before = baseline.get('flows_per_second') or 0
+    after = report['flows_per_second']
+    if not before:
+        return True
+    change = (after - before) / before
+    print(f"   📈 flows/s {before} -> {after} ({change:+.1%} vs baseline)")
+    if change < -max_regression:
+        print(f"   ❌ Throughput regressed by more than {max_regression:.0%}")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the optimized DoorDash flow")
+    parser.add_argument('--base-url', default=None,
+                        help="BFF to load (default: the real one unless --mock)")
+    parser.add_argument('--mock', action='store_true',
+                        help="start mock_bff_server in this process and load it "
+                             "(its threads then count towards client CPU)")
+    parser.add_argument('--mock-latency', type=float, default=0.02)
+    parser.add_argument('--mock-error-rate', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds to keep starting flows")
+    parser.add_argument('--address', action='append', dest='addresses',
+                        help="address query to cycle through (repeatable)")
+    parser.add_argument('--stream-homepage', action='store_true')
+    parser.add_argument('--page-fan-out', type=int, default=1)
+    parser.add_argument('--unthrottled', action='store_true',
+                        help="bypass the client rate limits to measure raw client throughput")
+    parser.add_argument('--verbose', action='store_true',
+                        help="log a summary line per flow (default: warnings only)")
+    parser.add_argument('--output', default='load_test_results.json')
+    parser.add_argument('--trace', metavar='PATH',
+                        help="record spans and write a Chrome trace of every flow to PATH")
+    parser.add_argument('--baseline', help="earlier results JSON to compare flows/s against")
+    parser.add_argument('--max-regression', type=float, default=0.1,
+                        help="fail when flows/s drops by more than this fraction")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url or BASE_URL
+    if args.mock:
+        from mock_bff_server import MockBFFServer
+        server = MockBFFServer(latency=args.mock_latency, error_rate=args.mock_error_rate).start()
+        base_url = server.base_url
+
+    tracer = Tracer(max_spans=1000000) if args.trace else None
+    configure_logging(logging.INFO if args.verbose else logging.WARNING, quiet=True)
+    print(f"🚀 Load test against {base_url}: {args.concurrency} concurrent flows for {args.duration}s")
+    try:
+        report = asyncio.run(run_load_test(
+            base_url,
+            args.concurrency,
+            args.duration,
+            args.addresses,
+            args.unthrottled,
+            tracer,
+            stream_homepage=args.stream_homepage,
+            page_fan_out=args.page_fan_out
+        ))
+    finally:
+        stop_logging()
+        if server is not None:
+            server.stop()
+    if server is not None:
+        mock_stats = server.stats()
+        # orjson only takes string keys
+        mock_stats['statuses'] = {str(status): n for status, n in mock_stats['statuses'].items()}
+        report['mock'] = mock_stats
+
+    print_report(report)
+    json_codec.dump_file(args.output, report)
+    print(f"💾 Results saved to {args.output}")
+    if tracer is not None:
+        tracer.export_chrome(args.trace)
+        print(f"🌊 Trace of {len(tracer.traces())} flows saved to {args.trace}")
+
+    if args.baseline:
+        with open(args.baseline, 'rb') as f:
+            baseline = json_codec.loads(f.read())
+        if not compare_to_baseline(report, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Metrics registry for the DoorDash flows
+Counters and latency/size histograms per step and endpoint, exported as
+Prometheus text or JSON at the end of a run
+"""
+
+import time
+import functools
+import threading
+import contextvars
+
+import json_codec
+from tracing import span
+
+# Seconds; the last bucket is always +Inf
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bytes: 1 KiB .. 16 MiB in powers of 4
+SIZE_BUCKETS = tuple(1024 * 4 ** n for n in range(8))
+
+# The step_* method the current coroutine is running, used as a label on
+# every request it sends
+current_step = contextvars.ContextVar('current_step', default='')
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [{'labels': dict(key), 'value': value} for key, value in self.values.items()]
+
+    def exposition(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {_format_value(value)}"
+                    for key, value in self.values.items()]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def _cumulative(self, counts):
+        total = 0
+        for bound, count in zip(self.buckets, counts):
+            total += count
+            yield bound, total
+
+    def samples(self):
+        with self._lock:
+            return [{
+                'labels': dict(key),
+                'count': series['count'],
+                'sum': round(series['sum'], 6),
+                'buckets': {_format_value(bound): total
+                            for bound, total in self._cumulative(series['counts'])}
+            } for key, series in self.values.items()]
+
+    def exposition(self):
+        lines = []
+        with self._lock:
+            for key, series in self.values.items():
+                for bound, total in self._cumulative(series['counts']):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {total}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named counters and histograms, thread safe
+
+    counter() / histogram() create a metric on first use and return the
+    same object afterwards. Use shared() for the process-wide registry
+    every flow and executor records into unless handed its own.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def _get(self, cls, name, help, **options):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, **options)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already a {metric.kind}")
+            return metric
+
+    def counter(self, name, help=''):
+        return self._get(Counter, name, help)
+
+    def histogram(self, name, help='', buckets=DURATION_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.exposition())
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        return {
+            name: {'type': metric.kind, 'help': metric.help, 'samples': metric.samples()}
+            for name, metric in sorted(self.metrics.items())
+        }
+
+    def write_prometheus(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+
+    def dump_json(self, path):
+        json_codec.dump_file(path, self.to_dict())
+
+
+def observe_request(registry, endpoint, seconds, response=None, error=None, streamed=False):
+    """Record one request as a step saw it: after queueing and retries
+
+    Response bytes are not recorded for streamed responses, whose body the
+    step reads (or abandons) itself.
+    """
+    step = current_step.get()
+    registry.histogram(
+        'doordash_request_duration_seconds',
+        "Request time per step and endpoint, including rate limiting and retries"
+    ).observe(seconds, step=step, endpoint=endpoint)
+    if error is not None:
+        registry.counter(
+            'doordash_request_errors_total', "Requests that raised, per error type"
+        ).inc(step=step, endpoint=endpoint, error=type(error).__name__)
+        return
+    registry.counter(
+        'doordash_responses_total', "Responses per step, endpoint and status code"
+    ).inc(step=step, endpoint=endpoint, status=response.status_code)
+    if not streamed:
+        registry.histogram(
+            'doordash_response_bytes', "Response body size per step and endpoint", SIZE_BUCKETS
+        ).observe(len(response.content), step=step, endpoint=endpoint)
+
+
+def observe_retry(registry, endpoint, reason):
+    registry.counter(
+        'doordash_retries_total', "Retried attempts per endpoint and reason"
+    ).inc(endpoint=endpoint, reason=reason)
+
+
+def timed_step(method):
+    """Decorate a flow's step_* coroutine: duration, outcome, step label and span
+
+    The flow must have a `metrics` registry plus `tracer` / `trace_id` for
+    the step's span. A step that raises or returns a falsy value counts as
+    failed.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        token = current_step.set(name)
+        started = time.perf_counter()
+        result = None
+        try:
+            with span(name, self.tracer, self.trace_id) as step_span:
+                result = await method(self, *args, **kwargs)
+                step_span.set(ok=bool(result))
+            return result
+        finally:
+            current_step.reset(token)
+            self.metrics.histogram(
+                'doordash_step_duration_seconds', "Wall time per flow step"
+            ).observe(time.perf_counter() - started, step=name)
+            self.metrics.counter(
+                'doordash_steps_total', "Step runs per outcome"
+            ).inc(step=name, outcome='ok' if result else 'failed')
+    return wrapper
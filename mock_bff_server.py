@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for consumer-mobile-bff.doordash.com
+Serves every endpoint both flows call with canned responses, plus
+configurable latency, error rates and 429 bursts for offline load testing
+
+Usage: python mock_bff_server.py [--port 8765] [--latency 0.05] [--error-rate 0.01]
+Then point a flow at it with base_url="http://127.0.0.1:8765"
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import random
+import zlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from facet_cursor import FacetCursor
+from resilience import endpoint_key
+
+HOMEPAGE_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_homepage_feed.json')
+
+# Centre of the synthetic city the feeds are built from (Manhattan)
+CITY_CENTER = (40.75, -73.98)
+
+
+def synthetic_city(stores=550, seed=7, center=CITY_CENTER):
+    """(lat, lng) per store: a dense core plus a sparse ring around it"""
+    rng = random.Random(seed)
+    lat, lng = center
+    core = stores * 8 // 11
+    return [(lat + rng.gauss(0, 0.012), lng + rng.gauss(0, 0.015)) for _ in range(core)] + \
+           [(lat - 0.15 + rng.random() * 0.3, lng - 0.12 + rng.random() * 0.3)
+            for _ in range(stores - core)]
+
+
+class MockBFF:
+    """Routes, canned responses and fault injection for MockBFFServer
+
+    Faults are applied before routing, in this order:
+      max_in_flight - 429 while more requests than this are being served
+      burst_every / burst_length - 429 for `burst_length` seconds out of
+                    every `burst_every` seconds
+      error_rate  - that fraction of requests gets a 500 or 503
+    Every request then waits `latency` plus uniform(0, `jitter`) seconds.
+
+    Guest tokens are issued by create_full_guest and remembered; any other
+    endpoint but /status_ok answers 401 without one of them. Feeds list the
+    stores of a synthetic city within `radius_km` of lat/lng (at most
+    `section_size` per section, `page_size` per page). `fixtures` maps a
+    path to a JSON file served verbatim instead - e.g. a recorded
+    now_on_doordash_feed.json for /v2/feed/.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, burst_every=0.0,
+                 burst_length=0.0, max_in_flight=None, page_size=10, section_size=35,
+                 radius_km=2.0, city_stores=550, homepage=HOMEPAGE_FIXTURE, fixtures=None,
+                 seed=7):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.max_in_flight = max_in_flight
+        self.page_size = page_size
+        self.section_size = section_size
+        self.radius_km = radius_km
+        self.city = synthetic_city(city_stores, seed)
+        with open(homepage, 'rb') as f:
+            self.homepage = f.read()
+        self.fixtures = {}
+        for path, filename in (fixtures or {}).items():
+            with open(filename, 'rb') as f:
+                self.fixtures[path] = f.read()
+        self.rng = random.Random(seed)
+        self.started = time.monotonic()
+        self.tokens = set()
+        self.in_flight = 0
+        self.hits = {}
+        self.statuses = {}
+        self._lock = threading.Lock()
+        self.routes = [
+            ('GET', r'/status_ok', self.status_ok),
+            ('POST', r'/v1/consumer_profile/create_full_guest', self.create_guest),
+            ('POST', r'/v1/experiments/', self.experiments),
+            ('POST', r'/v1/register_device/', self.ok),
+            ('GET', r'/v1/user/privacy_consents', self.privacy_consents),
+            ('GET', r'/v2/consumers/me', self.consumer),
+            ('PATCH', r'/v2/consumers/me', self.consumer),
+            ('GET', r'/v2/addresses', self.addresses),
+            ('GET', r'/v1/addresses/autocomplete', self.autocomplete),
+            ('GET', r'/v2/addresses/details', self.address_details),
+            ('POST', r'/v2/addresses/validate', self.validate_address),
+            ('POST', r'/v1/consumer_profile/address/', self.add_address),
+            ('POST|PATCH', r'/v1/consumer_profile/address/\d+/set_default', self.ok),
+            ('GET', r'/v3/feed/homepage', self.homepage_feed),
+            ('GET', r'/v2/feed/', self.content_feed),
+        ]
+
+    def fault(self):
+        """(status, body) to answer with instead of the real response, or None"""
+        if self.max_in_flight is not None and self.in_flight > self.max_in_flight:
+            return 429, {'error': 'too many requests'}
+        if self.burst_every and (time.monotonic() - self.started) % self.burst_every < self.burst_length:
+            return 429, {'error': 'rate limited'}
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return (500 if roll < self.error_rate / 2 else 503), {'error': 'injected failure'}
+        return None
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self._lock:
+                extra = self.rng.uniform(0, self.jitter)
+            time.sleep(self.latency + extra)
+
+    def handle(self, method, url, headers, body):
+        """Serve one request; returns (status, body bytes or JSON-able object)"""
+        parsed = urlparse(url)
+        path = parsed.path
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        with self._lock:
+            self.in_flight += 1
+            endpoint = endpoint_key(method, path)
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+        try:
+            self.delay()
+            result = self.fault() or self.route(method, path, params, headers, body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        with self._lock:
+            self.statuses[result[0]] = self.statuses.get(result[0], 0) + 1
+        return result
+
+    def route(self, method, path, params, headers, body):
+        for methods, pattern, handler in self.routes:
+            if method in methods.split('|') and re.fullmatch(pattern, path):
+                break
+        else:
+            return 404, {'error': f'no route for {method} {path}'}
+        if handler not in (self.status_ok, self.create_guest) and not self.authorized(headers):
+            return 401, {'error': 'authentication required'}
+        if path in self.fixtures:
+            return 200, self.fixtures[path]
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {'error': 'invalid JSON body'}
+        return handler(params, payload)
+
+    def authorized(self, headers):
+        auth = headers.get('Authorization') or ''
+        return auth.startswith('JWT ') and auth[4:] in self.tokens
+
+    def status_ok(self, params, payload):
+        return 200, {'status': 'ok'}
+
+    def ok(self, params, payload):
+        return 200, {}
+
+    def create_guest(self, params, payload):
+        token = f"mock.{uuid.uuid4().hex}"
+        with self._lock:
+            self.tokens.add(token)
+        return 200, {'auth_token': {'token': token}, 'consumer': {'id': str(uuid.uuid4().int % 10 ** 9)}}
+
+    def experiments(self, params, payload):
+        return 200, {name: 'control' for name in payload.get('experiments', [])}
+
+    def privacy_consents(self, params, payload):
+        return 200, {'consents': []}
+
+    def consumer(self, params, payload):
+        return 200, {'id': '0', 'is_guest': True, 'default_country': 'US'}
+
+    def addresses(self, params, payload):
+        return 200, []
+
+    def autocomplete(self, params, payload):
+        query = params.get('input', '')
+        place_id = 'mock-' + format(zlib.crc32(query.encode()), '08x')
+        return 200, [{'google_place_id': place_id, 'printable_address': query}]
+
+    def place(self, place_id):
+        """Deterministic coordinates near the city centre for a place id"""
+        h = zlib.crc32(place_id.encode())
+        lat, lng = CITY_CENTER
+        return {
+            'lat': round(lat + (h % 1000 - 500) / 10000, 6),
+            'lng': round(lng + (h // 1000 % 1000 - 500) / 10000, 6),
+            'printable_address': f"{h % 900 + 100} Mock St, New York, NY"
+        }
+
+    def address_details(self, params, payload):
+        if 'place_id' not in params:
+            return 400, {'error': 'place_id required'}
+        return 200, self.place(params['place_id'])
+
+    def validate_address(self, params, payload):
+        return 200, {'is_valid': True, **self.place(payload.get('google_place_id', ''))}
+
+    def add_address(self, params, payload):
+        place_id = payload.get('google_place_id', '')
+        return 200, {'id': str(uuid.uuid4().int % 10 ** 9), **self.place(place_id)}
+
+    def homepage_feed(self, params, payload):
+        return 200, self.homepage
+
+    def content_feed(self, params, payload):
+        try:
+            lat, lng = float(params['lat']), float(params['lng'])
+        except (KeyError, ValueError):
+            return 400, {'error': 'lat and lng required'}
+        try:
+            cursor = FacetCursor.decode(params['id'])
+            offset = cursor.offset
+        except (KeyError, ValueError):
+            return 400, {'error': 'invalid cursor'}
+
+        section = cursor.get('request_child_id') or ''
+        store_ids = self.section_stores(section, lat, lng)
+        page = {'body': [{'id': 'list.store_list', 'body': [
+            self.store_card(store_id) for store_id in store_ids[offset:offset + self.page_size]
+        ]}]}
+        if offset + self.page_size < len(store_ids):
+            page['page'] = {'next': {'name': 'load_content', 'data': {
+                'cursor': cursor.with_offset(offset + self.page_size).encode()
+            }}}
+        return 200, page
+
+    def section_stores(self, section, lat, lng):
+        """Ids of the nearest stores a section lists at this point"""
+        lat_km, lng_km = 110.574, 111.32 * math.cos(math.radians(lat))
+        nearby = []
+        for n, (store_lat, store_lng) in enumerate(self.city):
+            store_id = str(5000 + n)
+            # Each section carries a stable three quarters of the nearby stores
+            if section and zlib.crc32(f"{section}:{store_id}".encode()) % 4 == 0:
+                continue
+            distance = math.hypot((store_lat - lat) * lat_km, (store_lng - lng) * lng_km)
+            if distance <= self.radius_km:
+                nearby.append((distance, store_id))
+        nearby.sort()
+        return [store_id for _, store_id in nearby[:self.section_size]]
+
+    def store_card(self, store_id):
+        n = int(store_id)
+        return {
+            'id': f"card.store:store:{store_id}",
+            'text': {'title': f"Mock Store {store_id}", 'subtitle': f"{n % 7 + 1}.{n % 10} mi"},
+            'custom': {
+                'store_id': store_id,
+                'rating': 4.0 + n % 10 / 10,
+                'delivery_fee': f"${n % 5}.99",
+                'delivery_time': f"{20 + n % 30} min"
+            },
+            'events': {'click': {'name': 'navigate', 'data': {
+                'store_id': store_id, 'uri': f"store/{store_id}/"
+            }}}
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': dict(self.hits),
+                'statuses': dict(self.statuses),
+                'guests': len(self.tokens),
+                'in_flight': self.in_flight
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _serve(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, payload = self.server.bff.handle(self.command, self.path, self.headers, body)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            if status == 429:
+                self.send_header('Retry-After', '1')
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The streaming parser hangs up once it has what it needs
+            self.close_connection = True
+
+    do_GET = do_POST = do_PATCH = _serve
+
+
+class MockBFFServer:
+    """Run a MockBFF on a background thread
+
+    `options` go to MockBFF. Port 0 picks a free port; `base_url` is what
+    to hand to the flows:
+
+        with MockBFFServer(latency=0.05) as server:
+            run_coordinates_flow(40.75, -73.98, base_url=server.base_url)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, **options):
+        self.bff = MockBFF(**options)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.bff = self.bff
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def stats(self):
+        return self.bff.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the DoorDash consumer BFF")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra uniform(0, jitter) seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction answered 500/503")
+    parser.add_argument('--burst-every', type=float, default=0.0, help="seconds between 429 bursts")
+    parser.add_argument('--burst-length', type=float, default=0.0, help="seconds each 429 burst lasts")
+    parser.add_argument('--max-in-flight', type=int, help="answer 429 above this many concurrent requests")
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--section-size', type=int, default=35)
+    parser.add_argument('--fixture', action='append', default=[], metavar='PATH=FILE',
+                        help="serve FILE verbatim for PATH (repeatable)")
+    args = parser.parse_args()
+
+    fixtures = dict(item.split('=', 1) for item in args.fixture)
+    server = MockBFFServer(
+        args.host, args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, burst_every=args.burst_every,
+        burst_length=args.burst_length, max_in_flight=args.max_in_flight,
+        page_size=args.page_size, section_size=args.section_size, fixtures=fixtures
+    )
+    print(f"🧪 Mock BFF listening on {server.base_url} (Ctrl-C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"📊 {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
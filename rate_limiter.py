@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Shared rate limiter for requests to consumer-mobile-bff.doordash.com
+Token buckets per endpoint class in front of an AIMD concurrency limit that
+follows the server's response codes and latency
+"""
+
+import time
+import asyncio
+import threading
+
+from tracing import span
+
+# Endpoint classes and their default (requests/second, burst) budgets
+GUEST_CREATION = 'guest_creation'
+ADDRESS_WRITE = 'address_write'
+FEED_READ = 'feed_read'
+OTHER = 'other'
+
+DEFAULT_RATES = {
+    GUEST_CREATION: (1.0, 2),
+    ADDRESS_WRITE: (5.0, 5),
+    FEED_READ: (20.0, 20),
+    OTHER: (20.0, 20)
+}
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = frozenset({403, 429, 503})
+
+
+def endpoint_class(method, path):
+    """Which budget a request draws from"""
+    if path.startswith('/v1/consumer_profile/create_full_guest'):
+        return GUEST_CREATION
+    if method != 'GET' and (path.startswith('/v1/consumer_profile/address')
+                            or path.startswith('/v2/addresses/validate')):
+        return ADDRESS_WRITE
+    if path.startswith('/v2/feed') or path.startswith('/v3/feed'):
+        return FEED_READ
+    return OTHER
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token now or book the next one; returns seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class AIMDConcurrency:
+    """Concurrency limit with additive increase / multiplicative decrease
+
+    Every fast, successful response adds 1/limit (about +1 per round of
+    `limit` requests). A throttling status, a server error, a transport
+    error or a response slower than `latency_target` multiplies the limit
+    by `decrease` - at most once per `cooldown` seconds, so one burst of
+    429s counts as a single congestion signal.
+
+    Waiters are plain futures woken with call_soon_threadsafe, so one
+    instance can be shared by flows running on different event loops.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, latency_target=2.0,
+                 decrease=0.5, cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        while True:
+            with self._lock:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    else:
+                        self._wake()  # we were woken for a slot we will not take
+                raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self):
+        """Wake as many waiters as there are free slots (lock held)"""
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.pop(0)
+            free -= 1
+            waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+
+    def on_response(self, status, latency):
+        if status in THROTTLE_STATUSES or status >= 500 or latency > self.latency_target:
+            self.on_congestion()
+            return
+        with self._lock:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._wake()
+
+    def on_congestion(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self.decreases += 1
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RateLimiter:
+    """Token bucket per endpoint class plus one AIMD limit for the host
+
+    `rates` overrides DEFAULT_RATES entries as {class: (per_second, burst)};
+    `aimd` options go to AIMDConcurrency. Use shared() for the process-wide
+    instance every flow uses unless it is handed its own.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rates=None, **aimd):
+        rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in rates.items()}
+        self.concurrency = AIMDConcurrency(**aimd)
+        self.requests = {name: 0 for name in self.buckets}
+        self.throttled = {name: 0 for name in self.buckets}
+        self.bucket_wait = {name: 0.0 for name in self.buckets}
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    async def run(self, method, path, send):
+        """Wait for a token and a concurrency slot, then `await send()`"""
+        name = endpoint_class(method, path)
+        with span('rate_limiter.queue', endpoint_class=name) as queue_span:
+            bucket_wait = await self.buckets[name].acquire()
+            await self.concurrency.acquire()
+            queue_span.set(bucket_wait=round(bucket_wait, 4))
+        self.bucket_wait[name] += bucket_wait
+        started = time.monotonic()
+        try:
+            with span('http'):
+                response = await send()
+        except Exception:
+            self.concurrency.on_congestion()
+            raise
+        finally:
+            self.concurrency.release()
+        self.requests[name] += 1
+        if response.status_code in THROTTLE_STATUSES:
+            self.throttled[name] += 1
+        self.concurrency.on_response(response.status_code, time.monotonic() - started)
+        return response
+
+    def stats(self):
+        return {
+            'concurrency_limit': round(self.concurrency.limit, 2),
+            'in_flight': self.concurrency.in_flight,
+            'decreases': self.concurrency.decreases,
+            'requests': dict(self.requests),
+            'throttled': dict(self.throttled),
+            'bucket_wait': {name: round(wait, 3) for name, wait in self.bucket_wait.items()}
+        }
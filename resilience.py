@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Retries, retry budget and circuit breakers for BFF requests
+One executor classifies every outcome as success, retryable or fatal and
+decides whether (and when) to try again
+"""
+
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from rate_limiter import RateLimiter
+from metrics import MetricsRegistry, observe_retry
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+# Statuses worth another attempt: throttling, timeouts and server trouble
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Methods that can be replayed without side effects doubling up
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# Statuses a non-idempotent request may be replayed on, and only when the
+# server says when (Retry-After): it refused the request without acting on it
+REFUSED_STATUSES = frozenset({429, 503})
+
+# curl error codes raised before the request left the client: couldn't
+# resolve proxy, couldn't resolve host, couldn't connect
+UNSENT_CURL_CODES = frozenset({5, 6, 7})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while an endpoint's breaker is open"""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"Circuit open for {endpoint} (retry in {retry_in:.1f}s)")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def request_not_sent(error):
+    """True if `error` means the request never reached the server"""
+    if isinstance(error, ConnectionRefusedError):
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and code in UNSENT_CURL_CODES
+
+
+def endpoint_key(method, path):
+    """Group requests per endpoint: ids and other digit runs become {id}"""
+    return f"{method} {re.sub(r'/[0-9a-f-]*[0-9][0-9a-f-]*(?=/|$)', '/{id}', path)}"
+
+
+class RetryBudget:
+    """Caps retries at a fraction of first attempts
+
+    Every first attempt deposits `ratio` tokens (up to `max_tokens`), every
+    retry spends one. Under sustained failure the budget runs dry and
+    requests fail after their first attempt instead of multiplying load.
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=20.0, initial=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = initial
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+
+class CircuitBreaker:
+    """Closed -> open when the recent failure rate spikes -> half-open probe
+
+    Tracks the last `window` outcomes (transport errors and 5xx count as
+    failures, 429s do not). Once at least `min_requests` are in the window
+    and `failure_rate` of them failed, the breaker opens and rejects calls
+    for `open_for` seconds. Then one probe is let through: success closes
+    the breaker, failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, window=20, min_requests=10, failure_rate=0.5, open_for=10.0):
+        self.window = window
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.open_for = open_for
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._outcomes = deque(maxlen=window)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """0 if a request may go out now, else seconds until the next probe"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+            remaining = self.opened_at + self.open_for - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return 0
+            return max(remaining, 0.001)
+
+    def release(self):
+        """Free the half-open probe slot when the probe ended without an outcome"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def record(self, success):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if success:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_requests and \
+                    failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+
+class RequestExecutor:
+    """Send a request through the rate limiter with retries and breakers
+
+    Transport errors and RETRYABLE_STATUSES are retried up to
+    `max_attempts` times with full-jitter exponential backoff (honouring
+    Retry-After, capped at `max_delay`), as long as the shared RetryBudget
+    allows. Non-idempotent requests (POST, PATCH) are only retried when they
+    never left the client or were refused with a Retry-After, unless the
+    caller passes idempotent=True. Any other response - including 4xx the
+    steps handle themselves - is returned as is. Each endpoint has its own
+    CircuitBreaker; while it is open, execute() raises CircuitOpenError
+    without touching the network. Retries are counted in `metrics` (the
+    shared MetricsRegistry by default). Use shared() for the process-wide instance.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rate_limiter=None, max_attempts=4, base_delay=0.25, max_delay=8.0,
+                 budget=None, metrics=None, **breaker_options):
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.shared()
+        self.metrics = metrics if metrics is not None else MetricsRegistry.shared()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget if budget is not None else RetryBudget()
+        self.breaker_options = breaker_options
+        self.breakers = {}
+        self.retries = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def breaker(self, endpoint):
+        with self._lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(**self.breaker_options)
+            return self.breakers[endpoint]
+
+    def backoff(self, attempt, response=None):
+        """Full jitter: uniform(0, base * 2^attempt), or the server's Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(self.max_delay, float(retry_after))
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def retryable(self, response, error, idempotent, retry_statuses=()):
+        """Whether an attempt that ended in `response` or `error` may be repeated"""
+        if error is not None:
+            return idempotent or request_not_sent(error)
+        status = response.status_code
+        if status in retry_statuses:
+            return True
+        if idempotent:
+            return status in RETRYABLE_STATUSES
+        return status in REFUSED_STATUSES and bool(response.headers.get('Retry-After'))
+
+    async def execute(self, method, path, send, retry_statuses=(), idempotent=None,
+                      stream=False):
+        """Run `send` (a coroutine factory) until it succeeds or must stop
+
+        `retry_statuses` adds statuses that are retryable for this call only.
+        `idempotent` defaults to whether `method` is in IDEMPOTENT_METHODS;
+        pass True for writes that are safe to replay. With `stream`, a
+        response that is retried is closed first so its connection is freed.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        endpoint = endpoint_key(method, path)
+        breaker = self.breaker(endpoint)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            retry_in = breaker.allow()
+            if retry_in:
+                raise CircuitOpenError(endpoint, retry_in)
+
+            response = error = None
+            try:
+                with span('attempt', attempt=attempt + 1) as attempt_span:
+                    try:
+                        response = await self.rate_limiter.run(method, path, send)
+                        attempt_span.set(status=response.status_code)
+                    except Exception as e:
+                        error = e
+                        attempt_span.set(error=type(e).__name__)
+            except BaseException:
+                # Cancelled mid-attempt: no outcome, but a probe must not hold the breaker
+                breaker.release()
+                raise
+            retryable = self.retryable(response, error, idempotent, retry_statuses)
+            # Throttling is the rate limiter's business; the breaker tracks real failures
+            breaker.record(error is None and response.status_code < 500)
+
+            if not retryable:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            if attempt >= self.max_attempts or not self.budget.withdraw():
+                self.gave_up += 1
+                if error is not None:
+                    raise error
+                return response
+
+            if stream and response is not None:
+                await response.aclose()
+            self.retries += 1
+            delay = self.backoff(attempt, response)
+            reason = type(error).__name__ if error is not None else response.status_code
+            observe_retry(self.metrics, endpoint, reason)
+            log.debug("🔁 %s: %s - retry %s in %.2fs", endpoint, reason, attempt, delay)
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            'retries': self.retries,
+            'gave_up': self.gave_up,
+            'budget_tokens': round(self.budget.tokens, 2),
+            'budget_exhausted': self.budget.exhausted,
+            'open_breakers': sorted(
+                endpoint for endpoint, breaker in self.breakers.items()
+                if breaker.state != CircuitBreaker.CLOSED
+            )
+        }
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Per-flow cookies on a shared HTTP session
+Many flows can share one AsyncSession (and its connection pool) without
+sharing cookies: each request carries its flow's jar, and whatever the
+session collected is moved back into that jar straight away
+"""
+
+
+async def isolated_request(session, jar, method, url, **kwargs):
+    """Send one request with `jar` as its only cookies
+
+    The session's own jar is drained into `jar` before control returns to
+    the event loop, so it is empty whenever another flow's request starts
+    and one guest's Set-Cookie is never sent on behalf of another.
+    """
+    try:
+        return await session.request(method, url, cookies=jar, **kwargs)
+    finally:
+        jar.update(session.cookies)
+        session.cookies.clear()
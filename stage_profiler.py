@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Per-stage CPU and memory profiling for the DoorDash flows
+Every pipeline stage (bootstrap, geocode, homepage, cursor search, section
+feed, extraction, persistence) gets its own cProfile profile and
+tracemalloc snapshot diff, written to disk as one report per stage
+"""
+
+import io
+import os
+import time
+import pstats
+import logging
+import cProfile
+import contextlib
+import tracemalloc
+
+import json_codec
+
+# Pipeline stages in run order; the summary lists them this way
+STAGES = ('bootstrap', 'geocode', 'address', 'homepage', 'cursor_search', 'section_feed',
+          'extraction', 'persistence')
+
+# Keep the profiler's own bookkeeping out of the allocation diffs
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+log = logging.getLogger(__name__)
+
+
+class StageStats:
+    """One stage's profile, accumulated over every time it was entered"""
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.entries = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_bytes = 0
+        self.net_bytes = 0
+        self.allocations = {}  # traceback -> [size_diff, count_diff]
+
+    def add_allocations(self, diffs):
+        for diff in diffs:
+            totals = self.allocations.setdefault(diff.traceback, [0, 0])
+            totals[0] += diff.size_diff
+            totals[1] += diff.count_diff
+
+    def pstats(self, stream=None):
+        return pstats.Stats(self.profile, stream=stream or io.StringIO())
+
+    def top_allocations(self, limit):
+        return sorted(self.allocations.items(), key=lambda item: abs(item[1][0]), reverse=True)[:limit]
+
+
+class _OpenStage:
+    __slots__ = ('stats', 'started', 'started_cpu', 'overhead', 'start_bytes', 'peak', 'snapshot')
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.peak = 0
+
+
+class StageProfiler:
+    """cProfile + tracemalloc per pipeline stage
+
+    Wrap each stage in `with profiler.stage(name):`; a stage entered more
+    than once accumulates. cProfile and tracemalloc are process-wide, so
+    profile one flow at a time. Stages may nest (extraction inside
+    section_feed): the cProfile profile holds the innermost open stage
+    only, wall / CPU seconds and memory include nested stages. cProfile
+    times with the wall clock, so waiting on the network shows up as the
+    event loop's select/poll. The profiler's own bookkeeping is left out
+    of a stage's wall and CPU seconds.
+
+    With `snapshots` every stage boundary also takes a tracemalloc
+    snapshot to find the allocating lines, which is slow on big heaps;
+    without it only peak and net bytes are recorded.
+    """
+
+    def __init__(self, output_dir='profiles', top=30, snapshots=True):
+        self.output_dir = output_dir
+        self.top = top
+        self.snapshots = snapshots
+        self.stages = {}
+        self._stack = []
+        self._owns_tracing = False
+        self._overhead = (0.0, 0.0)  # wall, CPU seconds spent in stage bookkeeping
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        return self
+
+    def stop(self):
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def _charge(self, wall_since, cpu_since):
+        wall, cpu = self._overhead
+        self._overhead = (wall + time.perf_counter() - wall_since,
+                          cpu + time.process_time() - cpu_since)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self._stack and self._stack[-1].stats.name == name:
+            yield self._stack[-1].stats
+            return
+        if not tracemalloc.is_tracing():
+            self.start()
+
+        wall_since, cpu_since = time.perf_counter(), time.process_time()
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        current = _OpenStage(stats)
+        if self._stack:
+            parent = self._stack[-1]
+            parent.stats.profile.disable()
+            parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+        current.snapshot = self._snapshot() if self.snapshots else None
+        tracemalloc.reset_peak()
+        current.start_bytes = tracemalloc.get_traced_memory()[0]
+        self._stack.append(current)
+        self._charge(wall_since, cpu_since)
+        current.overhead = self._overhead
+        current.started, current.started_cpu = time.perf_counter(), time.process_time()
+        stats.profile.enable()
+        try:
+            yield stats
+        finally:
+            stats.profile.disable()
+            wall_since, cpu_since = time.perf_counter(), time.process_time()
+            stats.wall_seconds += wall_since - current.started - (self._overhead[0] - current.overhead[0])
+            stats.cpu_seconds += cpu_since - current.started_cpu - (self._overhead[1] - current.overhead[1])
+            end_bytes, peak = tracemalloc.get_traced_memory()
+            peak = max(current.peak, peak)
+            stats.entries += 1
+            stats.peak_bytes = max(stats.peak_bytes, peak - current.start_bytes)
+            stats.net_bytes += end_bytes - current.start_bytes
+            if current.snapshot is not None:
+                stats.add_allocations(self._snapshot().compare_to(current.snapshot, 'lineno'))
+                current.snapshot = None
+            # Stages of concurrent coroutines may close out of order
+            self._stack.remove(current)
+            tracemalloc.reset_peak()
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak = max(parent.peak, peak)
+            self._charge(wall_since, cpu_since)
+            if self._stack:
+                parent.stats.profile.enable()
+
+    def ordered(self):
+        rank = {name: i for i, name in enumerate(STAGES)}
+        return sorted(self.stages.values(), key=lambda stats: rank.get(stats.name, len(STAGES)))
+
+    def report(self, stats):
+        """Text report of one stage: timings, top functions, top allocating lines"""
+        out = io.StringIO()
+        profile = stats.pstats(out)
+        out.write(f"Stage: {stats.name}\n")
+        out.write(f"Entered {stats.entries}x - wall {stats.wall_seconds:.3f}s, "
+                  f"CPU {stats.cpu_seconds:.3f}s, profiled (own) {profile.total_tt:.3f}s\n")
+        out.write(f"Memory: peak +{stats.peak_bytes / 1024:.1f} KiB, "
+                  f"net {stats.net_bytes / 1024:+.1f} KiB\n\n")
+        out.write(f"Top {self.top} functions by cumulative time\n")
+        profile.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        out.write(f"Top {self.top} functions by own time\n")
+        profile.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        if self.snapshots:
+            out.write(f"Top {self.top} allocating lines (net over the stage)\n")
+            for traceback, (size, count) in stats.top_allocations(self.top):
+                frame = traceback[0]
+                out.write(f"   {size / 1024:+10.1f} KiB {count:+8d} blocks  "
+                          f"{frame.filename}:{frame.lineno}\n")
+        return out.getvalue()
+
+    def summary(self):
+        """{stage: numbers} for every stage entered, in pipeline order"""
+        summary = {}
+        for stats in self.ordered():
+            profile = stats.pstats()
+            hottest = sorted(profile.stats.items(), key=lambda item: item[1][2], reverse=True)[:5]
+            summary[stats.name] = {
+                'entries': stats.entries,
+                'wall_s': round(stats.wall_seconds, 4),
+                'cpu_s': round(stats.cpu_seconds, 4),
+                'profiled_s': round(profile.total_tt, 4),
+                'peak_kib': round(stats.peak_bytes / 1024, 1),
+                'net_kib': round(stats.net_bytes / 1024, 1),
+                'hottest': [
+                    {'function': f"{os.path.basename(path)}:{line}({func})", 'own_s': round(own, 4)}
+                    for (path, line, func), (_, _, own, _, _) in hottest
+                ]
+            }
+        return summary
+
+    def write_reports(self):
+        """<stage>.prof (pstats / snakeviz), <stage>.txt and summary.json in output_dir"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        for stats in self.ordered():
+            stats.profile.dump_stats(os.path.join(self.output_dir, f"{stats.name}.prof"))
+            with open(os.path.join(self.output_dir, f"{stats.name}.txt"), 'w', encoding='utf-8') as f:
+                f.write(self.report(stats))
+        summary = self.summary()
+        json_codec.dump_file(os.path.join(self.output_dir, 'summary.json'), summary)
+
+        log.info("🔬 Stage profile (reports in %s/)", self.output_dir)
+        for name, numbers in summary.items():
+            hottest = numbers['hottest'][0]['function'] if numbers['hottest'] else '-'
+            log.info("%-14s wall %8.1f ms  cpu %8.1f ms  peak %9.1f KiB  hottest %s",
+                     name, numbers['wall_s'] * 1000, numbers['cpu_s'] * 1000,
+                     numbers['peak_kib'], hottest)
+        return summary
+
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                        help="profile CPU and memory per pipeline stage, reports in DIR "
+                             "(default: profiles)")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Blocking facade for the asyncio DoorDash flows
+Lets the original synchronous API keep working on top of the async engine
+"""
+
+import asyncio
+import functools
+import inspect
+
+
+class SyncFacade:
+    """Drive an async flow object from synchronous code
+
+    Subclasses set `async_class`. Every coroutine method of the wrapped flow
+    is run to completion on a private event loop, so the curl_cffi
+    AsyncSession always stays bound to the same loop; async generator
+    methods come back as ordinary generators. Plain attributes
+    (jwt_token, lat, lng, ...) are read and written straight through.
+    """
+
+    async_class = None
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, '_loop', asyncio.new_event_loop())
+        object.__setattr__(self, '_flow', self.async_class(*args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self._flow, name)
+        if inspect.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            def blocking(*args, **kwargs):
+                return self._loop.run_until_complete(attr(*args, **kwargs))
+            return blocking
+        if inspect.isasyncgenfunction(attr):
+            @functools.wraps(attr)
+            def blocking_iter(*args, **kwargs):
+                return self._iterate(attr(*args, **kwargs))
+            return blocking_iter
+        return attr
+
+    def _iterate(self, agen):
+        """Turn an async generator into a plain one, stepping it on the private loop"""
+        try:
+            while True:
+                try:
+                    yield self._loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if not self._loop.is_closed():
+                self._loop.run_until_complete(agen.aclose())
+
+    def __setattr__(self, name, value):
+        setattr(self._flow, name, value)
+
+    def close(self):
+        """Close the underlying session and the private event loop"""
+        if self._loop.is_closed():
+            return
+        self._loop.run_until_complete(self._flow.close())
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
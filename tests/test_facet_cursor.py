@@ -0,0 +1,58 @@
+"""
+Tests for facet_cursor.FacetCursor and page-to-page cursor following
+"""
+
+import os
+import json
+
+import pytest
+
+from facet_cursor import FacetCursor
+from feed_parser import list_sections, next_page_cursor, walk_feed, store_key
+from mock_bff_server import MockBFF
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raw_homepage_feed.json')
+
+
+@pytest.fixture(scope='module')
+def sections():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        return list_sections(json.load(f))
+
+
+def test_fixture_cursors_round_trip(sections):
+    assert sections
+    for section in sections:
+        assert FacetCursor.decode(section['cursor']).encode() == section['cursor']
+
+
+def test_next_page_cursor_walks_every_page(sections):
+    bff = MockBFF()
+    cursor, offsets, keys = sections[0]['cursor'], [], []
+    while cursor:
+        status, page = bff.content_feed({'lat': '40.75', 'lng': '-73.98', 'id': cursor}, {})
+        assert status == 200
+        offsets.append(FacetCursor.decode(cursor).offset)
+        keys += [store_key(store) for store in walk_feed(page, collect_sections=False)[1]]
+        cursor = next_page_cursor(page)
+    assert len(offsets) > 1
+    assert offsets == [n * bff.page_size for n in range(len(offsets))]
+    assert len(keys) == len(set(keys))
+    assert next_page_cursor({'page': {'next': None}}) is None
+
+
+def test_round_trip_and_offsets():
+    cursor = FacetCursor({'offset': 20, 'request_child_id': 'now_on_doordash'})
+    assert FacetCursor.decode(cursor.encode()).fields == cursor.fields
+    assert cursor.fan_out(3, 20) == [
+        cursor.encode(), cursor.with_offset(40).encode(), cursor.with_offset(60).encode()
+    ]
+    assert FacetCursor({}).offset == 0
+
+
+def test_non_numeric_offset_is_a_value_error():
+    cursor = FacetCursor.decode('eyJvZmZzZXQiOiJ4In0=')
+    with pytest.raises(ValueError):
+        cursor.offset
+    with pytest.raises(ValueError):
+        FacetCursor.decode('not a cursor!')
@@ -0,0 +1,98 @@
+"""
+Tests for feed_parser: the feed walker, the streaming cursor scanner and
+store extraction / de-duplication
+"""
+
+import os
+import json
+
+import pytest
+
+from feed_parser import (
+    NOW_ON_DOORDASH,
+    Store,
+    store_key,
+    unique_stores,
+    walk_feed,
+    list_sections,
+    scan_section_cursor,
+    find_now_on_doordash_cursor
+)
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raw_homepage_feed.json')
+
+
+@pytest.fixture(scope='module')
+def homepage_bytes():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+def chunked(data, size=4096):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_walker_and_scanner_agree_on_every_section(homepage_bytes):
+    sections, _ = walk_feed(json.loads(homepage_bytes), collect_stores=False)
+    assert sections
+    for section in sections:
+        title = section['title'].lower()
+        first = next(s for s in sections if title in s['title'].lower())
+        assert scan_section_cursor(chunked(homepage_bytes), title) == first['cursor']
+
+
+def test_now_on_doordash_cursor_from_tree_and_stream(homepage_bytes):
+    cursor = find_now_on_doordash_cursor(json.loads(homepage_bytes))
+    assert cursor
+    assert scan_section_cursor(chunked(homepage_bytes, 512), NOW_ON_DOORDASH) == cursor
+
+
+def test_list_sections_keys_are_unique(homepage_bytes):
+    sections = list_sections(json.loads(homepage_bytes))
+    keys = [section['key'] for section in sections]
+    assert len(keys) == len(set(keys))
+
+
+def store_card(title, click_store_id=None, custom_store_id=None):
+    item = {'text': {'title': title, 'subtitle': ''}, 'custom': {'rating': 4.5}}
+    if custom_store_id is not None:
+        item['custom']['store_id'] = custom_store_id
+    if click_store_id is not None:
+        item['events'] = {'click': {'data': {'store_id': click_store_id, 'uri': 'store/x/'}}}
+    return item
+
+
+def test_store_id_falls_back_to_custom_store_id():
+    feed = {'body': [
+        store_card('From custom', custom_store_id='11'),
+        store_card('From click', click_store_id='22', custom_store_id='99'),
+        store_card('No id'),
+    ]}
+    _, stores = walk_feed(feed, collect_sections=False)
+    assert [(store.name, store.store_id) for store in stores] == [
+        ('From custom', '11'), ('From click', '22'), ('No id', None)
+    ]
+
+
+def test_same_name_locations_with_distinct_ids_are_kept():
+    feed = {'body': [
+        store_card('Chain Burger', click_store_id='1'),
+        store_card('Chain Burger', click_store_id='2'),
+        store_card('chain burger', click_store_id='1'),
+        store_card('Corner Cafe'),
+        store_card('CORNER CAFE'),
+    ]}
+    _, stores = walk_feed(feed, collect_sections=False)
+    assert [(store.name, store.store_id) for store in stores] == [
+        ('Chain Burger', '1'), ('Chain Burger', '2'), ('Corner Cafe', None)
+    ]
+
+
+def test_unique_stores_keeps_first_of_each_key_across_pages():
+    seen = set()
+    first_page = [Store('Pizza', store_id='1'), Store('Tacos'), Store('Pizza 2', store_id='1')]
+    second_page = [Store('TACOS'), Store('Sushi', store_id='2')]
+    assert [store.name for store in unique_stores(first_page, seen)] == ['Pizza', 'Tacos']
+    assert [store.name for store in unique_stores(second_page, seen)] == ['Sushi']
+    assert seen == {'1', 'tacos', '2'}
+    assert store_key(Store('Burgers')) == 'burgers'
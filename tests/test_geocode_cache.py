@@ -0,0 +1,57 @@
+"""
+Tests for geocode_cache.GeocodeCache: normalization, TTL expiry and LRU eviction
+"""
+
+import pytest
+
+import geocode_cache
+from geocode_cache import GeocodeCache, normalize_query
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(geocode_cache.time, 'time', clock)
+    return clock
+
+
+def test_queries_are_normalized():
+    assert normalize_query('  New York,  NY! ') == normalize_query('new york ny') == 'new york ny'
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = GeocodeCache(str(tmp_path / 'cache.sqlite3'), ttl=60)
+    cache.put_place_id('New York, NY', 'place-1')
+    cache.put_place('place-1', 40.7, -74.0, 'New York')
+    clock.now += 59
+    assert cache.get_place_id('new york ny') == 'place-1'
+    assert cache.get_place('place-1') == {'lat': 40.7, 'lng': -74.0, 'printable_address': 'New York'}
+    clock.now += 2
+    assert cache.get_place_id('New York, NY') is None
+    assert cache.get_place('place-1') is None
+    assert cache.stats()['entries'] == {'queries': 0, 'places': 0}
+    assert cache.stats()['hits'] == {'query': 1, 'place': 1}
+    cache.close()
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = GeocodeCache(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    cache.put_place_id('a', 'place-a')
+    clock.now += 1
+    cache.put_place_id('b', 'place-b')
+    clock.now += 1
+    assert cache.get_place_id('a') == 'place-a'  # 'b' is now the least recently used
+    clock.now += 1
+    cache.put_place_id('c', 'place-c')
+    assert cache.get_place_id('b') is None
+    assert cache.get_place_id('a') == 'place-a'
+    assert cache.get_place_id('c') == 'place-c'
+    cache.close()
@@ -0,0 +1,41 @@
+"""
+Tests for json_codec: both backends must agree on feed data
+"""
+
+import os
+import json
+
+import pytest
+
+import json_codec
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raw_homepage_feed.json')
+
+
+@pytest.fixture(params=['default', 'stdlib'])
+def codec(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(json_codec, 'orjson', None)
+    return json_codec
+
+
+def test_decodes_the_fixture_like_stdlib_json(codec):
+    with open(FIXTURE, 'rb') as f:
+        raw = f.read()
+    assert codec.loads(raw) == json.loads(raw)
+    assert codec.loads(raw.decode('utf-8')) == json.loads(raw)
+
+
+def test_dumps_utf8_bytes_that_round_trip(codec):
+    obj = {'name': 'Café Olé', 'rating': 4, 'tags': ['pizza', None, True]}
+    compact = codec.dumps(obj)
+    assert isinstance(compact, bytes)
+    assert compact == '{"name":"Café Olé","rating":4,"tags":["pizza",null,true]}'.encode('utf-8')
+    assert json.loads(codec.dumps(obj, indent=True)) == obj
+
+
+def test_dump_file_and_write_raw(codec, tmp_path):
+    codec.dump_file(tmp_path / 'stores.json', [{'store_id': '1'}])
+    assert json.loads((tmp_path / 'stores.json').read_bytes()) == [{'store_id': '1'}]
+    codec.write_raw(tmp_path / 'raw.json', b'{"a": 1}')
+    assert (tmp_path / 'raw.json').read_bytes() == b'{"a": 1}'
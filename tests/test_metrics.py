@@ -0,0 +1,63 @@
+"""
+Tests for metrics: Prometheus text exposition and JSON export
+"""
+
+import json
+
+import pytest
+
+from metrics import MetricsRegistry, observe_request
+
+
+class FakeResponse:
+    status_code = 200
+    content = b'x' * 2000
+
+
+def test_prometheus_exposition():
+    registry = MetricsRegistry()
+    registry.counter('requests_total', "Requests").inc(2, endpoint='GET /v2/feed/', status=200)
+    latency = registry.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05, step='step_15')
+    latency.observe(0.5, step='step_15')
+    latency.observe(3.0, step='step_15')
+
+    assert registry.to_prometheus() == '\n'.join([
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{step="step_15",le="0.1"} 1',
+        'latency_seconds_bucket{step="step_15",le="1.0"} 2',
+        'latency_seconds_bucket{step="step_15",le="+Inf"} 3',
+        'latency_seconds_sum{step="step_15"} 3.55',
+        'latency_seconds_count{step="step_15"} 3',
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{endpoint="GET /v2/feed/",status="200"} 2',
+    ]) + '\n'
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('errors_total').inc(error='say "hi"\\\n')
+    assert 'errors_total{error="say \\"hi\\"\\\\\\n"} 1' in registry.to_prometheus()
+
+
+def test_metric_kind_cannot_change():
+    registry = MetricsRegistry()
+    registry.counter('things')
+    with pytest.raises(ValueError):
+        registry.histogram('things')
+
+
+def test_observe_request_and_json_export(tmp_path):
+    registry = MetricsRegistry()
+    observe_request(registry, 'GET /v2/feed/', 0.2, FakeResponse())
+    observe_request(registry, 'GET /v2/feed/', 0.3, error=TimeoutError())
+    registry.dump_json(tmp_path / 'metrics.json')
+    data = json.loads((tmp_path / 'metrics.json').read_bytes())
+    assert data['doordash_responses_total']['samples'] == [
+        {'labels': {'endpoint': 'GET /v2/feed/', 'status': '200', 'step': ''}, 'value': 1}
+    ]
+    assert data['doordash_request_errors_total']['samples'][0]['labels']['error'] == 'TimeoutError'
+    assert data['doordash_request_duration_seconds']['samples'][0]['count'] == 2
+    assert data['doordash_response_bytes']['samples'][0]['buckets']['4096'] == 1
@@ -0,0 +1,27 @@
+"""
+Tests for mock_bff_server: clients hanging up mid-stream
+"""
+
+import socket
+import struct
+import time
+
+from mock_bff_server import MockBFFServer
+
+
+def test_client_hanging_up_mid_stream_is_quiet(tmp_path, capfd):
+    homepage = tmp_path / 'homepage.json'
+    homepage.write_bytes(b'{"body": "' + b'x' * (16 * 1024 * 1024) + b'"}')
+    with MockBFFServer(homepage=str(homepage)) as server:
+        server.bff.tokens.add('token')
+        host, port = server.httpd.server_address[:2]
+        client = socket.create_connection((host, port))
+        client.sendall(b"GET /v3/feed/homepage?lat=1&lng=2 HTTP/1.1\r\n"
+                       b"Host: mock\r\nAuthorization: JWT token\r\n\r\n")
+        assert client.recv(1024).startswith(b'HTTP/1.1 200')
+        # Hang up with a reset, as a streaming client does once it has its cursor
+        client.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        client.close()
+        time.sleep(0.5)
+
+    assert 'Traceback' not in capfd.readouterr().err
@@ -0,0 +1,70 @@
+"""
+Tests for rate_limiter: token buckets, AIMD concurrency and endpoint classes
+"""
+
+import asyncio
+
+from rate_limiter import (
+    FEED_READ,
+    GUEST_CREATION,
+    ADDRESS_WRITE,
+    OTHER,
+    AIMDConcurrency,
+    TokenBucket,
+    endpoint_class
+)
+
+
+def test_endpoint_classes():
+    assert endpoint_class('POST', '/v1/consumer_profile/create_full_guest') == GUEST_CREATION
+    assert endpoint_class('POST', '/v1/consumer_profile/address/') == ADDRESS_WRITE
+    assert endpoint_class('GET', '/v1/consumer_profile/address/') == OTHER
+    assert endpoint_class('GET', '/v3/feed/homepage') == FEED_READ
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=10.0, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    waits = [bucket.reserve() for _ in range(2)]
+    assert 0.09 < waits[0] <= 0.1
+    assert 0.19 < waits[1] <= 0.2
+
+
+def test_additive_increase_is_about_one_per_round():
+    aimd = AIMDConcurrency(initial=4, maximum=64)
+    for _ in range(4):
+        aimd.on_response(200, 0.1)
+    assert 4.9 < aimd.limit < 5.0
+    for _ in range(1000):
+        aimd.on_response(200, 0.1)
+    assert aimd.limit <= 64
+
+
+def test_multiplicative_decrease_once_per_cooldown():
+    aimd = AIMDConcurrency(initial=16, minimum=2, cooldown=60)
+    for status in (429, 503, 500):
+        aimd.on_response(status, 0.1)
+    assert aimd.limit == 8
+    assert aimd.decreases == 1
+
+    aimd = AIMDConcurrency(initial=16, minimum=2, cooldown=0, latency_target=1.0)
+    aimd.on_response(200, 5.0)  # too slow counts as congestion
+    assert aimd.limit == 8
+    for _ in range(5):
+        aimd.on_congestion()
+    assert aimd.limit == 2
+
+
+def test_acquire_waits_for_a_free_slot():
+    async def scenario():
+        aimd = AIMDConcurrency(initial=2)
+        await aimd.acquire()
+        await aimd.acquire()
+        third = asyncio.ensure_future(aimd.acquire())
+        await asyncio.sleep(0.01)
+        assert not third.done()
+        aimd.release()
+        await asyncio.wait_for(third, 1)
+        assert aimd.in_flight == 2
+
+    asyncio.run(scenario())
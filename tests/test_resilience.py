@@ -0,0 +1,143 @@
+"""
+Tests for resilience.RequestExecutor: breaker probes and retry policy
+"""
+
+import asyncio
+
+import pytest
+
+from metrics import MetricsRegistry
+from rate_limiter import DEFAULT_RATES, RateLimiter
+from resilience import CircuitBreaker, CircuitOpenError, RequestExecutor
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class SendError(Exception):
+    def __init__(self, code):
+        super().__init__(f"curl error {code}")
+        self.code = code
+
+
+def make_executor(**options):
+    rates = {name: (1000.0, 100) for name in DEFAULT_RATES}
+    return RequestExecutor(RateLimiter(rates), base_delay=0, metrics=MetricsRegistry(), **options)
+
+
+def sequence(*outcomes):
+    """A `send` factory that returns (or raises) each outcome in turn"""
+    calls = []
+
+    async def send():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return send, calls
+
+
+def test_cancelled_probe_releases_half_open_breaker():
+    async def scenario():
+        executor = make_executor(open_for=0.01)
+        breaker = executor.breaker('GET /v2/feed/')
+        breaker._open()
+        await asyncio.sleep(0.02)
+
+        async def hang():
+            await asyncio.sleep(60)
+
+        probe = asyncio.ensure_future(executor.execute('GET', '/v2/feed/', hang))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        send, _ = sequence(FakeResponse(200))
+        response = await executor.execute('GET', '/v2/feed/', send)
+        assert response.status_code == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_open_breaker_rejects_without_sending():
+    async def scenario():
+        executor = make_executor(open_for=60)
+        executor.breaker('GET /v2/feed/')._open()
+        send, calls = sequence(FakeResponse(200))
+        with pytest.raises(CircuitOpenError):
+            await executor.execute('GET', '/v2/feed/', send)
+        assert calls == []
+
+    asyncio.run(scenario())
+
+
+def test_post_is_not_retried_after_it_may_have_been_sent():
+    async def scenario():
+        executor = make_executor()
+        send, calls = sequence(FakeResponse(502), FakeResponse(200))
+        response = await executor.execute('POST', '/v1/consumer_profile/address/', send)
+        assert response.status_code == 502
+        assert len(calls) == 1
+
+        send, calls = sequence(SendError(28), FakeResponse(200))
+        with pytest.raises(SendError):
+            await executor.execute('POST', '/v1/consumer_profile/address/', send)
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_post_is_retried_when_never_sent_or_refused():
+    async def scenario():
+        executor = make_executor()
+        send, calls = sequence(SendError(7), FakeResponse(200))
+        response = await executor.execute('POST', '/v1/consumer_profile/create_full_guest', send)
+        assert response.status_code == 200
+        assert len(calls) == 2
+
+        send, calls = sequence(FakeResponse(429, {'Retry-After': '0'}), FakeResponse(200))
+        response = await executor.execute('POST', '/v1/consumer_profile/create_full_guest', send)
+        assert response.status_code == 200
+        assert len(calls) == 2
+
+        send, calls = sequence(FakeResponse(429), FakeResponse(200))
+        response = await executor.execute('POST', '/v1/consumer_profile/create_full_guest', send)
+        assert response.status_code == 429
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_retried_stream_is_closed():
+    async def scenario():
+        executor = make_executor()
+        failed, ok = FakeResponse(502), FakeResponse(200)
+        send, _ = sequence(failed, ok)
+        response = await executor.execute('GET', '/v3/feed/homepage', send, stream=True)
+        assert response is ok and not ok.closed
+        assert failed.closed
+
+    asyncio.run(scenario())
+
+
+def test_idempotent_opt_in_retries_writes():
+    async def scenario():
+        executor = make_executor()
+        send, calls = sequence(FakeResponse(502), FakeResponse(200))
+        response = await executor.execute('POST', '/v2/addresses/validate', send, idempotent=True)
+        assert response.status_code == 200
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+"""
+Tests for session_cookies.isolated_request on a session shared by two flows
+"""
+
+import asyncio
+
+from session_cookies import isolated_request
+
+
+class FakeSession:
+    """Records the cookies each request carried; responses set `name=url`"""
+
+    def __init__(self):
+        self.cookies = {}
+        self.sent = []
+
+    async def request(self, method, url, cookies=None, **kwargs):
+        self.sent.append((url, dict(cookies), dict(self.cookies)))
+        await asyncio.sleep(0)
+        self.cookies[url] = 'set'
+        return url
+
+
+def test_each_flow_only_sends_its_own_cookies():
+    async def scenario():
+        session = FakeSession()
+        jar_a, jar_b = {}, {}
+        await asyncio.gather(
+            isolated_request(session, jar_a, 'GET', 'a1'),
+            isolated_request(session, jar_b, 'GET', 'b1'),
+        )
+        await asyncio.gather(
+            isolated_request(session, jar_a, 'GET', 'a2'),
+            isolated_request(session, jar_b, 'GET', 'b2'),
+        )
+        return session, jar_a, jar_b
+
+    session, jar_a, jar_b = asyncio.run(scenario())
+    assert jar_a == {'a1': 'set', 'a2': 'set'}
+    assert jar_b == {'b1': 'set', 'b2': 'set'}
+    assert session.cookies == {}
+    sent = {url: (cookies, session_jar) for url, cookies, session_jar in session.sent}
+    assert sent['a2'] == ({'a1': 'set'}, {})
+    assert sent['b2'] == ({'b1': 'set'}, {})
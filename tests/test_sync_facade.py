@@ -0,0 +1,63 @@
+"""
+Tests for sync_facade.SyncFacade
+"""
+
+import asyncio
+
+from sync_facade import SyncFacade
+
+
+class AsyncCounter:
+    def __init__(self, start=0):
+        self.value = start
+        self.loops = set()
+        self.closed = False
+        self.generator_closed = False
+
+    async def add(self, amount):
+        self.loops.add(asyncio.get_running_loop())
+        await asyncio.sleep(0)
+        self.value += amount
+        return self.value
+
+    async def count_up(self, n):
+        try:
+            for i in range(n):
+                self.loops.add(asyncio.get_running_loop())
+                yield self.value + i
+        finally:
+            self.generator_closed = True
+
+    async def close(self):
+        self.closed = True
+
+
+class Counter(SyncFacade):
+    async_class = AsyncCounter
+
+
+def test_methods_block_on_one_private_loop():
+    with Counter(start=5) as counter:
+        assert counter.add(2) == 7
+        assert counter.add(3) == 10
+        assert list(counter.count_up(3)) == [10, 11, 12]
+        assert len(counter.loops) == 1
+    assert counter.closed
+
+
+def test_attributes_read_and_write_through():
+    counter = Counter()
+    counter.value = 41
+    assert counter.add(1) == 42
+    assert counter._flow.value == 42
+    counter.close()
+    counter.close()
+
+
+def test_abandoned_generator_is_closed():
+    counter = Counter()
+    values = counter.count_up(10)
+    assert next(values) == 0
+    values.close()
+    assert counter.generator_closed
+    counter.close()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Local span tracing for the DoorDash flows
+Spans share the trace/span ids sent in the Sentry-Trace header and export
+to Chrome trace format (chrome://tracing, Perfetto) or a text waterfall
+"""
+
+import time
+import uuid
+import threading
+import contextlib
+import contextvars
+
+import json_codec
+
+# The innermost open span of the running coroutine
+current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def new_span_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    """One timed operation; `start`/`end` are perf_counter seconds"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'end', 'attributes')
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end = None
+        self.attributes = attributes or {}
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __repr__(self):
+        return f"Span({self.name!r}, {self.duration * 1000:.1f} ms)"
+
+
+class Tracer:
+    """Collects finished spans, grouped by trace id
+
+    Keeps at most `max_spans` spans; later ones are counted in `dropped`
+    so a long sweep cannot grow memory without bound. Use shared() for a
+    process-wide tracer.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_spans=100000):
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+        self.epoch = time.perf_counter()
+        self.epoch_wall = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def record(self, span):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def traces(self):
+        """{trace_id: [spans sorted by start]} in order of first span"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        traces = {}
+        for span in spans:
+            traces.setdefault(span.trace_id, []).append(span)
+        return traces
+
+    def chrome_trace(self, trace_ids=None):
+        """Chrome trace event dict: one thread row per trace, complete ('X') events"""
+        events = []
+        for tid, (trace_id, spans) in enumerate(self.traces().items(), 1):
+            if trace_ids is not None and trace_id not in trace_ids:
+                continue
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                           'args': {'name': f"trace {trace_id[:8]}"}})
+            for span in spans:
+                events.append({
+                    'name': span.name,
+                    'cat': span.name.split(' ')[0].split('.')[0],
+                    'ph': 'X',
+                    'ts': round((span.start - self.epoch) * 1e6, 1),
+                    'dur': round(span.duration * 1e6, 1),
+                    'pid': 1,
+                    'tid': tid,
+                    'args': dict(span.attributes, trace_id=span.trace_id, span_id=span.span_id,
+                                 parent_id=span.parent_id)
+                })
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'epoch': self.epoch_wall, 'dropped_spans': self.dropped}
+        }
+
+    def export_chrome(self, path, trace_ids=None):
+        json_codec.dump_file(path, self.chrome_trace(trace_ids), indent=False)
+
+    def waterfall(self, trace_id=None, width=50):
+        """Text waterfall of one trace (the first one by default)"""
+        traces = self.traces()
+        if not traces:
+            return "(no spans recorded)"
+        spans = traces[trace_id] if trace_id is not None else next(iter(traces.values()))
+        depth = {}
+        for span in spans:
+            depth[span.span_id] = depth.get(span.parent_id, -1) + 1
+        origin = spans[0].start
+        total = max(span.start + span.duration for span in spans) - origin or 1e-9
+
+        lines = [f"🌊 Trace {spans[0].trace_id} - {total * 1000:.1f} ms, {len(spans)} spans"]
+        for span in spans:
+            offset = span.start - origin
+            left = int(offset / total * width)
+            bar = ' ' * left + '█' * max(1, int(span.duration / total * width))
+            label = '  ' * depth[span.span_id] + span.name
+            lines.append(f"   {label[:44]:<44} {offset * 1000:8.1f} {span.duration * 1000:8.1f} ms |{bar:<{width}}|")
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def span(name, tracer=None, trace_id=None, **attributes):
+    """Open a span as a child of the current one
+
+    `tracer` and `trace_id` are inherited from the enclosing span when not
+    given; with no tracer the span still gets ids (for the Sentry-Trace
+    header) but is not recorded. A span opened under a parent from another
+    trace starts a new root.
+    """
+    parent = current_span.get()
+    if parent is not None:
+        tracer = tracer if tracer is not None else parent.tracer
+        trace_id = trace_id or parent.trace_id
+    current = _OpenSpan(name, trace_id or new_trace_id(),
+                        parent.span_id if parent is not None and parent.trace_id == trace_id else None,
+                        attributes, tracer)
+    token = current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes['error'] = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        current.end = time.perf_counter()
+        if tracer is not None:
+            tracer.record(current)
+
+
+class _OpenSpan(Span):
+    """A Span that remembers which tracer its children should report to"""
+
+    __slots__ = ('tracer',)
+
+    def __init__(self, name, trace_id, parent_id, attributes, tracer):
+        super().__init__(name, trace_id, parent_id, attributes)
+        self.tracer = tracer
+
+
+def sentry_trace(trace_id, sampled='1'):
+    """Sentry-Trace header value for the current span in `trace_id`"""
+    current = current_span.get()
+    span_id = current.span_id if current is not None and current.trace_id == trace_id else new_span_id()
+    return f"{trace_id}-{span_id}-{sampled}"